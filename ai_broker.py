@@ -0,0 +1,456 @@
+"""Shared broker for boss AI requests from many concurrent sessions.
+
+Kiosks and simulation batches run many bosses at once. Instead of each one
+talking to the model server on its own, their chat payloads go through one
+AIBroker, which:
+
+* deduplicates identical payloads, both waiting and in flight, so sessions
+  in the same boss state share one model call;
+* gathers what arrives within a short window and dispatches it as a batch,
+  never keeping more than `parallel` calls outstanding (match it to the
+  server's OLLAMA_NUM_PARALLEL);
+* fans each reply out to every waiting ticket, and drops tickets whose
+  session deadline passed before their payload reached the model;
+* rejects new payloads outright once max_pending distinct payloads are
+  waiting, so the queue cannot grow without bound.
+
+Tickets are ai_worker.AIRequest objects, so sessions poll them exactly like
+the in-process worker's requests.
+
+The module also runs as a tool:
+
+    python ai_broker.py serve --upstream http://127.0.0.1:11434 --parallel 4
+        Ollama-compatible front on port 11435; point each game process at it
+        with OLLAMA_HOST=http://127.0.0.1:11435. Streamed chats are brokered
+        too and get the whole reply back as one chunk.
+    python ai_broker.py stand-in --latency 0.5 --parallel 2 --token-latency 0.03
+        Local stand-in model server with a fixed latency per reply (to its
+        first token, when streaming) and per further token.
+    python ai_broker.py bench --sessions 1 4 16 64
+        Decisions per second with and without the broker against a stand-in.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ai_worker import AIRequest
+
+
+class BrokerBusy(RuntimeError):
+    pass
+
+
+class AIBroker:
+    def __init__(self, fetch, parallel=4, batch_window_s=0.01, max_pending=64):
+        self.fetch = fetch                    # payload -> reply; called on broker threads
+        self.parallel = parallel
+        self.batch_window_s = batch_window_s
+        self.max_pending = max_pending
+        self.cond = threading.Condition()
+        self.pending = OrderedDict()          # payload key -> (payload, [tickets]), oldest first
+        self.in_flight = {}                   # payload key -> [tickets]
+        self.closed = False
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="ai-broker")
+        self.thread = threading.Thread(target=self._dispatch, name="ai-broker-dispatch", daemon=True)
+        self.thread.start()
+
+    def submit(self, payload, timeout_s=None):
+        """A ticket that finishes with the reply to payload, or with an error."""
+        ticket = AIRequest(self.fetch, (payload,), timeout_s)
+        key = json.dumps(payload, sort_keys=True)
+        with self.cond:
+            self.submitted += 1
+            if self.closed:
+                ticket.finish(error=BrokerBusy("AI broker is closed"))
+            elif key in self.in_flight:
+                self.in_flight[key].append(ticket)
+                self.deduplicated += 1
+            elif key in self.pending:
+                self.pending[key][1].append(ticket)
+                self.deduplicated += 1
+            elif len(self.pending) >= self.max_pending:
+                self.rejected += 1
+                ticket.finish(error=BrokerBusy(f"AI broker queue is full ({self.max_pending} prompts waiting)"))
+            else:
+                self.pending[key] = (payload, [ticket])
+                self.cond.notify()
+        return ticket
+
+    def stats(self):
+        with self.cond:
+            return {
+                "submitted": self.submitted, "deduplicated": self.deduplicated, "rejected": self.rejected,
+                "dropped": self.dropped, "batches": self.batches, "largest_batch": self.largest_batch,
+                "pending": len(self.pending), "in_flight": len(self.in_flight),
+            }
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            waiting = [t for _, tickets in self.pending.values() for t in tickets]
+            self.pending.clear()
+            self.cond.notify_all()
+        for ticket in waiting:
+            ticket.finish(error=BrokerBusy("AI broker is closed"))
+        self.executor.shutdown(wait=False)
+
+    def _take_batch(self):
+        batch = []
+        while self.pending and len(self.in_flight) < self.parallel:
+            key, (payload, tickets) = self.pending.popitem(last=False)
+            live = [t for t in tickets if not t.stale()]
+            for ticket in tickets:
+                if ticket.stale():
+                    ticket.finish()
+            self.dropped += len(tickets) - len(live)
+            if live:
+                self.in_flight[key] = live
+                batch.append((key, payload))
+        return batch
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                while not self.closed and not (self.pending and len(self.in_flight) < self.parallel):
+                    self.cond.wait()
+                if self.closed:
+                    return
+            # Let the other sessions' requests for this frame catch up with the first one.
+            time.sleep(self.batch_window_s)
+            with self.cond:
+                batch = self._take_batch()
+                if batch:
+                    self.batches += 1
+                    self.largest_batch = max(self.largest_batch, len(batch))
+            for key, payload in batch:
+                self.executor.submit(self._call, key, payload)
+
+    def _call(self, key, payload):
+        try:
+            result, error = self.fetch(payload), None
+        except Exception as e:
+            result, error = None, e
+        with self.cond:
+            tickets = self.in_flight.pop(key)
+            self.cond.notify()
+        for ticket in tickets:
+            ticket.finish(result=result, error=error)
+
+
+# --- HTTP plumbing shared by the broker front and the stand-in server ---
+
+def post_json(url, payload, timeout_s=None):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout_s) as response:
+        return json.loads(response.read())
+
+
+def ollama_chat(host, timeout_s=None):
+    """A fetch function that sends non-streaming /api/chat payloads to an Ollama server."""
+    url = host.rstrip("/") + "/api/chat"
+    return lambda payload: post_json(url, dict(payload, stream=False), timeout_s)
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def send_body(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload).encode())
+
+    def send_ndjson(self, payloads):
+        """Stream payloads as chunked JSON lines, each written as soon as it is produced."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for payload in payloads:
+                line = json.dumps(payload).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client stopped reading
+        finally:
+            payloads.close()
+
+
+class BackgroundServer:
+    """A ThreadingHTTPServer on a daemon thread; port 0 picks a free port."""
+    def __init__(self, handler, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class BrokerHandler(JSONHandler):
+    def do_POST(self):
+        server = self.server.owner
+        body = self.read_body()
+        if self.path != "/api/chat":
+            return self.forward("POST", body)
+        payload = json.loads(body or b"{}")
+        # Streamed chats are brokered too: the whole reply goes back as a single chunk,
+        # so they keep dedup, batching and backpressure at the cost of first-token latency.
+        streamed = payload.pop("stream", True) is not False
+        ticket = server.broker.submit(payload, timeout_s=server.timeout_s)
+        ticket.wait(server.timeout_s)
+        if ticket.succeeded() and streamed:
+            self.send_ndjson(chunk for chunk in [dict(ticket.result, done=True)])
+        elif ticket.succeeded():
+            self.send_json(200, ticket.result)
+        elif isinstance(ticket.error, BrokerBusy):
+            self.send_json(503, {"error": str(ticket.error)})
+        elif ticket.error is not None:
+            self.send_json(502, {"error": f"upstream error: {ticket.error}"})
+        else:
+            self.send_json(504, {"error": "no reply before the session deadline"})
+
+    def do_GET(self):
+        self.forward("GET", None)
+
+    def forward(self, method, body):
+        # Everything but chat (show, generate, tags, ...) passes straight through.
+        upstream = self.server.owner.upstream
+        request = urllib.request.Request(upstream + self.path, data=body, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, reply = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, reply = e.code, e.read()
+        except OSError as e:
+            status, reply = 502, json.dumps({"error": f"upstream unreachable: {e}"}).encode()
+        self.send_body(status, reply)
+
+
+class BrokerServer(BackgroundServer):
+    """Ollama-compatible HTTP front that routes /api/chat through an AIBroker."""
+    def __init__(self, upstream, parallel=4, timeout_s=8, max_pending=64, host="127.0.0.1", port=11435):
+        super().__init__(BrokerHandler, host, port)
+        self.upstream = upstream.rstrip("/")
+        self.timeout_s = timeout_s
+        self.broker = AIBroker(ollama_chat(self.upstream, timeout_s), parallel=parallel, max_pending=max_pending)
+
+    def stop(self):
+        super().stop()
+        self.broker.close()
+
+
+# --- Stand-in model server ---
+
+VALID_ACTIONS = re.compile(r"valid actions are: ([A-Z_, ]+)\.")
+TOKENS = re.compile(r"_?[A-Z]+|,")   # roughly how a tokenizer splits "SPREAD_SHOT,MOVE_LEFT"
+DEFAULT_ACTIONS = ["SINGLE_SHOT", "SPREAD_SHOT", "CIRCLE_SHOT", "MOVE_LEFT", "MOVE_RIGHT"]
+
+
+class StandInHandler(JSONHandler):
+    def do_POST(self):
+        server = self.server.owner
+        payload = json.loads(self.read_body() or b"{}")
+        model = payload.get("model", "stand-in")
+        if self.path == "/api/show":
+            self.send_json(200, {"modelfile": "", "parameters": "", "template": "", "details": {"family": "stand-in"}, "model_info": {}})
+        elif self.path == "/api/generate":
+            self.send_json(200, {"model": model, "response": "", "done": True})
+        elif self.path == "/api/chat" and payload.get("stream", True) is not False:
+            self.send_ndjson(self.chat_stream(model, server.stream(payload)))
+        elif self.path == "/api/chat":
+            self.send_json(200, {"model": model, "message": {"role": "assistant", "content": server.reply(payload)}, "done": True})
+        else:
+            self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    @staticmethod
+    def chat_stream(model, tokens):
+        try:
+            for token in tokens:
+                yield {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+            yield {"model": model, "message": {"role": "assistant", "content": ""}, "done": True}
+        finally:
+            tokens.close()
+
+
+class StandInModelServer(BackgroundServer):
+    """Answers boss prompts with random valid sequences.
+
+    A reply takes latency_s to its first token and token_s per further token.
+    Like an Ollama server with OLLAMA_NUM_PARALLEL=parallel, it generates at most
+    `parallel` replies at a time and queues the rest. A streamed reply stops
+    early when the client hangs up or options.num_predict tokens were sent.
+    """
+    def __init__(self, latency_s=0.5, parallel=1, host="127.0.0.1", port=0, seed=None, token_s=0.0):
+        super().__init__(StandInHandler, host, port)
+        self.latency_s = latency_s
+        self.token_s = token_s
+        self.slots = threading.Semaphore(parallel)
+        self.rng = random.Random(seed)
+        self.served = 0
+
+    def answer(self, payload):
+        system = next((m["content"] for m in payload.get("messages", []) if m.get("role") == "system"), "")
+        match = VALID_ACTIONS.search(system)
+        actions = [a.strip() for a in match.group(1).split(",")] if match else DEFAULT_ACTIONS
+        return ",".join(self.rng.choice(actions) for _ in range(self.rng.randint(3, 4)))
+
+    def reply(self, payload):
+        answer = self.answer(payload)
+        with self.slots:
+            time.sleep(self.latency_s + self.token_s * (len(TOKENS.findall(answer)) - 1))
+            self.served += 1
+            return answer
+
+    def stream(self, payload):
+        tokens = TOKENS.findall(self.answer(payload))[:(payload.get("options") or {}).get("num_predict")]
+        with self.slots:
+            time.sleep(self.latency_s)
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.token_s)
+                yield token
+            self.served += 1
+
+
+# --- Benchmark ---
+
+def bench_payload(rng):
+    # Same shape as the boss prompt; the boss reports whole health percentages.
+    health = rng.randint(0, 100)
+    actions = "SINGLE_SHOT, SPREAD_SHOT, CIRCLE_SHOT, MOVE_LEFT, MOVE_RIGHT" + (", LASER_SWEEP" if health < 50 else "")
+    return {"model": "stand-in", "messages": [
+        {"role": "system", "content": f"Your only valid actions are: {actions}. Reply with 3 to 4 of them."},
+        {"role": "user", "content": f"My Health: {health}%. Enraged? {'Yes' if health < 50 else 'No'}."},
+    ]}
+
+
+def run_sessions(sessions, duration_s, deadline_s, decide):
+    """Decisions delivered within deadline_s by `sessions` threads calling decide(payload, deadline_s)."""
+    delivered = [0] * sessions
+    stop_at = time.monotonic() + duration_s
+
+    def session(i):
+        rng = random.Random(i)
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            if decide(bench_payload(rng), deadline_s) and time.monotonic() - started <= deadline_s:
+                delivered[i] += 1
+            else:
+                time.sleep(0.05)  # a boss falls back to its scripted sequence for a moment
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(delivered)
+
+
+def bench(session_counts, latency_s, parallel, duration_s, deadline_s):
+    server = StandInModelServer(latency_s, parallel).start()
+    fetch = ollama_chat(server.url)
+
+    def direct(payload, deadline_s):
+        try:
+            fetch(payload)
+            return True
+        except OSError:
+            return False
+
+    print(f"Stand-in model: {latency_s * 1000:.0f} ms per reply, {parallel} in parallel, {deadline_s:.1f} s session deadline")
+    print(f"{'sessions':>8} {'direct/s':>9} {'broker/s':>9} {'dedup':>6} {'rejected':>8} {'dropped':>7}")
+    for sessions in session_counts:
+        direct_rate = run_sessions(sessions, duration_s, deadline_s, direct) / duration_s
+        broker = AIBroker(fetch, parallel=parallel, max_pending=4 * parallel)
+
+        def brokered(payload, deadline_s):
+            ticket = broker.submit(payload, timeout_s=deadline_s)
+            ticket.wait(deadline_s)
+            return ticket.succeeded()
+
+        broker_rate = run_sessions(sessions, duration_s, deadline_s, brokered) / duration_s
+        stats = broker.stats()
+        broker.close()
+        print(f"{sessions:>8} {direct_rate:>9.1f} {broker_rate:>9.1f} {stats['deduplicated']:>6} {stats['rejected']:>8} {stats['dropped']:>7}")
+    server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Boss AI broker and stand-in model server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Ollama-compatible broker front")
+    serve.add_argument("--upstream", default="http://127.0.0.1:11434")
+    serve.add_argument("--port", type=int, default=11435)
+    serve.add_argument("--parallel", type=int, default=4)
+    serve.add_argument("--timeout", type=float, default=8.0)
+    serve.add_argument("--max-pending", type=int, default=64)
+    stand_in = commands.add_parser("stand-in", help="local stand-in model server")
+    stand_in.add_argument("--port", type=int, default=11434)
+    stand_in.add_argument("--latency", type=float, default=0.5)
+    stand_in.add_argument("--parallel", type=int, default=1)
+    stand_in.add_argument("--token-latency", type=float, default=0.0, help="seconds per token after the first")
+    bench_cmd = commands.add_parser("bench", help="decision throughput with and without the broker")
+    bench_cmd.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16, 64])
+    bench_cmd.add_argument("--latency", type=float, default=0.4)
+    bench_cmd.add_argument("--parallel", type=int, default=2)
+    bench_cmd.add_argument("--duration", type=float, default=5.0)
+    bench_cmd.add_argument("--deadline", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        bench(args.sessions, args.latency, args.parallel, args.duration, args.deadline)
+        return
+    if args.command == "serve":
+        server = BrokerServer(args.upstream, args.parallel, args.timeout, args.max_pending, port=args.port)
+        print(f"AI broker on {server.url} -> {args.upstream} ({args.parallel} in parallel). Set OLLAMA_HOST={server.url}")
+    else:
+        server = StandInModelServer(args.latency, args.parallel, port=args.port, token_s=args.token_latency)
+        print(f"Stand-in model server on {server.url} ({args.latency * 1000:.0f} ms to the first token, "
+              f"{args.token_latency * 1000:.0f} ms per token after it, {args.parallel} in parallel)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Out-of-process boss AI: the model is asked from a sidecar process.
+
+The in-process AI worker is a thread, so its HTTP and JSON work shares the
+GIL with the render loop. With the sidecar (python main.py --ai-sidecar) the
+game only does two cheap things per frame:
+
+* publishes a fixed-layout state snapshot (STATE_DTYPE) into shared memory.
+  A StateBoard is a seqlock: the writer makes the sequence number odd, fills
+  the record in place and makes it even again, and a reader copies the record
+  and retries if the number was odd or changed meanwhile. Nothing is pickled
+  and no game object is copied;
+* sends (id, messages, valid actions) over a connection and drains the
+  replies without blocking.
+
+The sidecar reads the snapshot when a request arrives and adds what it sees
+(player position, bullets in flight, the nearest threats, minions) to the
+prompt. It streams the reply through an ActionStream and sends each action
+back as soon as it is complete. On the game side every request is an
+AIRequest plus an ActionStream, so the boss polls it exactly like a worker
+request.
+
+The sidecar is a plain child process started with this file as its script,
+so it never imports pygame or the game.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from ai_stream import ActionStream
+from ai_worker import AIRequest
+
+KEY_ENV = "PIXEL_VENGEANCE_SIDECAR_KEY"
+MAX_THREATS = 4
+STATE_DTYPE = np.dtype([
+    ("frame", "<u4"),               # 0 until the game published a state
+    ("player", "<f4", 2),           # player center
+    ("lives", "<i2"),
+    ("power", "<i2"),
+    ("boss", "<f4", 2),             # boss center
+    ("boss_health", "<f4"),         # fraction of max health
+    ("enraged", "u1"),
+    ("shielded", "u1"),
+    ("desperation", "u1"),
+    ("player_bullets", "<u2"),
+    ("boss_orbs", "<u2"),
+    ("boss_hazards", "<u2"),        # lasers, missiles and mines
+    ("minions", "<u2"),
+    ("threat_count", "u1"),
+    ("threats", "<f4", (MAX_THREATS, 2)),   # (dx, dy) from the boss to the nearest player bullets
+])
+
+
+class StateBoard:
+    """One STATE_DTYPE record in shared memory behind a seqlock: one writer, any readers.
+
+    StateBoard() creates the segment; StateBoard(name) attaches to it.
+    """
+    def __init__(self, name=None):
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=8 + STATE_DTYPE.itemsize if self.owner else 0)
+        if not self.owner:
+            # Before Python 3.13, attaching also registers the segment with this process's
+            # resource tracker, which would unlink it when the process exits.
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.seq = np.ndarray((), "<u8", buffer=self.shm.buf)
+        self.state = np.ndarray((), STATE_DTYPE, buffer=self.shm.buf, offset=8)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @contextmanager
+    def writing(self):
+        """Fill the yielded record in place; readers never see it half-written."""
+        self.seq += 1   # odd: a write is in progress
+        try:
+            yield self.state
+        finally:
+            self.seq += 1
+
+    def read(self, attempts=1000):
+        """A consistent copy of the record as a dict, or None if every attempt overlapped a write."""
+        for _ in range(attempts):
+            before = int(self.seq)
+            if not before & 1:
+                copy = self.state.copy()
+                if int(self.seq) == before:
+                    return {name: copy[name].tolist() for name in STATE_DTYPE.names}
+            time.sleep(0)
+        return None
+
+    def close(self):
+        del self.seq, self.state  # the views must go before the buffer is released
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def describe(state):
+    """What the snapshot shows, in words for the prompt."""
+    if not state or not state["frame"]:
+        return ""
+    (px, py), (bx, by) = state["player"], state["boss"]
+    text = (f"Player: {abs(px - bx):.0f} px to my {'left' if px < bx else 'right'}, {state['lives']} lives, "
+            f"power {state['power']}. Player bullets in flight: {state['player_bullets']}. Minions: {state['minions']}.")
+    threats = state["threats"][:state["threat_count"]]
+    if threats:
+        text += " Nearest bullets (dx, dy): " + ", ".join(f"({dx:.0f}, {dy:.0f})" for dx, dy in threats) + "."
+    return text
+
+
+def with_state(messages, state):
+    seen = describe(state)
+    if not seen:
+        return messages
+    return messages[:-1] + [dict(messages[-1], content=f"{messages[-1]['content']} {seen}")]
+
+
+# --- Game side ---
+
+class AISidecar:
+    """The game's handle on the sidecar process, its state board and its connection."""
+    def __init__(self, model, keep_alive, timeout_s, max_actions=4, max_tokens=48):
+        self.board = StateBoard()
+        self.max_actions, self.max_tokens = max_actions, max_tokens
+        self.ready = None       # True or False once the sidecar probed the model
+        self.requests = {}      # id -> (AIRequest, ActionStream) still being answered
+        self.next_id = 0
+        self.conn = None
+        authkey = os.urandom(16)
+        self.listener = Listener(("127.0.0.1", 0), authkey=authkey)
+        host, port = self.listener.address
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--connect", f"{host}:{port}", "--board", self.board.name,
+             "--model", model, "--keep-alive", str(keep_alive), "--timeout", str(timeout_s),
+             "--max-actions", str(max_actions), "--max-tokens", str(max_tokens)],
+            env=dict(os.environ, **{KEY_ENV: authkey.hex()}))
+        # Accepting waits for the child to start; the game keeps running meanwhile.
+        threading.Thread(target=self._accept, name="ai-sidecar-accept", daemon=True).start()
+
+    def _accept(self):
+        try:
+            self.conn = self.listener.accept()
+        except OSError:
+            pass
+
+    def submit(self, messages, valid_actions, timeout_s):
+        request = AIRequest(None, (), timeout_s)
+        stream = ActionStream(valid_actions, self.max_actions, self.max_tokens)
+        if self.conn is None:
+            request.finish(error=ConnectionError("AI sidecar is not connected"))
+            return request, stream
+        self.next_id += 1
+        self.requests[self.next_id] = request, stream
+        self.conn.send(("chat", self.next_id, messages, list(valid_actions), timeout_s))
+        return request, stream
+
+    def pump(self):
+        """Deliver what the sidecar sent and pass cancellations on; never blocks."""
+        conn = self.conn
+        if conn is None:
+            if self.process.poll() is not None:
+                self.ready = False
+            return
+        try:
+            for request_id, (request, _) in list(self.requests.items()):
+                if request.cancelled:
+                    conn.send(("cancel", request_id))
+                    del self.requests[request_id]
+            while conn.poll():
+                self.receive(conn.recv())
+        except (EOFError, OSError) as e:
+            print(f"AI sidecar stopped: {e}")
+            self.conn, self.ready = None, False
+            for request, stream in self.requests.values():
+                stream.finish()
+                request.finish(error=e)
+            self.requests.clear()
+
+    def receive(self, message):
+        kind = message[0]
+        if kind == "ready":
+            _, self.ready, detail = message
+            print(f"AI sidecar: {detail}")
+            return
+        entry = self.requests.get(message[1])
+        if entry is None:
+            return  # cancelled meanwhile
+        request, stream = entry
+        if message[2]:
+            stream.feed(" ".join(message[2]) + " ")
+        if kind == "done":
+            _, request_id, _, text, error = message
+            del self.requests[request_id]
+            stream.finish()
+            request.finish(result=text, error=RuntimeError(error) if error else None)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        try:
+            self.process.wait(2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.listener.close()
+        self.board.close()
+
+
+# --- Sidecar side ---
+
+class Inbox:
+    """Messages from the game: chat requests in order, cancellations and the stop signal."""
+    def __init__(self, conn):
+        self.conn = conn
+        self.chats = deque()
+        self.cancelled = set()
+        self.stopped = False
+
+    def receive(self, block=False):
+        while not self.stopped and (block or self.conn.poll()):
+            block = False
+            message = self.conn.recv()
+            if message is None:
+                self.stopped = True
+            elif message[0] == "cancel":
+                self.cancelled.add(message[1])
+            else:
+                self.chats.append(message)
+
+    def next_chat(self):
+        while not self.chats and not self.stopped:
+            self.receive(block=True)
+        return self.chats.popleft() if self.chats else None
+
+    def wants(self, request_id):
+        self.receive()
+        return not self.stopped and request_id not in self.cancelled
+
+
+def answer(client, conn, inbox, board, chat, options):
+    _, request_id, messages, valid_actions, timeout_s = chat
+    deadline = time.monotonic() + timeout_s
+    stream = ActionStream(valid_actions, options.max_actions, options.max_tokens)
+    error = None
+    try:
+        parts = client.chat(model=options.model, messages=with_state(messages, board.read()), keep_alive=options.keep_alive,
+                            stream=True, options={"num_predict": options.max_tokens})
+        try:
+            for part in parts:
+                more = stream.feed(part['message']['content'] or "")
+                actions = stream.take()
+                if actions:
+                    conn.send(("actions", request_id, actions))
+                if not more or not inbox.wants(request_id) or time.monotonic() > deadline:
+                    break
+        finally:
+            parts.close()  # drops the connection, which stops the generation
+    except Exception as e:
+        error = str(e)
+    stream.finish()
+    conn.send(("done", request_id, stream.take(), stream.text(), error))
+
+
+def serve(conn, board, options):
+    import ollama  # only the sidecar pays for importing the client library
+    client = ollama.Client(timeout=options.timeout)
+    try:
+        client.show(options.model)
+        client.generate(model=options.model, prompt="", keep_alive=options.keep_alive)
+    except Exception as e:
+        conn.send(("ready", False, f"model '{options.model}' unavailable ({e}); the boss uses scripted attacks"))
+        return
+    conn.send(("ready", True, f"model '{options.model}' loaded in process {os.getpid()}"))
+    inbox = Inbox(conn)
+    while True:
+        chat = inbox.next_chat()
+        if chat is None:
+            return
+        if inbox.wants(chat[1]):
+            answer(client, conn, inbox, board, chat, options)
+        else:
+            conn.send(("done", chat[1], [], "", "cancelled"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Boss AI sidecar process; the game starts it with --ai-sidecar.")
+    parser.add_argument("--connect", required=True, metavar="HOST:PORT")
+    parser.add_argument("--board", required=True, help="name of the game's shared-memory state board")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--keep-alive", default="30m")
+    parser.add_argument("--timeout", type=float, default=8.0)
+    parser.add_argument("--max-actions", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=48)
+    options = parser.parse_args(argv)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the game; the sidecar stops when it does
+    host, port = options.connect.rsplit(":", 1)
+    conn = Client((host, int(port)), authkey=bytes.fromhex(os.environ.pop(KEY_ENV)))
+    board = StateBoard(options.board)
+    try:
+        serve(conn, board, options)
+    except (EOFError, OSError):
+        pass  # the game went away
+    finally:
+        board.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
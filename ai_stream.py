@@ -0,0 +1,77 @@
+"""Incremental parsing of streamed boss AI replies.
+
+The model streams its answer a token or two at a time. An ActionStream is fed
+those chunks on the AI worker thread and validates each action as soon as a
+separator (comma, whitespace, ...) ends it, so the game thread can take the
+first actions while the rest are still being generated. Once max_actions
+valid actions have arrived, or max_chunks chunks were read, the stream is
+full and the producer stops reading, which also stops the generation.
+"""
+import re
+import threading
+import time
+
+SEPARATORS = re.compile(r"[\s,;.]+")
+
+
+class ActionStream:
+    def __init__(self, valid_actions, max_actions=4, max_chunks=48):
+        self.valid = frozenset(valid_actions)
+        self.max_actions = max_actions
+        self.max_chunks = max_chunks
+        self.actions = []       # every valid action so far, in order
+        self.rejected = []      # words that were not valid actions
+        self.chunks = 0
+        self.taken = 0          # how many of self.actions the game thread has taken
+        self.first_action_at = None
+        self.finished = False
+        self.cancelled = False
+        self._text = []
+        self._pending = ""      # the unfinished word at the end of what arrived so far
+        self._lock = threading.Lock()
+
+    def full(self):
+        return self.cancelled or len(self.actions) >= self.max_actions or self.chunks >= self.max_chunks
+
+    def feed(self, chunk):
+        """Add a chunk of the reply; False once no more input is wanted."""
+        with self._lock:
+            self.chunks += 1
+            self._text.append(chunk)
+            words = SEPARATORS.split(self._pending + chunk)
+            self._pending = words.pop()
+            for word in words:
+                self._add(word)
+            return not self.full()
+
+    def finish(self):
+        """The reply ended: the last word is complete too."""
+        with self._lock:
+            self._add(self._pending)
+            self._pending = ""
+            self.finished = True
+
+    def cancel(self):
+        self.cancelled = True
+
+    def take(self):
+        """Valid actions that arrived since the last take()."""
+        with self._lock:
+            new = self.actions[self.taken:]
+            self.taken = len(self.actions)
+            return new
+
+    def text(self):
+        with self._lock:
+            return "".join(self._text)
+
+    def _add(self, word):
+        word = word.strip().upper()
+        if not word or len(self.actions) >= self.max_actions:
+            return
+        if word in self.valid:
+            if self.first_action_at is None:
+                self.first_action_at = time.monotonic()
+            self.actions.append(word)
+        else:
+            self.rejected.append(word)
@@ -0,0 +1,83 @@
+"""Long-lived background worker for boss AI requests.
+
+One daemon thread serves a FIFO queue of AIRequests for the whole process,
+instead of a new thread per request. Requests carry a wall-clock deadline and
+can be cancelled; stale requests are dropped before they reach the model, and
+late results are never delivered. The game thread polls request.done().
+"""
+import queue
+import threading
+import time
+
+
+class AIRequest:
+    def __init__(self, fn, args, timeout_s=None):
+        self.fn, self.args = fn, args
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self.deadline = self.submitted_at + timeout_s if timeout_s is not None else None
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def stale(self):
+        return self.cancelled or self.expired()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def succeeded(self):
+        return self.done() and self.error is None and not self.stale()
+
+    def finish(self, result=None, error=None):
+        self.result, self.error = result, error
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+    def latency_ms(self):
+        return ((self.finished_at or time.monotonic()) - self.submitted_at) * 1000
+
+
+class AIWorker:
+    def __init__(self, name="boss-ai"):
+        self.requests = queue.Queue()
+        self.completed = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, timeout_s=None):
+        request = AIRequest(fn, args, timeout_s)
+        self.requests.put(request)
+        return request
+
+    def pending(self):
+        return self.requests.qsize()
+
+    def shutdown(self):
+        self.requests.put(None)
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            if request.stale():
+                self.dropped += 1
+                request.finish()
+                continue
+            try:
+                request.finish(result=request.fn(*request.args))
+            except Exception as e:
+                request.finish(error=e)
+            self.completed += 1
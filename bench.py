@@ -0,0 +1,316 @@
+"""Headless stress benchmarks with a regression check.
+
+Each scene builds a worst case directly (no playing up to it), then runs a
+fixed number of frames through GameSession.step() and draw() under the
+frame profiler and reports FPS and p50/p99 frame time for update, collision
+and draw:
+
+    python bench.py                          # run every scene, compare with bench_baseline.json
+    python bench.py --save-baseline          # record this machine's numbers as the baseline
+    python bench.py boss_circle_spam --frames 2000
+    python bench.py --snapshots              # also report snapshot size and dump/restore time
+
+The exit status is 1 when a scene got slower than the baseline by more than
+--tolerance. Baselines are per machine; record one before changing the engine.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+
+os.environ.setdefault("PIXEL_VENGEANCE_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import main
+from profiler import percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+PHASES = ("update", "collision", "draw")
+
+
+# --- Scene building blocks ---
+
+def clear_waves(session):
+    # Past the last wave with no cooldown pending: only what the scene spawns appears.
+    session.current_wave = session.max_waves + 1
+    session.is_wave_active = False
+    session.wave_clear_time = None
+
+
+def spawn_boss(session, health_fraction=1.0):
+    boss = main.Boss(session.player, session.boss_orbs, session.clock, session.rng, ai_enabled=False)
+    boss.health = boss.max_health * health_fraction
+    boss.shield_health_thresholds = [t for t in boss.shield_health_thresholds if t < health_fraction]
+    session.all_sprites.add(boss)
+    session.boss_group.add(boss)
+    return boss
+
+
+def keep_alive(session, boss=None, health_fraction=None):
+    session.player.lives = 99
+    if boss is not None and health_fraction is not None:
+        boss.health = max(boss.health, boss.max_health * health_fraction)
+
+
+def fill_enemies(session, count):
+    while len(session.enemies) < count:
+        enemy = main.Enemy(session.rng)
+        session.all_sprites.add(enemy)
+        session.enemies.add(enemy)
+
+
+def hazards(session, kind):
+    return sum(isinstance(s, kind) for s in session.boss_bullets)
+
+
+# --- Scenes: setup(session) returns a per-frame hook that also picks the inputs ---
+
+def boss_circle_spam(session):
+    """Shielded, then enraged boss firing nothing but circle shots."""
+    boss = spawn_boss(session, 0.45)
+    boss.enraged = False
+    boss.is_shielded = True
+    boss.shield_timer = session.clock.get_ticks() + 1000
+    boss.fallback_sequence = ["CIRCLE_SHOT"]
+    boss.action_cooldown = 100
+
+    def frame(n):
+        keep_alive(session, boss, 0.45)
+        return {"shoot": n % 4 == 0, "left": (n // 60) % 2 == 0, "right": (n // 60) % 2 == 1}
+    return frame
+
+
+def minion_cap(session):
+    """Boss summoning minions as fast as its 30-minion cap allows."""
+    boss = spawn_boss(session)
+    boss.minion_summon_interval = 250
+
+    def frame(n):
+        keep_alive(session, boss, 0.9)
+        return {"shoot": n % 3 == 0}
+    return frame
+
+
+def repulsor_overlap(session):
+    """Several bombs expanding at once through enemies and boss orbs."""
+    boss = spawn_boss(session, 0.9)
+    boss.fallback_sequence = ["CIRCLE_SHOT", "SPREAD_SHOT"]
+    boss.action_cooldown = 100
+
+    def frame(n):
+        keep_alive(session, boss, 0.9)
+        session.player.bombs = 99
+        fill_enemies(session, 25)
+        return {"bomb": n % 6 == 0, "shoot": n % 4 == 0}
+    return frame
+
+
+def striker_power5(session):
+    """Power-5 Striker double fire into a full wave."""
+    session.player.power = 5
+
+    def frame(n):
+        keep_alive(session)
+        fill_enemies(session, 30)
+        return {"shoot": True, "left": (n // 45) % 2 == 0, "right": (n // 45) % 2 == 1}
+    return frame
+
+
+def bullet_hell(session):
+    """Enraged boss chaining spiral and aimed-burst patterns."""
+    boss = spawn_boss(session, 0.45)
+    boss.fallback_sequence = ["SPIRAL_SHOT", "AIMED_BURST", "CIRCLE_SHOT"]
+    boss.action_cooldown = 400
+
+    def frame(n):
+        keep_alive(session, boss, 0.45)
+        return {"shoot": n % 4 == 0, "left": (n // 40) % 2 == 0, "right": (n // 40) % 2 == 1}
+    return frame
+
+
+def homing_missiles(session):
+    """Eight homing missiles tracking a weaving player."""
+    boss = spawn_boss(session, 0.9)
+    boss.fallback_sequence = ["MOVE_LEFT", "MOVE_RIGHT"]
+
+    def frame(n):
+        keep_alive(session, boss, 0.9)
+        while hazards(session, main.HomingMissile) < 8:
+            boss.homing_missile(session.all_sprites, session.boss_bullets)
+        return {"left": (n // 30) % 2 == 0, "right": (n // 30) % 2 == 1, "shoot": n % 5 == 0}
+    return frame
+
+
+def mine_field(session):
+    """A field of blinking mines kept topped up by LAY_MINES."""
+    boss = spawn_boss(session, 0.9)
+    boss.fallback_sequence = ["MOVE_LEFT", "MOVE_RIGHT"]
+
+    def frame(n):
+        keep_alive(session, boss, 0.9)
+        while hazards(session, main.Mine) < 30:
+            boss.lay_mines(session.all_sprites, session.boss_bullets)
+        return {"shoot": n % 5 == 0}
+    return frame
+
+
+def everything(session):
+    """All of the above at once on an enraged boss."""
+    session.player.power = 5
+    boss = spawn_boss(session, 0.45)
+    boss.fallback_sequence = ["CIRCLE_SHOT", "LAY_MINES", "HOMING_MISSILE", "SPREAD_SHOT"]
+    boss.action_cooldown = 100
+    boss.minion_summon_interval = 250
+
+    def frame(n):
+        keep_alive(session, boss, 0.45)
+        session.player.bombs = 99
+        fill_enemies(session, 30)
+        while hazards(session, main.HomingMissile) < 8:
+            boss.homing_missile(session.all_sprites, session.boss_bullets)
+        return {"shoot": True, "bomb": n % 12 == 0, "left": (n // 45) % 2 == 0, "right": (n // 45) % 2 == 1}
+    return frame
+
+
+SCENES = {
+    "boss_circle_spam": ("Interceptor", boss_circle_spam),
+    "minion_cap": ("Interceptor", minion_cap),
+    "repulsor_overlap": ("Interceptor", repulsor_overlap),
+    "striker_power5": ("Striker", striker_power5),
+    "bullet_hell": ("Wraith", bullet_hell),
+    "homing_missiles": ("Wraith", homing_missiles),
+    "mine_field": ("Tank", mine_field),
+    "everything": ("Striker", everything),
+}
+
+
+# --- Measurement ---
+
+def measure_snapshots(session, repeats=50):
+    """Size of a snapshot of the scene's last frame and median dump/restore time in microseconds."""
+    dumps, restores = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        blob = session.snapshot()
+        dumps.append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        session.restore(blob)
+        restores.append((time.perf_counter() - start) * 1e6)
+    return {"bytes": len(blob), "dump_us": percentile(dumps, 50), "restore_us": percentile(restores, 50)}
+
+
+def run_scene(name, frames, warmup, surface, seed=1, snapshots=False):
+    jet_type, setup = SCENES[name]
+    profiler = main.PROFILER
+    session = main.GameSession(ai_enabled=False)
+    session.reset(jet_type, seed=seed)
+    clear_waves(session)
+    hook = setup(session)
+    profiler.frames = deque(maxlen=frames)
+    profiler.enable()
+    try:
+        for n in range(warmup + frames):
+            profiler.begin_frame()
+            inputs = hook(n)
+            profiler.lap("scene")
+            session.step(inputs)
+            session.draw(surface)
+            profiler.lap("draw")
+            profiler.end_frame()
+    finally:
+        profiler.disable()
+    measured = list(profiler.frames)
+    times = {phase: [] for phase in PHASES}
+    for frame in measured:
+        phases = frame["phases"]
+        times["update"].append(sum(ms for p, ms in phases.items() if p.startswith("update.") or p in ("input", "logic")))
+        times["collision"].append(phases.get("collision", 0.0))
+        times["draw"].append(phases.get("draw", 0.0))
+    busy = [frame["busy_ms"] - frame["phases"].get("scene", 0.0) for frame in measured]
+    result = {"fps": 1000 * len(busy) / sum(busy)}
+    for phase, values in times.items():
+        result[f"{phase}_p50"] = percentile(values, 50)
+        result[f"{phase}_p99"] = percentile(values, 99)
+    result["sprites"] = {k: round(sum(f["counts"].get(k, 0) for f in measured) / len(measured)) for k in ("enemies", "bullets", "boss_orbs", "boss_bullets")}
+    if snapshots:
+        result["snapshot"] = measure_snapshots(session)
+    return result
+
+
+def regressions(result, baseline, tolerance, p99_tolerance, slack_ms=0.05):
+    """Human-readable reasons result is slower than baseline; empty when it is not.
+
+    A p99 rests on a handful of frames, so it gets its own, looser tolerance.
+    """
+    found = []
+    if result["fps"] < baseline["fps"] * (1 - tolerance):
+        found.append(f"fps {result['fps']:.0f} < {baseline['fps']:.0f}")
+    for phase in PHASES:
+        for key, allowed in ((f"{phase}_p50", tolerance), (f"{phase}_p99", p99_tolerance)):
+            if key in baseline and result[key] > baseline[key] * (1 + allowed) + slack_ms:
+                found.append(f"{key} {result[key]:.3f} > {baseline[key]:.3f} ms")
+    return found
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Headless stress benchmarks with a regression check.")
+    parser.add_argument("scenes", nargs="*", help=f"scenes to run (default: all of {', '.join(SCENES)})")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=120)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed fps and p50 slowdown before a scene counts as regressed")
+    parser.add_argument("--p99-tolerance", type=float, default=0.5, help="allowed p99 slowdown")
+    parser.add_argument("--snapshots", action="store_true", help="also measure GameSession.snapshot() and restore() on each scene's last frame")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenes if name not in SCENES]
+    if unknown:
+        parser.error(f"unknown scene(s): {', '.join(unknown)}")
+
+    surface = pygame.display.set_mode((main.SCREEN_WIDTH, main.SCREEN_HEIGHT))
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+
+    results, failed = {}, []
+    print(f"{'scene':<18} {'fps':>7} {'update p50/p99':>15} {'collide p50/p99':>16} {'draw p50/p99':>13}  avg sprites")
+    for name in args.scenes or list(SCENES):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = results[name] = run_scene(name, args.frames, args.warmup, surface, snapshots=args.snapshots)
+        sprites = " ".join(f"{k}={v}" for k, v in result["sprites"].items())
+        line = (f"{name:<18} {result['fps']:>7.0f} {result['update_p50']:>7.2f}/{result['update_p99']:<7.2f}"
+                f" {result['collision_p50']:>7.2f}/{result['collision_p99']:<8.2f} {result['draw_p50']:>6.2f}/{result['draw_p99']:<6.2f}  {sprites}")
+        if name in baseline and not args.save_baseline:
+            reasons = regressions(result, baseline[name], args.tolerance, args.p99_tolerance)
+            line += "  REGRESSED: " + "; ".join(reasons) if reasons else "  ok"
+            if reasons:
+                failed.append(name)
+        print(line)
+        if args.snapshots:
+            snap = result["snapshot"]
+            print(f"{'':<18} snapshot {snap['bytes'] / 1024:.1f} KiB, dump {snap['dump_us']:.0f} us, restore {snap['restore_us']:.0f} us")
+
+    print(f"sprite pools: {main.pool_report()}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Saved baseline for {len(results)} scenes to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+    if failed:
+        print(f"{len(failed)} scene(s) regressed beyond {args.tolerance:.0%}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,91 @@
+"""Rebuild the distilled boss policy from logged model decisions.
+
+    python build_policy.py              # train from ai_decisions.json and ai_decision_log.jsonl
+    python build_policy.py --show 3     # and print a few sampled sequences per state
+
+Every validated model answer counts once. Answers from the decision log are
+also weighted by how their game ended, so sequences that beat the player
+count for more. The policy is written to boss_policy.json, which the game
+uses when Ollama is not available (or always, with python main.py --ai policy).
+Copy that file to machines that cannot run a model.
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("PIXEL_VENGEANCE_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import main
+from decision_cache import DecisionCache, DecisionLog
+from policy import ANY_STATE, DistilledPolicy
+from recording import ACTIONS
+
+BOSS_WINS = ("GAME OVER", "CRUSHED!")
+
+
+def examples(cache, log, boss_win_weight, player_win_weight):
+    """(key, sequence, weight) for every cached and logged answer, and per-source counts.
+
+    Logged answers are also in the cache, so a cached variant only counts when
+    no logged record has the same key and sequence.
+    """
+    found = []
+    counts = {"cached": 0, "logged": 0, "boss_won": 0, "player_won": 0}
+    decisions, outcomes = log.read()
+    for record in decisions:
+        outcome = outcomes.get(record["session"], {}).get("outcome")
+        weight = 1.0
+        if outcome in BOSS_WINS:
+            weight, counts["boss_won"] = boss_win_weight, counts["boss_won"] + 1
+        elif outcome == "YOU WIN!":
+            weight, counts["player_won"] = player_win_weight, counts["player_won"] + 1
+        found.append((record["key"], record["sequence"], weight))
+        counts["logged"] += 1
+    logged = {(key, tuple(sequence)) for key, sequence, _ in found}
+    for key, variants in cache.entries.items():
+        for _, sequence in variants:
+            if (key, tuple(sequence)) not in logged:
+                found.append((key, sequence, 1.0))
+                counts["cached"] += 1
+    return found, counts
+
+
+def sample_latency_us(policy, key, actions, n=2000):
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for _ in range(n):
+        policy.sample(key, actions, rng)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Train the distilled boss policy from logged model decisions.")
+    parser.add_argument("--cache", default=main.AI_DECISION_CACHE_PATH, help="decision cache to learn from")
+    parser.add_argument("--log", default=main.AI_DECISION_LOG_PATH, help="decision log with game outcomes to learn from")
+    parser.add_argument("--out", default=main.AI_POLICY_PATH)
+    parser.add_argument("--boss-win-weight", type=float, default=2.0, help="weight of answers from games the boss won")
+    parser.add_argument("--player-win-weight", type=float, default=0.5, help="weight of answers from games the player won")
+    parser.add_argument("--show", type=int, default=0, metavar="N", help="print N sampled sequences per state")
+    args = parser.parse_args(argv)
+
+    found, counts = examples(DecisionCache(args.cache), DecisionLog(args.log), args.boss_win_weight, args.player_win_weight)
+    print(f"{len(found)} answers: {counts['logged']} logged ({counts['boss_won']} from games the boss won, "
+          f"{counts['player_won']} from games it lost) and {counts['cached']} only in the cache")
+    policy = DistilledPolicy.fit(found)
+    if not policy:
+        print("Nothing to learn from yet: play with Ollama running to collect decisions.")
+        return
+    policy.save(args.out)
+    states = sorted(state for state in policy.tables if state != ANY_STATE)
+    actions = list(ACTIONS)
+    print(f"Wrote {len(states)} states to {args.out}; "
+          f"sampling takes {sample_latency_us(policy, states[0], actions):.1f} us")
+    rng = random.Random(0)
+    for state in states if args.show else ():
+        print(f"  {state:<14} " + "  ".join(",".join(policy.sample(state, actions, rng) or ["-"]) for _ in range(args.show)))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,104 @@
+"""Uniform-grid broadphase for sprite collisions.
+
+A SpatialHash buckets the sprites of one group by the grid cells their rects
+cover. sync() is called once per frame and only re-buckets sprites that
+crossed a cell boundary, appeared or died; queries then look at a handful of
+cells instead of the whole group.
+"""
+import math
+
+import pygame
+
+
+def collision_radius(sprite):
+    # Same fallback as pygame.sprite.collide_circle: half the rect diagonal.
+    if hasattr(sprite, "radius"):
+        return sprite.radius
+    return 0.5 * math.hypot(sprite.rect.width, sprite.rect.height)
+
+
+class SpatialHash:
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}  # sprite -> [insertion order, cell span]
+        self.next_order = 0
+        self.max_radius = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _span(self, rect):
+        size = self.cell_size
+        return rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size
+
+    def _cells(self, span):
+        left, top, right, bottom = span
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                yield cx, cy
+
+    def _insert(self, sprite, span):
+        for cell in self._cells(span):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                self.cells[cell] = bucket = set()
+            bucket.add(sprite)
+        self.max_radius = max(self.max_radius, collision_radius(sprite))
+
+    def _remove(self, sprite, span):
+        for cell in self._cells(span):
+            bucket = self.cells[cell]
+            bucket.discard(sprite)
+            if not bucket:
+                del self.cells[cell]
+
+    def sync(self, group):
+        """Bring the grid up to date with group, touching only sprites that changed cells."""
+        entries = self.entries
+        for sprite in group:
+            span = self._span(sprite.rect)
+            entry = entries.get(sprite)
+            if entry is None:
+                entries[sprite] = [self.next_order, span]
+                self.next_order += 1
+                self._insert(sprite, span)
+            elif entry[1] != span:
+                self._remove(sprite, entry[1])
+                self._insert(sprite, span)
+                entry[1] = span
+        if len(entries) > len(group):
+            for sprite in [s for s in entries if s not in group]:
+                self._remove(sprite, entries.pop(sprite)[1])
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.max_radius = 0
+
+    def query(self, rect):
+        """Live sprites whose cells overlap rect, in the order they joined the group."""
+        found = set()
+        for cell in self._cells(self._span(rect)):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        entries = self.entries
+        return sorted((s for s in found if s.alive()), key=lambda s: entries[s][0])
+
+    def spritecollide(self, sprite, dokill=False, collided=None):
+        """Grid-accelerated pygame.sprite.spritecollide against the synced group.
+
+        collided may be None (rect overlap) or pygame.sprite.collide_circle.
+        """
+        if collided is None:
+            hits = [s for s in self.query(sprite.rect) if sprite.rect.colliderect(s.rect)]
+        else:
+            reach = int(math.ceil(collision_radius(sprite) + self.max_radius))
+            box = pygame.Rect(0, 0, reach * 2 + 1, reach * 2 + 1)
+            box.center = sprite.rect.center
+            hits = [s for s in self.query(box) if collided(sprite, s)]
+        if dokill:
+            for s in hits:
+                s.kill()
+        return hits
@@ -0,0 +1,147 @@
+"""Persistent cache of validated boss AI decisions.
+
+The boss prompt only depends on a little state, so model answers are
+reusable. Sequences are stored under a quantized state key (health bucket,
+enraged, shielded, desperation). Once a key holds enough variants the boss
+samples among them instead of asking the model, and only refreshes now and
+then. Entries expire after a TTL, the least recently used keys are evicted
+past max_keys, and the whole cache is saved to a JSON file between sessions.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_VERSION = 1
+
+
+def decision_key(health_fraction, enraged, shielded, desperation, buckets=10):
+    bucket = min(buckets - 1, max(0, int(health_fraction * buckets)))
+    return f"h{bucket}|e{int(enraged)}|s{int(shielded)}|d{int(desperation)}"
+
+
+class DecisionCache:
+    def __init__(self, path=None, max_keys=128, variants_per_key=6, min_variants=3, refresh_rate=0.1, ttl_s=7 * 24 * 3600):
+        self.path = path
+        self.max_keys = max_keys
+        self.variants_per_key = variants_per_key
+        self.min_variants = min_variants    # variants needed before a key is served from cache
+        self.refresh_rate = refresh_rate    # share of served lookups that still go to the model
+        self.ttl_s = ttl_s
+        self.entries = OrderedDict()  # key -> [[saved_at, sequence], ...], oldest first
+        self.lock = threading.Lock()
+        self.rng = random.Random()    # keeps cache sampling off the game's random stream
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _fresh(self, key):
+        variants = self.entries.get(key)
+        if not variants:
+            return []
+        cutoff = time.time() - self.ttl_s
+        variants[:] = [v for v in variants if v[0] >= cutoff]
+        if not variants:
+            del self.entries[key]
+        return variants
+
+    def sample(self, key):
+        """A cached sequence for key, or None when the model should be asked."""
+        with self.lock:
+            variants = self._fresh(key)
+            if len(variants) < self.min_variants or self.rng.random() < self.refresh_rate:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(self.rng.choice(variants)[1])
+
+    def add(self, key, sequence):
+        with self.lock:
+            variants = self._fresh(key)
+            if not variants:
+                variants = self.entries[key] = []
+            variants[:] = [v for v in variants if v[1] != sequence]
+            variants.append([time.time(), list(sequence)])
+            del variants[:-self.variants_per_key]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+            snapshot = {k: [list(v) for v in vs] for k, vs in self.entries.items()}
+        if self.path:
+            self.save(snapshot)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"AI decision cache unreadable, starting empty: {e}")
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+        with self.lock:
+            self.entries = OrderedDict((k, [[t, list(seq)] for t, seq in vs]) for k, vs in data["entries"].items())
+            for key in list(self.entries):
+                self._fresh(key)
+
+    def save(self, snapshot):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": CACHE_VERSION, "entries": snapshot}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save AI decision cache: {e}")
+
+
+class DecisionLog:
+    """Append-only JSON-lines log of model decisions and how their games ended.
+
+    Each decision line holds the session id, state key and sequence; one
+    outcome line per session follows when its game ends. build_policy.py
+    joins the two to train the distilled boss policy.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock:
+            try:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Could not write AI decision log: {e}")
+
+    def decision(self, session_id, key, sequence):
+        self.write({"session": session_id, "key": key, "sequence": list(sequence), "time": time.time()})
+
+    def outcome(self, session_id, outcome, score):
+        self.write({"session": session_id, "outcome": outcome, "score": score, "time": time.time()})
+
+    def read(self):
+        """(decisions, {session id: outcome record}) from the log; empty when there is none."""
+        decisions, outcomes = [], {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if "outcome" in record:
+                        outcomes[record["session"]] = record
+                    elif "sequence" in record:
+                        decisions.append(record)
+        except FileNotFoundError:
+            pass
+        return decisions, outcomes
@@ -0,0 +1,340 @@
+"""Gymnasium-style environments for training agents against the game.
+
+    env = PixelVengeanceEnv(obs_type="vector")        # or "pixels"
+    obs, info = env.reset(seed=1)
+    obs, reward, terminated, truncated, info = env.step(action)
+
+An action is a bitmask over recording.INPUT_KEYS (left, right, shoot, laser,
+bomb), so there are 32 of them; a sequence of 5 booleans works too. As in the
+interactive game, left and right are held for every frame of a step and
+shoot, laser and bomb are pressed once.
+
+Observations are either a float32 vector read straight off the sprite groups
+and projectile arrays (see VECTOR_FIELDS), or an RGB frame downsampled by
+pixel_scale from a view of the rendered surface (pygame.surfarray, no copy of
+the full frame). The reward is the score gained plus bonuses and penalties
+from REWARD.
+
+VectorEnv steps num_envs environments in lockstep across worker processes.
+Actions, observations, rewards and done flags live in shared arrays, so a
+step costs one short message per worker and no observation is pickled:
+
+    envs = VectorEnv(64, workers=8)
+    obs, infos = envs.reset(seed=0)
+    obs, rewards, terminated, truncated, infos = envs.step(actions)
+
+    python gym_env.py --envs 64 --workers 8 --steps 20000   # steps per second, random actions
+
+gymnasium is optional: when it is installed the environment is a
+gymnasium.Env with action_space and observation_space set.
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import time
+
+os.environ.setdefault("PIXEL_VENGEANCE_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+import main
+from projectiles import H, W, X, Y
+from recording import INPUT_KEYS, unpack_inputs
+
+try:
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:  # only the space descriptions need it
+    gymnasium = spaces = None
+
+NUM_ACTIONS = 1 << len(INPUT_KEYS)
+ACTION_INPUTS = [unpack_inputs(mask) for mask in range(NUM_ACTIONS)]
+HELD_KEYS = ("left", "right")
+NEAREST = {"enemies": 8, "hazards": 8, "powerups": 2}   # nearest sprites of each kind in a vector observation
+SCALAR_FIELDS = ["player_x", "player_y", "lives", "bombs", "power", "laser_charge", "speed",
+                 "boss", "boss_x", "boss_y", "boss_health", "boss_shielded", "boss_enraged",
+                 "wave", "playable_left", "playable_right"]
+VECTOR_FIELDS = SCALAR_FIELDS + [f"{kind}_{i}_{axis}" for kind, k in NEAREST.items() for i in range(k) for axis in ("dx", "dy")]
+REWARD = {"score": 0.01, "life_lost": -1.0, "YOU WIN!": 10.0, "GAME OVER": -5.0, "CRUSHED!": -5.0}
+MAX_GAME_MS = 10 * 60 * 1000    # episodes still running after this much simulated time are truncated
+QUIET = io.StringIO()
+NO_POINTS = np.zeros((0, 2))
+
+
+def observation_spec(obs_type="vector", pixel_scale=4):
+    """(shape, dtype) of one observation."""
+    if obs_type == "vector":
+        return (len(VECTOR_FIELDS),), np.float32
+    if obs_type == "pixels":
+        return (-(-main.SCREEN_HEIGHT // pixel_scale), -(-main.SCREEN_WIDTH // pixel_scale), 3), np.uint8
+    raise ValueError(f"obs_type must be 'vector' or 'pixels', not {obs_type!r}")
+
+
+def nearest_offsets(points, origin, k, out):
+    """Write (dx, dy) to the k points nearest origin into out, scaled to the screen, nearest first; zeros pad."""
+    out[:] = 0
+    if not len(points):
+        return
+    dx, dy = points[:, 0] - origin[0], points[:, 1] - origin[1]
+    order = np.argsort(dx * dx + dy * dy)[:k]
+    out[:2 * len(order):2] = dx[order] / main.SCREEN_WIDTH
+    out[1:2 * len(order):2] = dy[order] / main.SCREEN_HEIGHT
+
+
+def sprite_centers(group):
+    if not group:
+        return NO_POINTS
+    return np.array([sprite.rect.center for sprite in group], dtype=float)
+
+
+def store_centers(store):
+    if not store.count:
+        return NO_POINTS
+    live = store.live
+    return np.column_stack((live[X] + live[W] / 2, live[Y] + live[H] / 2))
+
+
+class PixelVengeanceEnv(gymnasium.Env if gymnasium else object):
+    metadata = {"render_modes": ["rgb_array"], "render_fps": main.FPS}
+
+    def __init__(self, obs_type="vector", jet_type="Interceptor", max_waves=3, frame_skip=1,
+                 pixel_scale=4, boss="scripted", quiet=True):
+        self.obs_type, self.jet_type, self.max_waves = obs_type, jet_type, max_waves
+        self.frame_skip, self.pixel_scale, self.quiet = frame_skip, pixel_scale, quiet
+        self.observation_shape, self.observation_dtype = observation_spec(obs_type, pixel_scale)
+        self.session = main.GameSession(max_waves, ai_enabled=boss == "policy", ai_backend="policy")
+        self.surface = None
+        self.seeds = random.Random()
+        self.episode_reward = 0.0
+        if spaces is not None:
+            self.action_space = spaces.Discrete(NUM_ACTIONS)
+            low, high = (0, 255) if obs_type == "pixels" else (-np.inf, np.inf)
+            self.observation_space = spaces.Box(low, high, self.observation_shape, self.observation_dtype)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.seeds.seed(seed)
+        with self.silenced():
+            self.session.reset(self.jet_type, seed=self.seeds.randrange(2 ** 32))
+        self.episode_reward = 0.0
+        return self.observe(), self.info()
+
+    def step(self, action, out=None):
+        """Advance frame_skip frames; out, if given, receives the observation in place."""
+        if not isinstance(action, (int, np.integer)):
+            action = sum(1 << bit for bit, pressed in enumerate(action) if pressed)
+        inputs = ACTION_INPUTS[action]
+        session, player = self.session, self.session.player
+        score, lives = session.score, player.lives
+        with self.silenced():
+            session.step(inputs)
+            held = {key: inputs[key] for key in HELD_KEYS}
+            for _ in range(self.frame_skip - 1):
+                if not session.running:
+                    break
+                session.step(held)
+        reward = (session.score - score) * REWARD["score"] + (lives - player.lives) * REWARD["life_lost"]
+        terminated = not session.running
+        if terminated:
+            reward += REWARD.get(session.game_over_message, 0.0)
+        truncated = not terminated and session.clock.get_ticks() >= MAX_GAME_MS
+        self.episode_reward += reward
+        info = self.info()
+        if terminated or truncated:
+            info["episode"] = {"reward": self.episode_reward, "frames": session.frame, "outcome": session.game_over_message or "timeout"}
+        return self.observe(out), reward, terminated, truncated, info
+
+    def info(self):
+        session = self.session
+        return {"score": session.score, "wave": session.current_wave, "lives": session.player.lives, "frame": session.frame}
+
+    def observe(self, out=None):
+        if out is None:
+            out = np.empty(self.observation_shape, self.observation_dtype)
+        if self.obs_type == "pixels":
+            self.draw()
+            # A view of the surface's pixels, (width, height, 3); released when it goes out of scope.
+            view = pygame.surfarray.pixels3d(self.surface)
+            out[:] = view[::self.pixel_scale, ::self.pixel_scale].transpose(1, 0, 2)
+            return out
+        session, player = self.session, self.session.player
+        boss = session.boss_group.sprite
+        sw, sh = main.SCREEN_WIDTH, main.SCREEN_HEIGHT
+        out[:len(SCALAR_FIELDS)] = (
+            player.rect.centerx / sw, player.rect.centery / sh, player.lives / 3, player.bombs / 3, player.power / 5,
+            session.player_laser_charge / main.PLAYER_LASER_MAX_CHARGE, player.speed_x / 10,
+            boss is not None,
+            boss.rect.centerx / sw if boss else 0.0, boss.rect.centery / sh if boss else 0.0,
+            boss.health / boss.max_health if boss else 0.0,
+            boss.is_shielded if boss else False, boss.enraged if boss else False,
+            session.current_wave / (session.max_waves + 1), session.playable_left / sw, session.playable_right / sw,
+        )
+        origin, start = player.rect.center, len(SCALAR_FIELDS)
+        hazards = store_centers(session.boss_orbs)
+        if session.boss_bullets:
+            hazards = np.concatenate((hazards, sprite_centers(session.boss_bullets)))
+        for kind, points in (("enemies", sprite_centers(session.enemies)), ("hazards", hazards),
+                             ("powerups", sprite_centers(session.powerups))):
+            k = NEAREST[kind]
+            nearest_offsets(points, origin, k, out[start:start + 2 * k])
+            start += 2 * k
+        return out
+
+    def render(self):
+        """The current frame as a (height, width, 3) uint8 array."""
+        self.draw()
+        return pygame.surfarray.array3d(self.surface).transpose(1, 0, 2)
+
+    def draw(self):
+        if self.surface is None:
+            self.surface = pygame.Surface((main.SCREEN_WIDTH, main.SCREEN_HEIGHT))
+        self.session.draw(self.surface)
+
+    def silenced(self):
+        # The game narrates waves and boss attacks on stdout, which would swamp a training log.
+        if not self.quiet:
+            return contextlib.nullcontext()
+        QUIET.seek(0)
+        QUIET.truncate()
+        return contextlib.redirect_stdout(QUIET)
+
+    def close(self):
+        pass
+
+
+# --- Vectorized ---
+
+def vector_worker(conn, buffers, start, stop, env_kwargs):
+    obs, actions, rewards, terminated, truncated = (np.frombuffer(raw, dtype).reshape(shape) for raw, shape, dtype in buffers)
+    envs = [PixelVengeanceEnv(**env_kwargs) for _ in range(start, stop)]
+    while True:
+        command, seed = conn.recv()
+        if command == "step":
+            finished = []
+            for i, env in enumerate(envs, start):
+                _, rewards[i], terminated[i], truncated[i], info = env.step(int(actions[i]), obs[i])
+                if terminated[i] or truncated[i]:
+                    finished.append((i, info))
+                    env.reset()
+                    env.observe(obs[i])
+            conn.send(finished)
+        elif command == "reset":
+            infos = []
+            for i, env in enumerate(envs, start):
+                infos.append((i, env.reset(seed=None if seed is None else seed + i)[1]))
+                env.observe(obs[i])
+            conn.send(infos)
+        else:
+            conn.send(None)
+            return
+
+
+class VectorEnv:
+    """num_envs environments stepped in lockstep by worker processes, batched in shared arrays.
+
+    Finished episodes reset automatically: the observation returned for them is
+    the first of the next episode, and their info holds the "episode" summary.
+    The returned arrays are reused by the next step; copy what you keep.
+    """
+    def __init__(self, num_envs, workers=None, **env_kwargs):
+        self.num_envs = num_envs
+        workers = max(1, min(num_envs, workers or os.cpu_count() or 1))
+        ctx = multiprocessing.get_context()
+        shape, dtype = observation_spec(env_kwargs.get("obs_type", "vector"), env_kwargs.get("pixel_scale", 4))
+        buffers, arrays = [], []
+        for item_shape, item_dtype in ((shape, dtype), ((), np.int64), ((), np.float32), ((), np.bool_), ((), np.bool_)):
+            full = (num_envs, *item_shape)
+            raw = ctx.RawArray("b", int(np.prod(full)) * np.dtype(item_dtype).itemsize)
+            buffers.append((raw, full, item_dtype))
+            arrays.append(np.frombuffer(raw, item_dtype).reshape(full))
+        self.obs, self.actions, self.rewards, self.terminated, self.truncated = arrays
+        bounds = np.linspace(0, num_envs, workers + 1).astype(int)
+        self.conns, self.processes = [], []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            conn, child = ctx.Pipe()
+            process = ctx.Process(target=vector_worker, args=(child, buffers, start, stop, env_kwargs),
+                                  name=f"vector-env-{start}", daemon=True)
+            process.start()
+            child.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+    def _broadcast(self, command, arg=None):
+        for conn in self.conns:
+            conn.send((command, arg))
+        infos = [{} for _ in range(self.num_envs)]
+        for conn in self.conns:
+            for i, info in conn.recv():
+                infos[i] = info
+        return infos
+
+    def reset(self, seed=None):
+        """Reset every environment; environment i gets seed + i."""
+        infos = self._broadcast("reset", seed)
+        return self.obs, infos
+
+    def step(self, actions):
+        self.actions[:] = actions
+        infos = self._broadcast("step")
+        return self.obs, self.rewards, self.terminated, self.truncated, infos
+
+    def close(self):
+        # Workers run SDL, which turns SIGTERM into a quit event, so they are asked to stop instead.
+        for conn in self.conns:
+            try:
+                conn.send(("close", None))
+                conn.recv()
+            except (EOFError, OSError):
+                pass
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+        self.conns, self.processes = [], []
+
+
+# --- Throughput check ---
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Environment steps per second with random actions.")
+    parser.add_argument("--envs", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--steps", type=int, default=20000, help="total environment steps to time")
+    parser.add_argument("--obs", choices=("vector", "pixels"), default="vector")
+    parser.add_argument("--frame-skip", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    env = PixelVengeanceEnv(args.obs, frame_skip=args.frame_skip)
+    env.reset(seed=0)
+    steps = max(1, args.steps // 10)
+    started = time.perf_counter()
+    for action in rng.integers(NUM_ACTIONS, size=steps).tolist():
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    print(f"1 env in process:        {steps / (time.perf_counter() - started):>9.0f} steps/s")
+
+    envs = VectorEnv(args.envs, args.workers, obs_type=args.obs, frame_skip=args.frame_skip)
+    try:
+        envs.reset(seed=0)
+        batches = max(1, args.steps // args.envs)
+        started = time.perf_counter()
+        episodes = 0
+        for _ in range(batches):
+            _, _, _, _, infos = envs.step(rng.integers(NUM_ACTIONS, size=args.envs))
+            episodes += sum("episode" in info for info in infos)
+        elapsed = time.perf_counter() - started
+        print(f"{args.envs} envs on {len(envs.processes)} workers: {batches * args.envs / elapsed:>9.0f} steps/s "
+              f"({episodes} episodes finished, obs batch {envs.obs.shape} {envs.obs.dtype})")
+    finally:
+        envs.close()
+
+
+if __name__ == "__main__":
+    main_cli()
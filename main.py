@@ -1,825 +1,1624 @@
-import pygame
-import sys
-import random
-import time
-import math
-import ollama
-import threading
-
-# --- Sound Initialization ---
-pygame.mixer.pre_init(44100, -16, 2, 512)
-pygame.init()
-pygame.mixer.init()
-
-# --- AI Model Selection ---
-AI_MODEL = 'phi3:mini'
-
-# --- OLLAMA AI Configuration ---
-try:
-    client = ollama.Client()
-    client.show(AI_MODEL)
-    print(f"Ollama client connected successfully. Model '{AI_MODEL}' is available.")
-    LOCAL_AI_ENABLED = True
-except Exception as e:
-    print(f"Error connecting to Ollama or finding model: {e}")
-    print(f"AI functionality disabled. Ensure Ollama is running and '{AI_MODEL}' is downloaded.")
-    LOCAL_AI_ENABLED = False
-
-# --- Constants & Colors ---
-SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
-WHITE, BLACK, RED, GREEN, YELLOW = (255, 255, 255), (0, 0, 0), (255, 0, 0), (0, 255, 0), (255, 255, 0)
-PURPLE, BRIGHT_PURPLE, ORANGE, CYAN = (128, 0, 128), (220, 120, 255), (255, 165, 0), (0, 255, 255)
-GREY = (128, 128, 128)
-NUM_STARS = 100
-WAVE_COOLDOWN = 3000
-
-# --- Caching & Asset Generation ---
-FONT_CACHE = {}
-
-def generate_sound(frequency, duration_ms):
-    sample_rate = pygame.mixer.get_init()[0]
-    max_amp = 2 ** (pygame.mixer.get_init()[1] * -1 - 1) - 1
-    length = int(sample_rate * (duration_ms / 1000.0))
-    buf = bytearray(length * 2)
-    for i in range(length):
-        wave = max_amp if (i // (sample_rate // frequency // 2)) % 2 == 0 else -max_amp
-        wave = int(wave * ((length - i) / length))
-        packed_wave = wave.to_bytes(2, byteorder='little', signed=True)
-        buf[i*2] = packed_wave[0]
-        buf[i*2+1] = packed_wave[1]
-    return pygame.mixer.Sound(buffer=buf)
-
-laser_charge_sound = generate_sound(200, 1000)
-laser_fire_sound = generate_sound(800, 200)
-bomb_sound = generate_sound(100, 1500)
-player_hit_sound = generate_sound(150, 500)
-
-def draw_text(surf, text, size, x, y, color=WHITE, align="midtop"):
-    if size not in FONT_CACHE:
-        FONT_CACHE[size] = pygame.font.Font(pygame.font.match_font('arial'), size)
-    font = FONT_CACHE[size]
-    text_surface = font.render(text, True, color)
-    text_rect = text_surface.get_rect()
-    setattr(text_rect, align, (x, y))
-    surf.blit(text_surface, text_rect)
-
-# --- Art Functions ---
-def create_enemy_sprite():
-    sprite = pygame.Surface([32, 24], pygame.SRCALPHA)
-    pygame.draw.ellipse(sprite, RED, (0, 0, 32, 20))
-    pygame.draw.rect(sprite, YELLOW, (13, 4, 6, 12))
-    return sprite
-
-def create_boss_sprite():
-    sprite = pygame.Surface([160, 80], pygame.SRCALPHA)
-    pygame.draw.rect(sprite, PURPLE, (0, 10, 160, 60))
-    pygame.draw.rect(sprite, BRIGHT_PURPLE, (10, 20, 140, 40), 4)
-    pygame.draw.polygon(sprite, YELLOW, [(0, 10), (20, 40), (0, 70)])
-    pygame.draw.polygon(sprite, YELLOW, [(160, 10), (140, 40), (160, 70)])
-    pygame.draw.rect(sprite, RED, (70, 0, 20, 15))
-    return sprite
-
-def create_interceptor_sprite():
-    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
-    pygame.draw.polygon(sprite, WHITE, [(20, 0), (0, 35), (20, 25), (40, 35)])
-    pygame.draw.rect(sprite, CYAN, (17, 20, 6, 10))
-    return sprite
-
-def create_striker_sprite():
-    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
-    pygame.draw.polygon(sprite, (200, 200, 255), [(20, 0), (0, 35), (40, 35)])
-    pygame.draw.rect(sprite, CYAN, (10, 20, 6, 10))
-    pygame.draw.rect(sprite, CYAN, (24, 20, 6, 10))
-    return sprite
-
-def create_tank_sprite():
-    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
-    pygame.draw.rect(sprite, GREY, (5, 5, 30, 30))
-    pygame.draw.polygon(sprite, WHITE, [(20, 0), (0, 35), (20, 25), (40, 35)], 2)
-    pygame.draw.rect(sprite, CYAN, (17, 20, 6, 10))
-    return sprite
-
-def create_wraith_sprite():
-    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
-    pygame.draw.polygon(sprite, YELLOW, [(20, 0), (5, 40), (35, 40)])
-    pygame.draw.polygon(sprite, WHITE, [(20, 5), (10, 35), (30, 35)])
-    pygame.draw.rect(sprite, CYAN, (17, 20, 6, 10))
-    return sprite
-
-JET_TYPES = {
-    "Interceptor": {"sprite_func": create_interceptor_sprite, "speed": 8, "bullet_type": "single", "lives": 1, "bombs": 3, "description": "A balanced, all-around fighter."},
-    "Striker": {"sprite_func": create_striker_sprite, "speed": 7, "bullet_type": "double", "lives": 1, "bombs": 1, "description": "High firepower."},
-    "Tank": {"sprite_func": create_tank_sprite, "speed": 6, "bullet_type": "single", "lives": 3, "bombs": 2, "description": "Heavily armored."},
-    "Wraith": {"sprite_func": create_wraith_sprite, "speed": 11, "bullet_type": "single", "lives": 1, "bombs": 2, "description": "A high-speed jet."}
-}
-
-# --- Game Object Classes ---
-class Starfield:
-    def __init__(self, num_stars=NUM_STARS):
-        self.stars = [[random.randrange(0, SCREEN_WIDTH), random.randrange(0, SCREEN_HEIGHT), random.randint(1, 3)] for _ in range(num_stars)]
-    def update(self):
-        for star in self.stars:
-            star[1] += star[2] * 0.5
-            if star[1] > SCREEN_HEIGHT:
-                star[1] = 0
-                star[0] = random.randrange(0, SCREEN_WIDTH)
-    def draw(self, surface):
-        for x, y, size in self.stars:
-            pygame.draw.rect(surface, WHITE, (x, y, size, size))
-
-class Player(pygame.sprite.Sprite):
-    def __init__(self, jet_type):
-        super().__init__()
-        stats = JET_TYPES[jet_type]
-        self.image = stats["sprite_func"]()
-        self.rect = self.image.get_rect(centerx=SCREEN_WIDTH / 2, bottom=SCREEN_HEIGHT - 10)
-        self.speed_x, self.bullet_type, self.lives, self.bombs = stats["speed"], stats["bullet_type"], stats["lives"], stats["bombs"]
-        self.power = 1
-        self.invincible, self.invincible_timer, self.invincible_duration = False, 0, 3000
-    def shoot(self, all_sprites, bullets):
-        if self.bullet_type == 'single':
-            b = Bullet(self.rect.centerx, self.rect.top, self.power)
-            all_sprites.add(b)
-            bullets.add(b)
-        elif self.bullet_type == 'double':
-            b1 = Bullet(self.rect.left + 10, self.rect.top, self.power)
-            b2 = Bullet(self.rect.right - 10, self.rect.top, self.power)
-            all_sprites.add(b1, b2)
-            bullets.add(b1, b2)
-    def shoot_super_laser(self, all_sprites, player_lasers):
-        l = PlayerLaser(self.rect.centerx, self.rect.top)
-        all_sprites.add(l)
-        player_lasers.add(l)
-    def use_bomb(self, repulsors):
-        if self.bombs > 0:
-            self.bombs -= 1
-            bomb_sound.play()
-            r = Repulsor(self.rect.center)
-            repulsors.add(r)
-    def powerup(self, type):
-        if type == 'speed':
-            self.speed_x += 1
-        elif type == 'power':
-            self.power = min(self.power + 1, 5)
-    def get_hit(self):
-        if not self.invincible:
-            player_hit_sound.play()
-            self.lives -= 1
-            self.power = max(1, self.power - 1)
-            if self.lives > 0:
-                self.invincible = True
-                self.invincible_timer = pygame.time.get_ticks()
-                self.rect.centerx = SCREEN_WIDTH / 2
-    def update(self, playable_left, playable_right):
-        if self.invincible and pygame.time.get_ticks() - self.invincible_timer > self.invincible_duration:
-            self.invincible = False
-        h_speed = 0
-        keystate = pygame.key.get_pressed()
-        if keystate[pygame.K_LEFT]:
-            h_speed -= self.speed_x
-        if keystate[pygame.K_RIGHT]:
-            h_speed += self.speed_x
-        self.rect.x += h_speed
-        self.rect.right = min(self.rect.right, playable_right)
-        self.rect.left = max(self.rect.left, playable_left)
-        self.image.set_alpha(128 if self.invincible and (pygame.time.get_ticks() // 100) % 2 == 0 else 255)
-
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, x, y, power=1):
-        super().__init__()
-        self.image = pygame.Surface([4 + (power * 2), 12])
-        self.image.fill(CYAN)
-        self.rect = self.image.get_rect(centerx=x, bottom=y)
-        self.speed_y = -10
-        self.damage = 10 * power
-    def update(self):
-        self.rect.y += self.speed_y
-        if self.rect.bottom < 0:
-            self.kill()
-
-class PlayerLaser(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = pygame.Surface([20, SCREEN_HEIGHT])
-        self.image.fill(CYAN)
-        self.rect = self.image.get_rect(centerx=x, bottom=y)
-        self.spawn_time = pygame.time.get_ticks()
-    def update(self):
-        if pygame.time.get_ticks() - self.spawn_time > 500:
-            self.kill()
-
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self):
-        super().__init__()
-        self.image = create_enemy_sprite()
-        self.rect = self.image.get_rect(x=random.randrange(SCREEN_WIDTH - 32), y=random.randrange(-150, -50))
-        self.speed_y = random.randrange(1, 5)
-        self.health = 10
-    def update(self):
-        self.rect.y += self.speed_y
-        if self.rect.top > SCREEN_HEIGHT + 20:
-            self.kill()
-
-class BossBullet(pygame.sprite.Sprite):
-    def __init__(self, x, y, speed_x=0, speed_y=6):
-        super().__init__()
-        self.image = pygame.Surface([12, 12], pygame.SRCALPHA)
-        pygame.draw.circle(self.image, ORANGE, (6, 6), 6)
-        self.rect = self.image.get_rect(centerx=x, top=y)
-        self.speed_x, self.speed_y = speed_x, speed_y
-    def update(self):
-        self.rect.x += self.speed_x
-        self.rect.y += self.speed_y
-        if not screen.get_rect().colliderect(self.rect):
-            self.kill()
-
-class Mine(pygame.sprite.Sprite):
-    def __init__(self, center):
-        super().__init__()
-        self.image = pygame.Surface([20, 20], pygame.SRCALPHA)
-        self.rect = self.image.get_rect(center=center)
-        self.spawn_time = pygame.time.get_ticks()
-        self.lifetime = 8000  # 8 seconds
-        self.warn_time = 1000 # 1 second warning period
-        self.warn_color = YELLOW
-        self.active_color = ORANGE
-
-    def update(self):
-        now = pygame.time.get_ticks()
-        time_alive = now - self.spawn_time
-
-        if time_alive > self.lifetime:
-            self.kill()
-            return
-
-        self.image.fill((0,0,0,0)) # Clear previous frame
-        if time_alive < self.warn_time:
-            if (now // 150) % 2 == 0:
-                pygame.draw.circle(self.image, self.warn_color, (10, 10), 10)
-        else:
-            color = self.active_color if (now // 250) % 2 == 0 else RED
-            pygame.draw.circle(self.image, color, (10, 10), 10)
-
-class Laser(pygame.sprite.Sprite):
-    def __init__(self, boss_rect):
-        super().__init__()
-        self.boss_rect = boss_rect
-        self.image = pygame.Surface([10, SCREEN_HEIGHT - boss_rect.bottom])
-        self.image.fill(BRIGHT_PURPLE)
-        self.rect = self.image.get_rect(centerx=self.boss_rect.centerx, top=self.boss_rect.bottom)
-        self.spawn_time = pygame.time.get_ticks()
-        self.state = "charging"
-        laser_charge_sound.play()
-    def update(self):
-        self.rect.centerx = self.boss_rect.centerx
-        now = pygame.time.get_ticks()
-        if self.state == "charging" and now - self.spawn_time > 1000:
-            self.state = "firing"
-            center_pos = self.rect.center
-            self.image = pygame.Surface([80, SCREEN_HEIGHT - self.rect.top])
-            self.image.fill(RED)
-            self.rect = self.image.get_rect(center=center_pos)
-            laser_charge_sound.stop()
-            laser_fire_sound.play()
-        if now - self.spawn_time > 2000:
-            self.kill()
-
-class HomingMissile(pygame.sprite.Sprite):
-    def __init__(self, x, y, player_ref):
-        super().__init__()
-        self.original_image = pygame.Surface([10, 20], pygame.SRCALPHA)
-        pygame.draw.polygon(self.original_image, ORANGE, [(5, 0), (0, 20), (10, 20)])
-        self.image = self.original_image
-        self.rect = self.image.get_rect(center=(x,y))
-        self.player = player_ref
-        self.pos = pygame.Vector2(x, y)
-        self.speed = 3
-        self.update_counter = 0
-    def update(self):
-        self.update_counter += 1
-        if not self.player.alive():
-            self.kill()
-            return
-        direction_to_player = pygame.Vector2(self.player.rect.center) - self.pos
-        if direction_to_player.length_squared() > 0:
-            if self.update_counter % 3 == 0:
-                angle = direction_to_player.angle_to(pygame.Vector2(0, -1))
-                self.image = pygame.transform.rotate(self.original_image, angle)
-                self.rect = self.image.get_rect(center=self.pos)
-            self.pos += direction_to_player.normalize() * self.speed
-            self.rect.center = self.pos
-        if not screen.get_rect().colliderect(self.rect):
-            self.kill()
-
-class PowerUp(pygame.sprite.Sprite):
-    def __init__(self, center):
-        super().__init__()
-        self.type = random.choice(['speed', 'power'])
-        self.image = pygame.Surface([30, 30], pygame.SRCALPHA)
-        color = GREEN if self.type == 'speed' else YELLOW
-        pygame.draw.rect(self.image, color, self.image.get_rect(), 0, 5)
-        draw_text(self.image, 'S' if self.type == 'speed' else 'P', 24, 15, 2, BLACK, align="midtop")
-        self.rect = self.image.get_rect(center=center)
-        self.speed_y = 3
-    def update(self):
-        self.rect.y += self.speed_y
-        if self.rect.top > SCREEN_HEIGHT:
-            self.kill()
-
-class Repulsor(pygame.sprite.Sprite):
-    def __init__(self, center):
-        super().__init__()
-        self.center = center
-        self.radius = 10
-        self.max_radius = SCREEN_WIDTH
-        self.growth_rate = 30
-        self.rect = pygame.Rect(center[0] - self.radius, center[1] - self.radius, self.radius * 2, self.radius * 2)
-    def update(self):
-        self.radius += self.growth_rate
-        self.rect.center = self.center
-        self.rect.size = (self.radius * 2, self.radius * 2)
-        if self.radius > self.max_radius:
-            self.kill()
-
-class Boss(pygame.sprite.Sprite):
-    def __init__(self, player_ref):
-        super().__init__()
-        self.image = create_boss_sprite()
-        self.rect = self.image.get_rect(centerx=SCREEN_WIDTH / 2, top=50)
-        self.speed_x, self.max_health, self.health = 3, 2500, 2500
-        self.ai_client = client if LOCAL_AI_ENABLED else None
-        self.is_thinking = False
-        self.ai_thread = None
-        self.action_sequence = []
-        self.next_action_sequence = None
-        self.fallback_sequence = ["SPREAD_SHOT", "MOVE_RIGHT", "CIRCLE_SHOT", "MOVE_LEFT", "SINGLE_SHOT"]
-        self.ai_request_cooldown = 10000
-        self.last_ai_request_time = -self.ai_request_cooldown
-        self.enraged = False
-        self.desperation_mode = False
-        self.dialogue_text = ""
-        self.dialogue_timer = 0
-        self.final_stand_activated = False
-        self.player = player_ref
-        self.current_move_direction = "MOVE_RIGHT"
-        self.move_timer = 0
-        self.move_interval = 2000
-        self.is_shielded = False
-        self.shield_timer = 0
-        self.shield_duration = 4000
-        self.shield_health_thresholds = [0.75, 0.50, 0.25]
-        self.health_to_regain_on_disable = self.max_health * 0.05
-        self.last_minion_summon_time = pygame.time.get_ticks()
-        self.minion_summon_interval = 30000
-        self.action_cooldown = 250
-        self.last_action_time = 0
-        self.passive_attack_timer = pygame.time.get_ticks()
-        self.passive_attack_interval = random.randint(1500, 2500)
-    def set_dialogue(self, text, duration_ms):
-        self.dialogue_text = text
-        self.dialogue_timer = pygame.time.get_ticks() + duration_ms
-    def request_new_ai_sequence(self, player_bullets_group, num_minions):
-        current_time = pygame.time.get_ticks()
-        if not self.is_thinking and self.ai_client and (current_time - self.last_ai_request_time > self.ai_request_cooldown):
-            self.is_thinking = True
-            self.last_ai_request_time = current_time
-            self.ai_thread = threading.Thread(target=self.get_ai_action, args=(player_bullets_group, num_minions))
-            self.ai_thread.start()
-            print("AI is thinking...")
-    def get_ai_action(self, player_bullets_group, num_minions):
-        final_action_sequence = self.fallback_sequence.copy()
-        try:
-            health_pct = int((self.health / self.max_health) * 100)
-            available_actions = "SINGLE_SHOT, SPREAD_SHOT, VOLLEY_SHOT, CIRCLE_SHOT, DODGE, MOVE_LEFT, MOVE_RIGHT, HOMING_MISSILE, LAY_MINES"
-            if self.enraged:
-                available_actions += ", LASER_SWEEP"
-            system_prompt = f"""You are a game boss AI. Your goal is to be aggressive. Your only valid actions are: {available_actions}. RULES: 1. Respond with a comma-separated sequence of 3 to 4 actions. 2. The sequence must contain at least two attack actions. 3. Your response MUST be ONLY the comma-separated list. Example: SPREAD_SHOT,MOVE_LEFT,HOMING_MISSILE"""
-            user_prompt = f"My Health: {health_pct}%. Enraged? {'Yes' if self.enraged else 'No'}."
-            response = self.ai_client.chat(model=AI_MODEL, messages=[{'role': 'system', 'content': system_prompt}, {'role': 'user', 'content': user_prompt}])
-            raw_response = response['message']['content'].strip().upper()
-            valid_actions_list = [action.strip() for action in available_actions.split(',')]
-            potential_actions = [action.strip() for action in raw_response.split(',')]
-            validated_actions = [action for action in potential_actions if action in valid_actions_list]
-            if validated_actions and len(validated_actions) >= 2:
-                final_action_sequence = validated_actions
-                print(f"AI decided: {final_action_sequence}")
-            else:
-                print(f"AI Warning: Invalid sequence '{raw_response}'. Using fallback.")
-        except Exception as e:
-            print(f"Ollama AI error: {e}")
-        finally:
-            self.next_action_sequence = final_action_sequence
-            self.is_thinking = False
-    def single_shot(self, all_sprites, boss_bullets):
-        b = BossBullet(self.rect.centerx, self.rect.bottom, speed_y=8)
-        all_sprites.add(b)
-        boss_bullets.add(b)
-    def spread_shot(self, all_sprites, boss_bullets):
-        for i in range(-1, 2):
-            b = BossBullet(self.rect.centerx, self.rect.bottom, speed_x=(i * 3), speed_y=5)
-            all_sprites.add(b)
-            boss_bullets.add(b)
-    def volley_shot(self, all_sprites, boss_bullets):
-        for i in range(3):
-            b = BossBullet(self.rect.centerx, self.rect.bottom + (i * 40), speed_y=7)
-            all_sprites.add(b)
-            boss_bullets.add(b)
-    def circle_shot(self, all_sprites, boss_bullets):
-        print("Boss: CIRCLE SHOT!")
-        num_bullets = 12
-        for i in range(num_bullets):
-            angle = i * (360 / num_bullets)
-            speed_x = 4 * math.cos(math.radians(angle))
-            speed_y = 4 * math.sin(math.radians(angle))
-            b = BossBullet(self.rect.centerx, self.rect.centery, speed_x, speed_y)
-            all_sprites.add(b)
-            boss_bullets.add(b)
-    def laser_sweep(self, all_sprites, boss_bullets):
-        print("Boss: LASER!")
-        l = Laser(self.rect)
-        all_sprites.add(l)
-        boss_bullets.add(l)
-    def homing_missile(self, all_sprites, boss_bullets):
-        print("Boss: MISSILE!")
-        m = HomingMissile(self.rect.centerx, self.rect.bottom, self.player)
-        all_sprites.add(m)
-        boss_bullets.add(m)
-    def lay_mines(self, all_sprites, boss_bullets):
-        print("Boss: LAYING MINES!")
-        self.set_dialogue("Watch your step!", 2000)
-        for _ in range(random.randint(3, 5)):
-            mine_x = self.rect.centerx + random.randint(-250, 250)
-            mine_y = self.rect.bottom + random.randint(50, 250)
-            mine_x = max(20, min(SCREEN_WIDTH - 20, mine_x))
-            mine_y = max(150, min(SCREEN_HEIGHT - 100, mine_y))
-            m = Mine(center=(mine_x, mine_y))
-            all_sprites.add(m)
-            boss_bullets.add(m)
-    def summon_minions(self, all_sprites, enemies_group):
-        if len(enemies_group) > 30:
-            print("Boss: Too many minions.")
-            return
-        print("Boss: SUMMON!")
-        self.set_dialogue("My servants will destroy you!", 3000)
-        for _ in range(random.randint(8, 12)):
-            e = Enemy()
-            all_sprites.add(e)
-            enemies_group.add(e)
-    def update(self, all_sprites, bullets, boss_bullets, enemies_group):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.last_minion_summon_time > self.minion_summon_interval:
-            if not self.is_shielded:
-                self.summon_minions(all_sprites, enemies_group)
-            self.last_minion_summon_time = current_time
-        health_percent = self.health / self.max_health
-        if self.shield_health_thresholds and health_percent < self.shield_health_thresholds[0] and not self.is_shielded:
-            self.is_shielded = True
-            self.shield_timer = current_time + self.shield_duration
-            self.shield_health_thresholds.pop(0)
-            self.set_dialogue("You cannot pierce this barrier!", 3000)
-            self.action_sequence = []
-        if self.is_shielded:
-            if current_time > self.shield_timer:
-                self.is_shielded = False
-                self.health = min(self.max_health, self.health + self.health_to_regain_on_disable)
-            return
-        if not self.final_stand_activated and health_percent < 0.10:
-            self.final_stand_activated = True
-            print("BOSS: FINAL STAND!")
-            self.set_dialogue("I WILL NOT BE DEFEATED!", 4000)
-            self.desperation_mode = True
-            self.summon_minions(all_sprites, enemies_group)
-            self.summon_minions(all_sprites, enemies_group)
-            self.action_sequence.clear()
-            self.action_sequence.insert(0, "LASER_SWEEP")
-        if not self.enraged and health_percent < 0.5:
-            self.enraged = True
-            print("BOSS IS ENRAGED!")
-            self.set_dialogue("ENOUGH! FEEL MY WRATH!", 3000)
-            self.action_sequence.insert(0, "LASER_SWEEP")
-        if not self.action_sequence:
-            if self.next_action_sequence:
-                self.action_sequence = self.next_action_sequence
-                self.next_action_sequence = None
-            else:
-                self.request_new_ai_sequence(bullets, len(enemies_group))
-                if not self.is_thinking:
-                    self.action_sequence = self.fallback_sequence.copy()
-        if self.action_sequence and current_time - self.last_action_time > self.action_cooldown:
-            self.last_action_time = current_time
-            action = self.action_sequence.pop(0)
-            action_map = {"SINGLE_SHOT":self.single_shot, "SPREAD_SHOT":self.spread_shot, "VOLLEY_SHOT":self.volley_shot, "CIRCLE_SHOT":self.circle_shot, "LASER_SWEEP":self.laser_sweep, "HOMING_MISSILE":self.homing_missile, "LAY_MINES":self.lay_mines}
-            if action in action_map:
-                action_map[action](all_sprites, boss_bullets)
-            elif action == "DODGE":
-                self.rect.x += random.choice([-90, 90])
-            elif action in ["MOVE_LEFT", "MOVE_RIGHT"]:
-                self.current_move_direction = action
-        if current_time - self.move_timer > self.move_interval:
-            self.move_timer = current_time
-            self.current_move_direction = random.choice(["MOVE_LEFT", "MOVE_RIGHT"])
-        self.rect.x += self.speed_x * (1 if self.current_move_direction == "MOVE_RIGHT" else -1)
-        if self.rect.left < 0:
-            self.rect.left = 0
-            self.current_move_direction = "MOVE_RIGHT"
-        if self.rect.right > SCREEN_WIDTH:
-            self.rect.right = SCREEN_WIDTH
-            self.current_move_direction = "MOVE_LEFT"
-        if not self.is_shielded and current_time - self.passive_attack_timer > self.passive_attack_interval:
-            self.passive_attack_timer = current_time
-            self.passive_attack_interval = random.randint(1500, 2500)
-            random.choice([self.single_shot, self.spread_shot])(all_sprites, boss_bullets)
-            print("Boss: Passive Attack!")
-
-def show_controls_screen(surface):
-    starfield = Starfield()
-    clock = pygame.time.Clock()
-    start_time = pygame.time.get_ticks()
-    duration = 5000
-
-    while pygame.time.get_ticks() - start_time < duration:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-        starfield.update()
-        surface.fill(BLACK)
-        starfield.draw(surface)
-
-        draw_text(surface, "PIXEL VENGEANCE AI", 64, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 4)
-        draw_text(surface, "Arrow Keys: Dodge the cosmic storm!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
-        draw_text(surface, "Spacebar: Unleash pixelated fury!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 40)
-        draw_text(surface, "Left Shift: Charge the SUPER LASER!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 80)
-        draw_text(surface, "C Key: Drop a reality-warping bomb!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 120)
-
-        remaining_time = max(0, (duration - (pygame.time.get_ticks() - start_time)) // 1000 + 1)
-        draw_text(surface, f"Get ready in {remaining_time}...", 18, SCREEN_WIDTH / 2, SCREEN_HEIGHT * 0.75, YELLOW)
-
-        pygame.display.flip()
-        clock.tick(60)
-
-def show_jet_selection_screen(surface):
-    starfield = Starfield()
-    jet_names = list(JET_TYPES.keys())
-    selected_index = 0
-    selecting = True
-    clock = pygame.time.Clock()
-    while selecting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RIGHT:
-                    selected_index = (selected_index + 1) % len(jet_names)
-                if event.key == pygame.K_LEFT:
-                    selected_index = (selected_index - 1) % len(jet_names)
-                if event.key == pygame.K_RETURN:
-                    return jet_names[selected_index]
-
-        starfield.update()
-        surface.fill(BLACK)
-        starfield.draw(surface)
-
-        draw_text(surface, "CHOOSE YOUR JET", 50, SCREEN_WIDTH / 2, 50)
-        jet_stats = JET_TYPES[jet_names[selected_index]]
-        jet_sprite = jet_stats["sprite_func"]()
-        surface.blit(jet_sprite, jet_sprite.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50)))
-        draw_text(surface, jet_names[selected_index].upper(), 36, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 50)
-        draw_text(surface, jet_stats["description"], 20, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100, YELLOW)
-        stats_text = f"Lives: {jet_stats['lives']} | Bombs: {jet_stats['bombs']} | Speed: {jet_stats['speed']}"
-        draw_text(surface, stats_text, 20, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 150)
-        draw_text(surface, "Use Arrow Keys to Navigate, Enter to Select", 18, SCREEN_WIDTH / 2, SCREEN_HEIGHT - 50, GREY)
-        pygame.display.flip()
-        clock.tick(60)
-
-def start_new_wave(wave_num):
-    global is_wave_active, enemies_to_spawn_this_wave, enemies_spawned_this_wave, enemy_spawn_interval
-    is_wave_active = True
-    enemies_to_spawn_this_wave = 10 + (wave_num * 5)
-    enemies_spawned_this_wave = 0
-    enemy_spawn_interval = max(100, 500 - (wave_num * 80))
-    print(f"--- WAVE {wave_num} INCOMING! ({enemies_to_spawn_this_wave} enemies, spawning every {enemy_spawn_interval}ms) ---")
-
-def draw_health_bar(surf, x, y, pct):
-    BAR_LENGTH, BAR_HEIGHT = 150, 20
-    fill = (pct / 100) * BAR_LENGTH
-    outline_rect = pygame.Rect(x, y, BAR_LENGTH, BAR_HEIGHT)
-    fill_rect = pygame.Rect(x, y, max(0, fill), BAR_HEIGHT)
-    pygame.draw.rect(surf, GREEN, fill_rect)
-    pygame.draw.rect(surf, WHITE, outline_rect, 2)
-
-def draw_charge_bar(surf, x, y, pct):
-    BAR_LENGTH, BAR_HEIGHT = 150, 20
-    fill = (min(100, max(0, pct)) / 100) * BAR_LENGTH
-    outline_rect = pygame.Rect(x, y, BAR_LENGTH, BAR_HEIGHT)
-    fill_rect = pygame.Rect(x, y, fill, BAR_HEIGHT)
-    pygame.draw.rect(surf, YELLOW, fill_rect)
-    pygame.draw.rect(surf, WHITE, outline_rect, 2)
-
-# --- Game Setup ---
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Pixel Vengeance AI")
-clock = pygame.time.Clock()
-show_controls_screen(screen)
-chosen_jet = show_jet_selection_screen(screen)
-all_sprites = pygame.sprite.Group()
-enemies = pygame.sprite.Group()
-bullets = pygame.sprite.Group()
-boss_bullets = pygame.sprite.Group()
-player_lasers = pygame.sprite.Group()
-powerups = pygame.sprite.Group()
-repulsors = pygame.sprite.Group()
-boss_group = pygame.sprite.GroupSingle()
-player = Player(chosen_jet)
-all_sprites.add(player)
-score = 0
-starfield = Starfield()
-player_laser_charge = 0
-PLAYER_LASER_MAX_CHARGE = 1000
-running, game_over_message, current_wave, max_waves = True, "", 0, 3
-playable_left, playable_right = 0, SCREEN_WIDTH
-wave_clear_time = 0
-
-is_wave_active = False
-enemies_to_spawn_this_wave = 0
-enemies_spawned_this_wave = 0
-last_enemy_spawn_time = 0
-enemy_spawn_interval = 500
-
-wave_clear_time = pygame.time.get_ticks()
-
-# --- MAIN GAME LOOP ---
-while running:
-    dt = clock.tick(60)
-    current_time = pygame.time.get_ticks()
-    if player.alive() and player_laser_charge < PLAYER_LASER_MAX_CHARGE:
-        player_laser_charge += 1
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q):
-            running = False
-        elif event.type == pygame.KEYDOWN and player.alive():
-            if event.key == pygame.K_SPACE:
-                player.shoot(all_sprites, bullets)
-            if event.key == pygame.K_LSHIFT and player_laser_charge >= PLAYER_LASER_MAX_CHARGE:
-                player.shoot_super_laser(all_sprites, player_lasers)
-                player_laser_charge = 0
-            if event.key == pygame.K_c:
-                player.use_bomb(repulsors)
-
-    # --- UPDATE SECTION ---
-    # This is the corrected update logic.
-    # Update components that don't need special arguments first.
-    starfield.update()
-    repulsors.update()
-    enemies.update()
-    bullets.update()
-    boss_bullets.update()
-    player_lasers.update()
-    powerups.update()
-
-    # Now, update the Player and Boss with their required arguments.
-    if player.alive():
-        player.update(playable_left, playable_right)
-
-    boss = boss_group.sprite
-    if boss:
-        boss.update(all_sprites, bullets, boss_bullets, enemies)
-        if boss.desperation_mode:
-            shrink_speed = 0.5
-            playable_left = min(playable_left + shrink_speed, SCREEN_WIDTH / 2 - 50)
-            playable_right = max(playable_right - shrink_speed, SCREEN_WIDTH / 2 + 50)
-            if playable_left >= playable_right:
-                game_over_message = "CRUSHED!"
-                running = False
-
-    # --- GAME LOGIC SECTION ---
-    if is_wave_active and enemies_spawned_this_wave < enemies_to_spawn_this_wave:
-        if current_time - last_enemy_spawn_time > enemy_spawn_interval:
-            last_enemy_spawn_time = current_time
-            for _ in range(random.randint(1, 2)):
-                if enemies_spawned_this_wave < enemies_to_spawn_this_wave:
-                    e = Enemy()
-                    all_sprites.add(e)
-                    enemies.add(e)
-                    enemies_spawned_this_wave += 1
-
-    if not boss:
-        if is_wave_active and enemies_spawned_this_wave >= enemies_to_spawn_this_wave and not enemies and wave_clear_time == 0:
-            is_wave_active = False
-            wave_clear_time = current_time
-
-        if not is_wave_active and wave_clear_time != 0 and current_time - wave_clear_time > WAVE_COOLDOWN:
-            if current_wave < max_waves:
-                current_wave += 1
-                start_new_wave(current_wave)
-            elif current_wave == max_waves:
-                current_wave += 1
-                new_boss = Boss(player)
-                all_sprites.add(new_boss)
-                boss_group.add(new_boss)
-                new_boss.set_dialogue("I am powered by a vast intelligence...", 5000)
-            wave_clear_time = 0
-
-    enemy_hits = pygame.sprite.groupcollide(enemies, bullets, False, True)
-    for enemy, hit_bullets in enemy_hits.items():
-        for bullet in hit_bullets:
-            enemy.health -= bullet.damage
-        if enemy.health <= 0:
-            score += 100
-            enemy.kill()
-            if random.random() > 0.9:
-                p = PowerUp(enemy.rect.center)
-                all_sprites.add(p)
-                powerups.add(p)
-
-    if player.alive():
-        player_is_hit = False
-        if pygame.sprite.spritecollide(player, enemies, True) or pygame.sprite.spritecollide(player, boss_bullets, True):
-            player_is_hit = True
-        if boss and not player.invincible and pygame.sprite.spritecollide(player, boss_group, False):
-            player_is_hit = True
-        if player_is_hit:
-            player.get_hit()
-
-        for p_up in pygame.sprite.spritecollide(player, powerups, True):
-            player.powerup(p_up.type)
-
-        if player.lives <= 0:
-            game_over_message = "GAME OVER"
-            running = False
-            player.kill()
-
-    for repulsor in repulsors:
-        pygame.sprite.groupcollide(boss_bullets, repulsors, True, False, pygame.sprite.collide_circle)
-        for enemy in enemies:
-            if pygame.sprite.collide_circle(enemy, repulsor):
-                enemy.kill()
-                score += 100
-
-    if player_lasers:
-        score += len(pygame.sprite.groupcollide(enemies, player_lasers, True, False)) * 100
-        if boss and not boss.is_shielded and pygame.sprite.spritecollide(boss, player_lasers, False):
-            boss.health -= 1.5
-            if boss.health <= 0 and boss.alive():
-                boss.kill()
-                score += 5000
-                game_over_message = "YOU WIN!"
-                running = False
-    if boss and not boss.is_shielded:
-        hits = pygame.sprite.groupcollide(boss_group, bullets, False, True)
-        if hits:
-            for hit_bullet in hits[boss]:
-                boss.health -= hit_bullet.damage
-            if boss.health <= 0 and boss.alive():
-                boss.kill()
-                score += 5000
-                game_over_message = "YOU WIN!"
-                running = False
-
-    # --- DRAW SECTION ---
-    screen.fill(BLACK)
-    starfield.draw(screen)
-    all_sprites.draw(screen)
-    for r in repulsors:
-        pygame.draw.circle(screen, CYAN, r.center, int(r.radius), 10)
-    if boss and boss.desperation_mode:
-        pygame.draw.rect(screen, BLACK, (0, 0, playable_left, SCREEN_HEIGHT))
-        pygame.draw.rect(screen, BLACK, (playable_right, 0, SCREEN_WIDTH - playable_right, SCREEN_HEIGHT))
-
-    draw_text(screen, f"SCORE: {score}", 24, SCREEN_WIDTH / 2, 10)
-    draw_text(screen, f"BOMBS: {player.bombs}", 22, SCREEN_WIDTH - 10, 10, align="topright")
-    draw_text(screen, f"LIVES: {player.lives}", 22, 10, 10, align="topleft")
-    if boss:
-        draw_text(screen, "AI BOSS", 18, 5, 35, RED, align="topleft")
-        draw_health_bar(screen, 5, 55, (boss.health / boss.max_health) * 100)
-        if boss.dialogue_timer > current_time:
-            draw_text(screen, boss.dialogue_text, 36, SCREEN_WIDTH / 2, 140, ORANGE)
-        if boss.is_shielded:
-            shield_surf = pygame.Surface(boss.rect.size, pygame.SRCALPHA)
-            pygame.draw.ellipse(shield_surf, (0, 200, 255, 100), (0, 0, boss.rect.width, boss.rect.height))
-            scaled_shield = pygame.transform.scale(shield_surf, (int(boss.rect.width * 1.3), int(boss.rect.height * 1.5)))
-            screen.blit(scaled_shield, scaled_shield.get_rect(center=boss.rect.center))
-        if boss.is_thinking:
-            draw_text(screen, "AI: Analyzing...", 22, SCREEN_WIDTH / 2, 80, YELLOW, align="center")
-
-    if wave_clear_time != 0 and not is_wave_active and not boss and current_wave > 0:
-        draw_text(screen, f"WAVE {current_wave} CLEAR!", 48, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, RED)
-
-    draw_charge_bar(screen, 5, SCREEN_HEIGHT - 25, (player_laser_charge / PLAYER_LASER_MAX_CHARGE) * 100)
-    draw_text(screen, "Laser [L-SHIFT]", 18, 175, SCREEN_HEIGHT - 28, align="topleft")
-    draw_text(screen, "Bomb [C]", 18, 280, SCREEN_HEIGHT - 28, align="topleft")
-
-    pygame.display.flip()
-
-if game_over_message:
-    final_score_text = f"FINAL SCORE: {score}"
-    color = RED if "OVER" in game_over_message or "CRUSHED" in game_over_message else GREEN
-    draw_text(screen, game_over_message, 64, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50, color)
-    draw_text(screen, final_score_text, 32, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 20, WHITE)
-    pygame.display.flip()
-    time.sleep(5)
-
-pygame.quit()
-sys.exit()
\ No newline at end of file
+import time
+STARTUP_T0 = time.perf_counter()
+
+import os
+import sys
+import random
+import math
+import threading
+from functools import lru_cache
+
+# Headless runs (batch playtests) use SDL's dummy drivers: no window, no audio device.
+if os.environ.get("PIXEL_VENGEANCE_HEADLESS"):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import numpy as np
+
+from ai_stream import ActionStream
+from ai_worker import AIRequest, AIWorker
+from collision import SpatialHash
+from decision_cache import DecisionCache, DecisionLog, decision_key
+from patterns import compile_patterns
+from policy import DistilledPolicy
+from pools import PooledSprite, SpritePool
+from profiler import FrameProfiler, ProfilerOverlay
+from projectiles import ProjectileStore
+from recording import Recorder
+from snapshot import dump_world, load_world
+from synth import SoundBank
+
+# --- Sound Initialization ---
+pygame.mixer.pre_init(44100, -16, 2, 512)
+pygame.init()
+pygame.mixer.init()
+
+# --- AI Model Selection ---
+AI_MODEL = 'phi3:mini'
+AI_REQUEST_TIMEOUT_S = 8    # a sequence arriving later than this is dropped
+AI_KEEP_ALIVE = '30m'       # how long Ollama keeps the model loaded between requests
+AI_MAX_ACTIONS = 4          # a streamed reply is cut off once this many valid actions arrived
+AI_MAX_TOKENS = 48          # ... or after this many tokens
+AI_DECISION_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_decisions.json")
+AI_DECISION_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_decision_log.jsonl")
+AI_POLICY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "boss_policy.json")
+# Where boss decisions come from: "model" (Ollama), "policy" (the distilled local policy, see
+# build_policy.py), "scripted" (fallback attacks only), or "auto": the model when it is
+# available, else the policy when one has been built.
+AI_BACKEND = "auto"
+AI_BACKENDS = ("auto", "model", "policy", "scripted")
+
+# --- Startup Report ---
+STARTUP_STAGES = ("first frame", "sprites", "sounds", "AI backend")
+STARTUP_TIMES = {}
+
+def mark_startup(stage):
+    STARTUP_TIMES[stage] = (time.perf_counter() - STARTUP_T0) * 1000
+    if stage in STARTUP_STAGES and all(name in STARTUP_TIMES for name in STARTUP_STAGES):
+        print("Startup: " + " | ".join(f"{name} {STARTUP_TIMES[name]:.0f} ms" for name in STARTUP_STAGES))
+
+# --- OLLAMA AI Configuration ---
+# The backend is probed on the AI worker so startup never waits on it; until
+# the probe answers, LOCAL_AI_ENABLED is None and bosses use scripted attacks.
+client = None
+LOCAL_AI_ENABLED = None
+AI_WORKER = None
+AI_BROKER = None    # an ai_broker.AIBroker shared by every session in the process, see use_ai_broker()
+AI_SIDECAR = None   # an ai_sidecar.AISidecar asking the model from another process, see use_ai_sidecar()
+AI_DECISIONS = DecisionCache(AI_DECISION_CACHE_PATH)
+AI_DECISION_LOG = DecisionLog(AI_DECISION_LOG_PATH)
+AI_POLICY = None
+
+def get_ai_policy():
+    global AI_POLICY
+    if AI_POLICY is None:
+        AI_POLICY = DistilledPolicy.load(AI_POLICY_PATH)
+    return AI_POLICY
+
+def probe_ai_backend():
+    global client, LOCAL_AI_ENABLED
+    try:
+        import ollama  # importing the client library alone takes ~300 ms
+        probe_client = ollama.Client(timeout=AI_REQUEST_TIMEOUT_S)
+        probe_client.show(AI_MODEL)
+        print(f"Ollama client connected successfully. Model '{AI_MODEL}' is available.")
+        client, LOCAL_AI_ENABLED = probe_client, True
+    except Exception as e:
+        print(f"Error connecting to Ollama or finding model: {e}")
+        print(f"AI functionality disabled. Ensure Ollama is running and '{AI_MODEL}' is downloaded.")
+        LOCAL_AI_ENABLED = False
+    mark_startup("AI backend")
+
+def get_ai_worker():
+    """The process-wide boss AI worker; probes the backend and warms the model on first use."""
+    global AI_WORKER
+    if AI_WORKER is None:
+        AI_WORKER = AIWorker()
+        if AI_SIDECAR is None:  # the sidecar probes and warms the model itself
+            AI_WORKER.submit(probe_ai_backend)
+            AI_WORKER.submit(warm_up_model)
+    return AI_WORKER
+
+def warm_up_model():
+    # An empty prompt makes Ollama load the model without generating anything.
+    if LOCAL_AI_ENABLED:
+        client.generate(model=AI_MODEL, prompt="", keep_alive=AI_KEEP_ALIVE)
+
+def fetch_ai_reply(messages):
+    return client.chat(model=AI_MODEL, messages=messages, keep_alive=AI_KEEP_ALIVE)['message']['content']
+
+def stream_ai_reply(messages, stream):
+    """Feed the reply into an ActionStream as it is generated; stop reading once the stream is full."""
+    parts = client.chat(model=AI_MODEL, messages=messages, keep_alive=AI_KEEP_ALIVE, stream=True,
+                        options={"num_predict": AI_MAX_TOKENS})
+    try:
+        for part in parts:
+            if not stream.feed(part['message']['content'] or ""):
+                break
+    finally:
+        parts.close()  # drops the connection, which stops the generation
+        stream.finish()
+    return stream.text()
+
+def use_ai_broker(parallel=4, max_pending=64):
+    """Route every boss in this process through one batching, deduplicating AI broker."""
+    global AI_BROKER
+    from ai_broker import AIBroker
+    AI_BROKER = AIBroker(fetch_ai_reply, parallel=parallel, max_pending=max_pending)
+    return AI_BROKER
+
+def use_ai_sidecar():
+    """Ask the model from a separate process that reads the game state from shared memory."""
+    global AI_SIDECAR
+    from ai_sidecar import AISidecar
+    AI_SIDECAR = AISidecar(AI_MODEL, AI_KEEP_ALIVE, AI_REQUEST_TIMEOUT_S, AI_MAX_ACTIONS, AI_MAX_TOKENS)
+    return AI_SIDECAR
+
+def submit_ai_prompt(messages, timeout_s, valid_actions):
+    """The request for messages, and the ActionStream its reply is parsed into as it arrives.
+
+    The broker shares whole replies between sessions, so brokered requests have no stream.
+    """
+    if AI_SIDECAR is not None:
+        return AI_SIDECAR.submit(messages, valid_actions, timeout_s)
+    if AI_BROKER is not None:
+        return AI_BROKER.submit(messages, timeout_s=timeout_s), None
+    stream = ActionStream(valid_actions, AI_MAX_ACTIONS, AI_MAX_TOKENS)
+    return get_ai_worker().submit(stream_ai_reply, messages, stream, timeout_s=timeout_s), stream
+
+# --- Constants & Colors ---
+SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
+WHITE, BLACK, RED, GREEN, YELLOW = (255, 255, 255), (0, 0, 0), (255, 0, 0), (0, 255, 0), (255, 255, 0)
+PURPLE, BRIGHT_PURPLE, ORANGE, CYAN = (128, 0, 128), (220, 120, 255), (255, 165, 0), (0, 255, 255)
+GREY = (128, 128, 128)
+SCREEN_RECT = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+NUM_STARS = 100
+WAVE_COOLDOWN = 3000
+FPS = 60
+FRAME_MS = 1000 / FPS
+PLAYER_LASER_MAX_CHARGE = 1000
+MAX_STEPS_PER_FRAME = 5       # below FPS / this many rendered frames per second the game slows down instead
+MAX_INTERPOLATION_PX = 64     # a sprite that moved further in one step jumped (respawned, dodged) and is drawn where it is
+
+# Phase timings for the F3 overlay and --profile; every call is a no-op until it is enabled.
+PROFILER = FrameProfiler(budget_ms=FRAME_MS)
+
+# --- Caching & Asset Generation ---
+FONT_CACHE = {}
+TEXT_CACHE_SIZE = 256
+
+# Effects are rendered by synth.SoundBank and cached on disk after the first run.
+SOUND_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sound_cache")
+SOUND_SPECS = {
+    "laser_charge": {"wave": "square", "freq": 200, "end_freq": 900, "duration_ms": 1000, "adsr": (30, 150, 0.6, 200), "volume": 0.5},
+    "laser_fire": {"wave": "saw", "freq": 1600, "end_freq": 300, "duration_ms": 250, "noise": 0.25, "adsr": (2, 60, 0.5, 120), "volume": 0.6, "max_voices": 2},
+    "bomb": {"wave": "square", "freq": 110, "end_freq": 30, "duration_ms": 1500, "noise": 0.7, "volume": 0.8},
+    "player_hit": {"wave": "triangle", "freq": 500, "end_freq": 80, "duration_ms": 500, "noise": 0.3, "volume": 0.8},
+}
+SOUNDS = SoundBank(SOUND_CACHE_DIR)
+
+def build_sounds():
+    SOUNDS.build(SOUND_SPECS)
+    mark_startup("sounds")
+
+def start_asset_warm_up():
+    # Sounds synthesize while the controls screen runs; until then play_sound() is silent.
+    threading.Thread(target=build_sounds, name="asset-warm-up", daemon=True).start()
+
+def play_sound(name):
+    SOUNDS.play(name)
+
+def stop_sound(name):
+    SOUNDS.stop(name)
+
+def get_font(size):
+    if size not in FONT_CACHE:
+        FONT_CACHE[size] = pygame.font.Font(pygame.font.match_font('arial'), size)
+    return FONT_CACHE[size]
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, size, color=WHITE):
+    # Shared read-only Surface; the least recently drawn strings are evicted first.
+    return get_font(size).render(text, True, color)
+
+def aligned_rect(surface, x, y, align="midtop"):
+    rect = surface.get_rect()
+    setattr(rect, align, (x, y))
+    return rect
+
+def draw_text(surf, text, size, x, y, color=WHITE, align="midtop"):
+    text_surface = render_text(text, size, color)
+    return surf.blit(text_surface, aligned_rect(text_surface, x, y, align))
+
+# --- Art Functions ---
+def create_enemy_sprite():
+    sprite = pygame.Surface([32, 24], pygame.SRCALPHA)
+    pygame.draw.ellipse(sprite, RED, (0, 0, 32, 20))
+    pygame.draw.rect(sprite, YELLOW, (13, 4, 6, 12))
+    return sprite
+
+def create_bullet_sprite(power):
+    sprite = pygame.Surface([4 + (power * 2), 12])
+    sprite.fill(CYAN)
+    return sprite
+
+def create_boss_bullet_sprite():
+    sprite = pygame.Surface([12, 12], pygame.SRCALPHA)
+    pygame.draw.circle(sprite, ORANGE, (6, 6), 6)
+    return sprite
+
+def create_missile_sprite():
+    sprite = pygame.Surface([10, 20], pygame.SRCALPHA)
+    pygame.draw.polygon(sprite, ORANGE, [(5, 0), (0, 20), (10, 20)])
+    return sprite
+
+def create_mine_sprite(color):
+    sprite = pygame.Surface([20, 20], pygame.SRCALPHA)
+    if color is not None:  # None is the blank half of the warning blink
+        pygame.draw.circle(sprite, color, (10, 10), 10)
+    return sprite
+
+def create_beam_sprite(width, length, color):
+    sprite = pygame.Surface([width, length])
+    sprite.fill(color)
+    return sprite
+
+def create_shield_sprite(size):
+    width, height = size
+    shield = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.ellipse(shield, (0, 200, 255, 100), (0, 0, width, height))
+    return pygame.transform.scale(shield, (int(width * 1.3), int(height * 1.5)))
+
+def create_powerup_sprite(powerup_type):
+    sprite = pygame.Surface([30, 30], pygame.SRCALPHA)
+    color = GREEN if powerup_type == 'speed' else YELLOW
+    pygame.draw.rect(sprite, color, sprite.get_rect(), 0, 5)
+    draw_text(sprite, 'S' if powerup_type == 'speed' else 'P', 24, 15, 2, BLACK, align="midtop")
+    return sprite
+
+def create_boss_sprite():
+    sprite = pygame.Surface([160, 80], pygame.SRCALPHA)
+    pygame.draw.rect(sprite, PURPLE, (0, 10, 160, 60))
+    pygame.draw.rect(sprite, BRIGHT_PURPLE, (10, 20, 140, 40), 4)
+    pygame.draw.polygon(sprite, YELLOW, [(0, 10), (20, 40), (0, 70)])
+    pygame.draw.polygon(sprite, YELLOW, [(160, 10), (140, 40), (160, 70)])
+    pygame.draw.rect(sprite, RED, (70, 0, 20, 15))
+    return sprite
+
+def create_interceptor_sprite():
+    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
+    pygame.draw.polygon(sprite, WHITE, [(20, 0), (0, 35), (20, 25), (40, 35)])
+    pygame.draw.rect(sprite, CYAN, (17, 20, 6, 10))
+    return sprite
+
+def create_striker_sprite():
+    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
+    pygame.draw.polygon(sprite, (200, 200, 255), [(20, 0), (0, 35), (40, 35)])
+    pygame.draw.rect(sprite, CYAN, (10, 20, 6, 10))
+    pygame.draw.rect(sprite, CYAN, (24, 20, 6, 10))
+    return sprite
+
+def create_tank_sprite():
+    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
+    pygame.draw.rect(sprite, GREY, (5, 5, 30, 30))
+    pygame.draw.polygon(sprite, WHITE, [(20, 0), (0, 35), (20, 25), (40, 35)], 2)
+    pygame.draw.rect(sprite, CYAN, (17, 20, 6, 10))
+    return sprite
+
+def create_wraith_sprite():
+    sprite = pygame.Surface([40, 40], pygame.SRCALPHA)
+    pygame.draw.polygon(sprite, YELLOW, [(20, 0), (5, 40), (35, 40)])
+    pygame.draw.polygon(sprite, WHITE, [(20, 5), (10, 35), (30, 35)])
+    pygame.draw.rect(sprite, CYAN, (17, 20, 6, 10))
+    return sprite
+
+JET_TYPES = {
+    "Interceptor": {"sprite_func": create_interceptor_sprite, "speed": 8, "bullet_type": "single", "lives": 1, "bombs": 3, "description": "A balanced, all-around fighter."},
+    "Striker": {"sprite_func": create_striker_sprite, "speed": 7, "bullet_type": "double", "lives": 1, "bombs": 1, "description": "High firepower."},
+    "Tank": {"sprite_func": create_tank_sprite, "speed": 6, "bullet_type": "single", "lives": 3, "bombs": 2, "description": "Heavily armored."},
+    "Wraith": {"sprite_func": create_wraith_sprite, "speed": 11, "bullet_type": "single", "lives": 1, "bombs": 2, "description": "A high-speed jet."}
+}
+POWERUP_TYPES = ['speed', 'power']
+
+# Boss bullet patterns, see patterns.py for the spec format. Each id is also the boss action that fires it.
+BOSS_PATTERN_SPECS = {
+    "SINGLE_SHOT": {"kind": "shots", "velocities": [(0, 8)]},
+    "SPREAD_SHOT": {"kind": "shots", "velocities": [(-3, 5), (0, 5), (3, 5)]},
+    "VOLLEY_SHOT": {"kind": "shots", "velocities": [(0, 7)] * 3, "offsets": [(0, 0), (0, 40), (0, 80)]},
+    "CIRCLE_SHOT": {"kind": "ring", "count": 12, "speed": 4, "origin": "center", "shout": "CIRCLE SHOT!"},
+    "SPIRAL_SHOT": {"kind": "spiral", "arms": 4, "shots": 16, "turn": 11, "interval_ms": 90, "speed": 3.5, "origin": "center", "shout": "SPIRAL!"},
+    "AIMED_FAN": {"kind": "fan", "count": 3, "spread": 24, "speed": 6, "aimed": True},
+    "AIMED_BURST": {"kind": "sequence", "steps": [(0, "AIMED_FAN"), (180, "AIMED_FAN"), (360, "AIMED_FAN")], "shout": "AIMED BURST!"},
+}
+BOSS_PATTERNS = compile_patterns(BOSS_PATTERN_SPECS)
+MISSILE_ANGLE_STEP = 5    # degrees between the cached rotations of the missile sprite
+MISSILE_HEADINGS = 360 // MISSILE_ANGLE_STEP
+
+# --- Sprite Atlas ---
+# Every static sprite variant is rendered once here. Instances share these
+# Surfaces, so treat them as read-only: never draw on them or set their alpha.
+SPRITE_ATLAS = {}
+
+def build_sprite_atlas():
+    SPRITE_ATLAS["enemy"] = create_enemy_sprite()
+    SPRITE_ATLAS["boss"] = create_boss_sprite()
+    SPRITE_ATLAS["boss_bullet"] = create_boss_bullet_sprite()
+    SPRITE_ATLAS["missile"] = create_missile_sprite()
+    # Homing missiles turn every frame, so every heading they can take is rotated once up front.
+    frames = [pygame.transform.rotate(SPRITE_ATLAS["missile"], heading * MISSILE_ANGLE_STEP) for heading in range(MISSILE_HEADINGS)]
+    SPRITE_ATLAS["missile_frames"] = frames
+    SPRITE_ATLAS["missile_sizes"] = [frame.get_size() for frame in frames]
+    for jet_name, stats in JET_TYPES.items():
+        jet = stats["sprite_func"]()
+        faded = jet.copy()
+        faded.set_alpha(128)
+        SPRITE_ATLAS[("jet", jet_name)] = jet
+        SPRITE_ATLAS[("jet_faded", jet_name)] = faded
+    for power in range(1, 6):
+        SPRITE_ATLAS[("bullet", power)] = create_bullet_sprite(power)
+    for powerup_type in POWERUP_TYPES:
+        SPRITE_ATLAS[("powerup", powerup_type)] = create_powerup_sprite(powerup_type)
+    mark_startup("sprites")
+
+# --- Effect Cache ---
+# Frames of animated effects, keyed by whatever they depend on (color, size,
+# beam length), rendered the first time they are needed and only blitted after
+# that. Same rule as the atlas: the Surfaces are shared and read-only.
+EFFECT_CACHE = {}
+BEAM_LENGTH_STEP = 32   # boss beams are rendered in lengths rounded up to this
+
+def cached_effect(key, render, *args):
+    frame = EFFECT_CACHE.get(key)
+    if frame is None:
+        frame = EFFECT_CACHE[key] = render(*args)
+    return frame
+
+def mine_image(color):
+    return cached_effect(("mine", color), create_mine_sprite, color)
+
+def beam_image(width, length, color):
+    return cached_effect(("beam", width, length, color), create_beam_sprite, width, length, color)
+
+def shield_image(size):
+    return cached_effect(("shield", size), create_shield_sprite, size)
+
+EFFECT_RENDERERS = {"mine": create_mine_sprite, "beam": create_beam_sprite, "shield": create_shield_sprite}
+
+# --- Game Object Classes ---
+class SimClock:
+    """Simulation time in milliseconds. Only advances when the session steps."""
+    def __init__(self, start_ms=0):
+        self.ticks = start_ms
+    def advance(self, dt_ms):
+        self.ticks += dt_ms
+    def get_ticks(self):
+        return int(self.ticks)
+
+@lru_cache(maxsize=6)
+def render_star_layer(size, positions):
+    """One starfield layer; cached so restoring a snapshot of the same run does not render it again."""
+    image = pygame.Surface([SCREEN_WIDTH, SCREEN_HEIGHT])
+    for x, y in positions:
+        image.fill(WHITE, (x, y, size, size))
+    image.set_colorkey(BLACK, pygame.RLEACCEL)
+    return image
+
+class Starfield:
+    """Parallax stars pre-rendered into one wrapping layer per star size.
+
+    Each layer scrolls at its own speed and is drawn with two RLE colorkey
+    blits, instead of one draw call per star.
+    """
+    def __init__(self, num_stars=NUM_STARS, rng=random):
+        stars = [(rng.randrange(0, SCREEN_WIDTH), rng.randrange(0, SCREEN_HEIGHT), rng.randint(1, 3)) for _ in range(num_stars)]
+        self.layers = []
+        for size in (1, 2, 3):
+            positions = tuple((x, y) for x, y, star_size in stars if star_size == size)
+            self.layers.append({"image": render_star_layer(size, positions), "size": size, "speed": size * 0.5, "offset": 0.0, "stars": positions})
+    def __getstate__(self):
+        # Snapshots keep the star positions; the layer images are rendered again from them.
+        return {"layers": [{key: value for key, value in layer.items() if key != "image"} for layer in self.layers]}
+    def __setstate__(self, state):
+        self.layers = [dict(layer, image=render_star_layer(layer["size"], layer["stars"])) for layer in state["layers"]]
+    def update(self):
+        for layer in self.layers:
+            layer["offset"] = (layer["offset"] + layer["speed"]) % SCREEN_HEIGHT
+    def offset(self, layer, alpha=1.0):
+        # Where the layer was alpha of the way through the last update.
+        return int((layer["offset"] - layer["speed"] * (1 - alpha)) % SCREEN_HEIGHT)
+    def draw(self, surface, alpha=1.0):
+        for layer in self.layers:
+            y = self.offset(layer, alpha)
+            surface.blit(layer["image"], (0, y))
+            surface.blit(layer["image"], (0, y - SCREEN_HEIGHT))
+    def star_rects(self, alpha=1.0):
+        rects = []
+        for layer in self.layers:
+            size, offset = layer["size"], self.offset(layer, alpha)
+            for x, y in layer["stars"]:
+                y = (y + offset) % SCREEN_HEIGHT
+                rects.append(pygame.Rect(x, y, size, size))
+                if y + size > SCREEN_HEIGHT:
+                    rects.append(pygame.Rect(x, y - SCREEN_HEIGHT, size, size))
+        return rects
+
+class Player(pygame.sprite.Sprite):
+    def __init__(self, jet_type, clock):
+        super().__init__()
+        self.clock = clock
+        stats = JET_TYPES[jet_type]
+        self.jet_image, self.faded_image = SPRITE_ATLAS[("jet", jet_type)], SPRITE_ATLAS[("jet_faded", jet_type)]
+        self.image = self.jet_image
+        self.rect = self.image.get_rect(centerx=SCREEN_WIDTH / 2, bottom=SCREEN_HEIGHT - 10)
+        self.speed_x, self.bullet_type, self.lives, self.bombs = stats["speed"], stats["bullet_type"], stats["lives"], stats["bombs"]
+        self.power = 1
+        self.invincible, self.invincible_timer, self.invincible_duration = False, 0, 3000
+    def shoot(self, bullets):
+        if self.bullet_type == 'single':
+            fire_bullets(bullets, [self.rect.centerx], self.rect.top, self.power)
+        elif self.bullet_type == 'double':
+            fire_bullets(bullets, [self.rect.left + 10, self.rect.right - 10], self.rect.top, self.power)
+    def shoot_super_laser(self, all_sprites, player_lasers):
+        l = PLAYER_LASER_POOL.acquire(self.rect.centerx, self.rect.top, self.clock)
+        all_sprites.add(l)
+        player_lasers.add(l)
+    def use_bomb(self, repulsors):
+        if self.bombs > 0:
+            self.bombs -= 1
+            play_sound("bomb")
+            r = REPULSOR_POOL.acquire(self.rect.center)
+            repulsors.add(r)
+    def powerup(self, type):
+        if type == 'speed':
+            self.speed_x += 1
+        elif type == 'power':
+            self.power = min(self.power + 1, 5)
+    def get_hit(self):
+        if not self.invincible:
+            play_sound("player_hit")
+            self.lives -= 1
+            self.power = max(1, self.power - 1)
+            if self.lives > 0:
+                self.invincible = True
+                self.invincible_timer = self.clock.get_ticks()
+                self.rect.centerx = SCREEN_WIDTH / 2
+    def update(self, playable_left, playable_right, move_left=False, move_right=False):
+        now = self.clock.get_ticks()
+        if self.invincible and now - self.invincible_timer > self.invincible_duration:
+            self.invincible = False
+        h_speed = 0
+        if move_left:
+            h_speed -= self.speed_x
+        if move_right:
+            h_speed += self.speed_x
+        self.rect.x += h_speed
+        self.rect.right = min(self.rect.right, playable_right)
+        self.rect.left = max(self.rect.left, playable_left)
+        self.image = self.faded_image if self.invincible and (now // 100) % 2 == 0 else self.jet_image
+
+# Player bullets and boss orbs live in ProjectileStores; these place them like the old Sprite rects did.
+def fire_bullets(bullets, xs, bottom, power=1):
+    width = 4 + (power * 2)
+    bullets.spawn_many([x - width // 2 for x in xs], [bottom - 12] * len(xs), width, 12, [0] * len(xs), [-10] * len(xs), damage=10 * power, kind=power - 1)
+
+def fire_boss_bullets(boss_bullets, xs, tops, speeds_x, speeds_y):
+    boss_bullets.spawn_many(np.asarray(xs) - 6, tops, 12, 12, speeds_x, speeds_y)
+
+class PlayerLaser(PooledSprite):
+    def reset(self, x, y, clock):
+        self.image = beam_image(20, SCREEN_HEIGHT, CYAN)
+        self.rect = self.image.get_rect(centerx=x, bottom=y)
+        self.clock = clock
+        self.spawn_time = clock.get_ticks()
+    def update(self):
+        if self.clock.get_ticks() - self.spawn_time > 500:
+            self.kill()
+
+class Enemy(pygame.sprite.Sprite):
+    def __init__(self, rng):
+        super().__init__()
+        self.image = SPRITE_ATLAS["enemy"]
+        self.rect = self.image.get_rect(x=rng.randrange(SCREEN_WIDTH - 32), y=rng.randrange(-150, -50))
+        self.speed_y = rng.randrange(1, 5)
+        self.health = 10
+    def update(self):
+        self.rect.y += self.speed_y
+        if self.rect.top > SCREEN_HEIGHT + 20:
+            self.kill()
+
+class Mine(PooledSprite):
+    def reset(self, center, clock):
+        self.image = mine_image(None)
+        self.rect = self.image.get_rect(center=center)
+        self.clock = clock
+        self.spawn_time = clock.get_ticks()
+        self.lifetime = 8000  # 8 seconds
+        self.warn_time = 1000 # 1 second warning period
+        self.warn_color = YELLOW
+        self.active_color = ORANGE
+
+    def update(self):
+        now = self.clock.get_ticks()
+        time_alive = now - self.spawn_time
+
+        if time_alive > self.lifetime:
+            self.kill()
+            return
+
+        if time_alive < self.warn_time:
+            self.image = mine_image(self.warn_color if (now // 150) % 2 == 0 else None)
+        else:
+            self.image = mine_image(self.active_color if (now // 250) % 2 == 0 else RED)
+
+class Laser(PooledSprite):
+    def beam(self, width, color):
+        """Show a beam from self.rect.top to the bottom of the screen.
+
+        The image comes in BEAM_LENGTH_STEP lengths; it may run past the
+        bottom edge, but the rect, and so the hitbox, ends exactly there.
+        """
+        length = SCREEN_HEIGHT - self.rect.top
+        self.image = beam_image(width, -(-length // BEAM_LENGTH_STEP) * BEAM_LENGTH_STEP, color)
+        self.rect.width, self.rect.height = width, length
+    def reset(self, boss_rect, clock):
+        self.boss_rect = boss_rect
+        self.rect = pygame.Rect(0, boss_rect.bottom, 0, 0)
+        self.beam(10, BRIGHT_PURPLE)
+        self.rect.centerx = boss_rect.centerx
+        self.clock = clock
+        self.spawn_time = clock.get_ticks()
+        self.state = "charging"
+        play_sound("laser_charge")
+    def update(self):
+        self.rect.centerx = self.boss_rect.centerx
+        now = self.clock.get_ticks()
+        if self.state == "charging" and now - self.spawn_time > 1000:
+            self.state = "firing"
+            self.beam(80, RED)
+            self.rect.centerx = self.boss_rect.centerx
+            stop_sound("laser_charge")
+            play_sound("laser_fire")
+        if now - self.spawn_time > 2000:
+            self.kill()
+
+class HomingMissile(PooledSprite):
+    def reset(self, x, y, player_ref):
+        self.heading = 0    # index into the atlas's pre-rotated missile frames
+        self.image = SPRITE_ATLAS["missile_frames"][0]
+        self.rect = self.image.get_rect(center=(x, y))
+        self.player = player_ref
+        self.pos = pygame.Vector2(x, y)
+        self.speed = 3
+    def update(self):
+        if not self.player.alive():
+            self.kill()
+            return
+        pos = self.pos
+        target_x, target_y = self.player.rect.center
+        dx, dy = target_x - pos.x, target_y - pos.y
+        distance = math.hypot(dx, dy)
+        if distance > 0:
+            # Nose toward the player: the clockwise angle from straight up, snapped to the nearest cached frame.
+            heading = round((-90 - math.degrees(math.atan2(dy, dx))) / MISSILE_ANGLE_STEP) % MISSILE_HEADINGS
+            if heading != self.heading:
+                self.heading = heading
+                self.image = SPRITE_ATLAS["missile_frames"][heading]
+                self.rect.size = SPRITE_ATLAS["missile_sizes"][heading]
+            pos.x += dx / distance * self.speed
+            pos.y += dy / distance * self.speed
+            self.rect.center = pos
+        if not SCREEN_RECT.colliderect(self.rect):
+            self.kill()
+
+class PowerUp(pygame.sprite.Sprite):
+    def __init__(self, center, rng):
+        super().__init__()
+        self.type = rng.choice(POWERUP_TYPES)
+        self.image = SPRITE_ATLAS[("powerup", self.type)]
+        self.rect = self.image.get_rect(center=center)
+        self.speed_y = 3
+    def update(self):
+        self.rect.y += self.speed_y
+        if self.rect.top > SCREEN_HEIGHT:
+            self.kill()
+
+class Repulsor(PooledSprite):
+    def reset(self, center):
+        self.center = center
+        self.radius = 10
+        self.max_radius = SCREEN_WIDTH
+        self.growth_rate = 30
+        self.rect = pygame.Rect(center[0] - self.radius, center[1] - self.radius, self.radius * 2, self.radius * 2)
+    def update(self):
+        self.radius += self.growth_rate
+        self.rect.center = self.center
+        self.rect.size = (self.radius * 2, self.radius * 2)
+        if self.radius > self.max_radius:
+            self.kill()
+
+# Killed hazards, lasers and bombs wait here to be reused by the next spawn, see pools.py.
+PLAYER_LASER_POOL = SpritePool(PlayerLaser)
+MINE_POOL = SpritePool(Mine)
+LASER_POOL = SpritePool(Laser)
+MISSILE_POOL = SpritePool(HomingMissile)
+REPULSOR_POOL = SpritePool(Repulsor)
+SPRITE_POOLS = {"player_laser": PLAYER_LASER_POOL, "mine": MINE_POOL, "laser": LASER_POOL, "missile": MISSILE_POOL, "repulsor": REPULSOR_POOL}
+
+def pool_report():
+    parts = []
+    for name, pool in SPRITE_POOLS.items():
+        stats = pool.stats()
+        parts.append(f"{name} {stats['hit_rate']:.0%} of {stats['created'] + stats['reused']} reused, {stats['free']} free")
+    return "  ".join(parts)
+
+class Boss(pygame.sprite.Sprite):
+    def __init__(self, player_ref, orbs, clock, rng, ai_enabled=True):
+        super().__init__()
+        self.image = SPRITE_ATLAS["boss"]
+        self.rect = self.image.get_rect(centerx=SCREEN_WIDTH / 2, top=50)
+        self.speed_x, self.max_health, self.health = 3, 2500, 2500
+        self.clock = clock
+        self.rng = rng
+        self.ai_enabled = ai_enabled
+        self.backend = None     # one of AI_BACKENDS, or None to follow AI_BACKEND
+        self.ai_log = None      # called with (site, sequence) whenever the AI changes boss state
+        self.ai_script = None   # replays those changes instead of asking the model, see replay.py
+        self.decision_log = None  # called with (key, sequence) for every sequence the model answers
+        # Policy answers are recorded like model answers and a replay skips the policy, so it
+        # samples from its own stream to leave the game's draws unchanged.
+        self.policy_rng = random.Random()
+        self.ai_request = None
+        self.ai_stream = None       # the request's ActionStream, when its reply is streamed
+        self.ai_streamed = 0        # nonzero once the current request delivered actions
+        self.ai_request_key = None
+        self.ai_valid_actions = []
+        self.action_sequence = []
+        self.next_action_sequence = None
+        self.fallback_sequence = ["SPREAD_SHOT", "MOVE_RIGHT", "CIRCLE_SHOT", "MOVE_LEFT", "SINGLE_SHOT"]
+        self.ai_request_cooldown = 10000
+        self.ai_request_timeout = AI_REQUEST_TIMEOUT_S
+        self.last_ai_request_time = -self.ai_request_cooldown
+        self.enraged = False
+        self.desperation_mode = False
+        self.dialogue_text = ""
+        self.dialogue_timer = 0
+        self.final_stand_activated = False
+        self.player = player_ref
+        self.orbs = orbs
+        self.current_move_direction = "MOVE_RIGHT"
+        self.move_timer = 0
+        self.move_interval = 2000
+        self.is_shielded = False
+        self.shield_timer = 0
+        self.shield_duration = 4000
+        self.shield_health_thresholds = [0.75, 0.50, 0.25]
+        self.health_to_regain_on_disable = self.max_health * 0.05
+        self.last_minion_summon_time = clock.get_ticks()
+        self.minion_summon_interval = 30000
+        self.action_cooldown = 250
+        self.last_action_time = 0
+        self.passive_attack_timer = clock.get_ticks()
+        self.passive_attack_interval = rng.randint(1500, 2500)
+        self.scheduled_shots = []   # (due ms, Emitter) still to fire from timed patterns
+        self.action_handlers = {"LASER_SWEEP": self.laser_sweep, "HOMING_MISSILE": self.homing_missile, "LAY_MINES": self.lay_mines}
+    def __getstate__(self):
+        # A request in flight belongs to the AI worker and is not snapshotted;
+        # a restored boss asks again once its cooldown allows.
+        return dict(self.__dict__, ai_request=None, ai_stream=None, ai_streamed=0)
+    def set_dialogue(self, text, duration_ms):
+        self.dialogue_text = text
+        self.dialogue_timer = self.clock.get_ticks() + duration_ms
+    @property
+    def ai_backend(self):
+        """"model", "policy" or None (scripted attacks) for the next decision.
+
+        Looked up on every request, so the boss starts using the model as soon as the probe succeeds.
+        """
+        if not self.ai_enabled:
+            return None
+        setting = self.backend or AI_BACKEND
+        model_ready = AI_SIDECAR.ready if AI_SIDECAR is not None else LOCAL_AI_ENABLED
+        if setting in ("auto", "model") and model_ready:
+            return "model"
+        if setting in ("auto", "policy") and get_ai_policy():
+            return "policy"
+        return None
+    @property
+    def is_thinking(self):
+        return self.ai_request is not None
+    @property
+    def is_analyzing(self):
+        """Thinking, and no action of the answer has arrived yet."""
+        return self.ai_request is not None and not self.ai_streamed
+    def log_ai_event(self, site, sequence):
+        if self.ai_log is not None:
+            self.ai_log(site, sequence)
+    def replay_ai_event(self, site):
+        sequence = self.ai_script(site)
+        if sequence is None:
+            return
+        if site == "stream":
+            self.next_action_sequence = list(sequence)
+            self.ai_streamed += 1
+        elif site == "poll":
+            # Logged as the queued sequence once the answer is complete, which is empty
+            # when streamed actions were all taken already.
+            self.next_action_sequence = list(sequence) or None
+            self.ai_request = None
+        elif sequence:
+            self.next_action_sequence = list(sequence)
+            self.ai_request = None
+        else:
+            self.ai_request = AIRequest(None, ())  # thinking until the recorded answer is due
+            self.ai_streamed = 0
+    def request_new_ai_sequence(self, player_bullets_group, num_minions):
+        if self.ai_script is not None:
+            return self.replay_ai_event("request")
+        current_time = self.clock.get_ticks()
+        backend = self.ai_backend
+        if backend == "policy" and not self.is_thinking:
+            # Answers in microseconds, so every sequence can come from the policy.
+            key = decision_key(self.health / self.max_health, self.enraged, self.is_shielded, self.desperation_mode)
+            sequence = get_ai_policy().sample(key, self.available_actions(), self.policy_rng)
+            if sequence:
+                self.next_action_sequence = sequence
+                self.log_ai_event("request", sequence)
+                print(f"AI policy: {sequence}")
+            return
+        if not self.is_thinking and backend == "model" and (current_time - self.last_ai_request_time > self.ai_request_cooldown):
+            self.last_ai_request_time = current_time
+            key = decision_key(self.health / self.max_health, self.enraged, self.is_shielded, self.desperation_mode)
+            cached_sequence = AI_DECISIONS.sample(key)
+            if cached_sequence:
+                self.next_action_sequence = cached_sequence
+                self.log_ai_event("request", cached_sequence)
+                print(f"AI recalled: {cached_sequence}")
+                return
+            messages, self.ai_valid_actions = self.build_ai_prompt()
+            self.ai_request_key = key
+            self.ai_request, self.ai_stream = submit_ai_prompt(messages, self.ai_request_timeout, self.ai_valid_actions)
+            self.ai_streamed = 0
+            self.log_ai_event("request", [])
+            print("AI is thinking...")
+    def poll_ai_request(self):
+        if self.ai_script is not None:
+            self.replay_ai_event("stream")
+            return self.replay_ai_event("poll")
+        request, stream = self.ai_request, self.ai_stream
+        if request is None:
+            return
+        # Checked before taking, so a finished stream is taken whole.
+        done = request.done()
+        streamed = stream.take() if stream is not None and not request.stale() else []
+        if streamed:
+            # Queued right away: the boss plays them while the rest of the reply is generated.
+            self.next_action_sequence = (self.next_action_sequence or []) + streamed
+            if not self.ai_streamed:
+                print(f"AI streaming: first actions after {(stream.first_action_at - request.submitted_at) * 1000:.0f} ms")
+            self.ai_streamed += len(streamed)
+        if done and request.succeeded():
+            PROFILER.record_ai_latency(request.latency_ms())
+            if stream is None:
+                self.next_action_sequence = self.parse_ai_reply(request.result)
+            elif not self.accept_ai_actions(stream.actions, stream.text()):
+                self.next_action_sequence = (self.next_action_sequence or []) + self.fallback_sequence
+            self.ai_request = self.ai_stream = None
+        elif request.stale() or done:
+            PROFILER.record_ai_latency(request.latency_ms(), timed_out=request.error is None)
+            if request.error is not None:
+                print(f"Ollama AI error: {request.error}")
+            else:
+                print("AI Warning: No usable sequence in time. Using fallback.")
+            self.cancel_ai_request()
+            self.next_action_sequence = (self.next_action_sequence or []) + self.fallback_sequence
+        elif streamed:
+            return self.log_ai_event("stream", self.next_action_sequence)
+        else:
+            return
+        self.log_ai_event("poll", self.next_action_sequence or [])
+    def cancel_ai_request(self):
+        if self.ai_request is not None:
+            self.ai_request.cancel()
+            self.ai_request = None
+        if self.ai_stream is not None:
+            self.ai_stream.cancel()
+            self.ai_stream = None
+    def kill(self):
+        self.cancel_ai_request()
+        super().kill()
+    def available_actions(self):
+        actions = ["SINGLE_SHOT", "SPREAD_SHOT", "VOLLEY_SHOT", "CIRCLE_SHOT", "AIMED_BURST", "DODGE", "MOVE_LEFT", "MOVE_RIGHT", "HOMING_MISSILE", "LAY_MINES"]
+        if self.enraged:
+            actions += ["LASER_SWEEP", "SPIRAL_SHOT"]
+        return actions
+    def build_ai_prompt(self):
+        """Chat messages for the model, and the actions a reply may use."""
+        health_pct = int((self.health / self.max_health) * 100)
+        valid_actions = self.available_actions()
+        available_actions = ", ".join(valid_actions)
+        system_prompt = f"""You are a game boss AI. Your goal is to be aggressive. Your only valid actions are: {available_actions}. RULES: 1. Respond with a comma-separated sequence of 3 to 4 actions. 2. The sequence must contain at least two attack actions. 3. Your response MUST be ONLY the comma-separated list. Example: SPREAD_SHOT,MOVE_LEFT,HOMING_MISSILE"""
+        user_prompt = f"My Health: {health_pct}%. Enraged? {'Yes' if self.enraged else 'No'}."
+        messages = [{'role': 'system', 'content': system_prompt}, {'role': 'user', 'content': user_prompt}]
+        return messages, valid_actions
+    def parse_ai_reply(self, reply):
+        raw_response = reply.strip().upper()
+        potential_actions = [action.strip() for action in raw_response.split(',')]
+        validated_actions = [action for action in potential_actions if action in self.ai_valid_actions]
+        return self.accept_ai_actions(validated_actions, raw_response) or self.fallback_sequence.copy()
+    def accept_ai_actions(self, validated_actions, raw_response):
+        """validated_actions if they make a usable answer, else None."""
+        if validated_actions and len(validated_actions) >= 2:
+            print(f"AI decided: {validated_actions}")
+            if self.ai_request_key:
+                # Saving the cache touches the disk, so leave it to the worker.
+                get_ai_worker().submit(AI_DECISIONS.add, self.ai_request_key, validated_actions)
+                if self.decision_log is not None:
+                    self.decision_log(self.ai_request_key, validated_actions)
+            return validated_actions
+        print(f"AI Warning: Invalid sequence '{raw_response.strip()}'. Using fallback.")
+        return None
+    def fire_pattern(self, pattern_id):
+        pattern = BOSS_PATTERNS[pattern_id]
+        if pattern.shout:
+            print(f"Boss: {pattern.shout}")
+        now = self.clock.get_ticks()
+        for delay_ms, emitter in pattern.shots:
+            if delay_ms:
+                self.scheduled_shots.append((now + delay_ms, emitter))
+            else:
+                self.emit(emitter)
+    def emit(self, emitter):
+        fire_boss_bullets(self.orbs, *emitter.volley(self.rect, self.player.rect.center))
+    def fire_scheduled_shots(self, now):
+        waiting = []
+        for due, emitter in self.scheduled_shots:
+            if due <= now:
+                self.emit(emitter)
+            else:
+                waiting.append((due, emitter))
+        self.scheduled_shots = waiting
+    def laser_sweep(self, all_sprites, boss_bullets):
+        print("Boss: LASER!")
+        l = LASER_POOL.acquire(self.rect, self.clock)
+        all_sprites.add(l)
+        boss_bullets.add(l)
+    def homing_missile(self, all_sprites, boss_bullets):
+        print("Boss: MISSILE!")
+        m = MISSILE_POOL.acquire(self.rect.centerx, self.rect.bottom, self.player)
+        all_sprites.add(m)
+        boss_bullets.add(m)
+    def lay_mines(self, all_sprites, boss_bullets):
+        print("Boss: LAYING MINES!")
+        self.set_dialogue("Watch your step!", 2000)
+        for _ in range(self.rng.randint(3, 5)):
+            mine_x = self.rect.centerx + self.rng.randint(-250, 250)
+            mine_y = self.rect.bottom + self.rng.randint(50, 250)
+            mine_x = max(20, min(SCREEN_WIDTH - 20, mine_x))
+            mine_y = max(150, min(SCREEN_HEIGHT - 100, mine_y))
+            m = MINE_POOL.acquire(center=(mine_x, mine_y), clock=self.clock)
+            all_sprites.add(m)
+            boss_bullets.add(m)
+    def summon_minions(self, all_sprites, enemies_group):
+        if len(enemies_group) > 30:
+            print("Boss: Too many minions.")
+            return
+        print("Boss: SUMMON!")
+        self.set_dialogue("My servants will destroy you!", 3000)
+        for _ in range(self.rng.randint(8, 12)):
+            e = Enemy(self.rng)
+            all_sprites.add(e)
+            enemies_group.add(e)
+    def update(self, all_sprites, bullets, boss_bullets, enemies_group):
+        current_time = self.clock.get_ticks()
+        self.poll_ai_request()
+        if self.scheduled_shots:
+            self.fire_scheduled_shots(current_time)
+        if current_time - self.last_minion_summon_time > self.minion_summon_interval:
+            if not self.is_shielded:
+                self.summon_minions(all_sprites, enemies_group)
+            self.last_minion_summon_time = current_time
+        health_percent = self.health / self.max_health
+        if self.shield_health_thresholds and health_percent < self.shield_health_thresholds[0] and not self.is_shielded:
+            self.is_shielded = True
+            self.shield_timer = current_time + self.shield_duration
+            self.shield_health_thresholds.pop(0)
+            self.set_dialogue("You cannot pierce this barrier!", 3000)
+            self.action_sequence = []
+            self.scheduled_shots = []
+        if self.is_shielded:
+            if current_time > self.shield_timer:
+                self.is_shielded = False
+                self.health = min(self.max_health, self.health + self.health_to_regain_on_disable)
+            return
+        if not self.final_stand_activated and health_percent < 0.10:
+            self.final_stand_activated = True
+            print("BOSS: FINAL STAND!")
+            self.set_dialogue("I WILL NOT BE DEFEATED!", 4000)
+            self.desperation_mode = True
+            self.summon_minions(all_sprites, enemies_group)
+            self.summon_minions(all_sprites, enemies_group)
+            self.action_sequence.clear()
+            self.action_sequence.insert(0, "LASER_SWEEP")
+        if not self.enraged and health_percent < 0.5:
+            self.enraged = True
+            print("BOSS IS ENRAGED!")
+            self.set_dialogue("ENOUGH! FEEL MY WRATH!", 3000)
+            self.action_sequence.insert(0, "LASER_SWEEP")
+        if self.next_action_sequence is None:
+            # Prefetch while the current sequence plays out; a no-op while thinking or cooling down.
+            self.request_new_ai_sequence(bullets, len(enemies_group))
+        if not self.action_sequence:
+            if self.next_action_sequence:
+                self.action_sequence = self.next_action_sequence
+                self.next_action_sequence = None
+            elif not self.is_thinking:
+                self.action_sequence = self.fallback_sequence.copy()
+        if self.action_sequence and current_time - self.last_action_time > self.action_cooldown:
+            self.last_action_time = current_time
+            action = self.action_sequence.pop(0)
+            if action in BOSS_PATTERNS:
+                self.fire_pattern(action)
+            elif action in self.action_handlers:
+                self.action_handlers[action](all_sprites, boss_bullets)
+            elif action == "DODGE":
+                self.rect.x += self.rng.choice([-90, 90])
+            elif action in ["MOVE_LEFT", "MOVE_RIGHT"]:
+                self.current_move_direction = action
+        if current_time - self.move_timer > self.move_interval:
+            self.move_timer = current_time
+            self.current_move_direction = self.rng.choice(["MOVE_LEFT", "MOVE_RIGHT"])
+        self.rect.x += self.speed_x * (1 if self.current_move_direction == "MOVE_RIGHT" else -1)
+        if self.rect.left < 0:
+            self.rect.left = 0
+            self.current_move_direction = "MOVE_RIGHT"
+        if self.rect.right > SCREEN_WIDTH:
+            self.rect.right = SCREEN_WIDTH
+            self.current_move_direction = "MOVE_LEFT"
+        if not self.is_shielded and current_time - self.passive_attack_timer > self.passive_attack_interval:
+            self.passive_attack_timer = current_time
+            self.passive_attack_interval = self.rng.randint(1500, 2500)
+            self.fire_pattern(self.rng.choice(["SINGLE_SHOT", "SPREAD_SHOT"]))
+            print("Boss: Passive Attack!")
+
+def show_controls_screen(surface, after_first_frame=None):
+    starfield = Starfield()
+    clock = pygame.time.Clock()
+    start_time = pygame.time.get_ticks()
+    duration = 5000
+
+    while pygame.time.get_ticks() - start_time < duration:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+
+        starfield.update()
+        surface.fill(BLACK)
+        starfield.draw(surface)
+
+        draw_text(surface, "PIXEL VENGEANCE AI", 64, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 4)
+        draw_text(surface, "Arrow Keys: Dodge the cosmic storm!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+        draw_text(surface, "Spacebar: Unleash pixelated fury!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 40)
+        draw_text(surface, "Left Shift: Charge the SUPER LASER!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 80)
+        draw_text(surface, "C Key: Drop a reality-warping bomb!", 22, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 120)
+
+        remaining_time = max(0, (duration - (pygame.time.get_ticks() - start_time)) // 1000 + 1)
+        draw_text(surface, f"Get ready in {remaining_time}...", 18, SCREEN_WIDTH / 2, SCREEN_HEIGHT * 0.75, YELLOW)
+
+        pygame.display.flip()
+        if after_first_frame:
+            after_first_frame()
+            after_first_frame = None
+        clock.tick(60)
+
+def show_jet_selection_screen(surface):
+    starfield = Starfield()
+    jet_names = list(JET_TYPES.keys())
+    selected_index = 0
+    selecting = True
+    clock = pygame.time.Clock()
+    while selecting:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_RIGHT:
+                    selected_index = (selected_index + 1) % len(jet_names)
+                if event.key == pygame.K_LEFT:
+                    selected_index = (selected_index - 1) % len(jet_names)
+                if event.key == pygame.K_RETURN:
+                    return jet_names[selected_index]
+
+        starfield.update()
+        surface.fill(BLACK)
+        starfield.draw(surface)
+
+        draw_text(surface, "CHOOSE YOUR JET", 50, SCREEN_WIDTH / 2, 50)
+        jet_stats = JET_TYPES[jet_names[selected_index]]
+        jet_sprite = SPRITE_ATLAS[("jet", jet_names[selected_index])]
+        surface.blit(jet_sprite, jet_sprite.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50)))
+        draw_text(surface, jet_names[selected_index].upper(), 36, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 50)
+        draw_text(surface, jet_stats["description"], 20, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100, YELLOW)
+        stats_text = f"Lives: {jet_stats['lives']} | Bombs: {jet_stats['bombs']} | Speed: {jet_stats['speed']}"
+        draw_text(surface, stats_text, 20, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 150)
+        draw_text(surface, "Use Arrow Keys to Navigate, Enter to Select", 18, SCREEN_WIDTH / 2, SCREEN_HEIGHT - 50, GREY)
+        pygame.display.flip()
+        clock.tick(60)
+
+BAR_LENGTH, BAR_HEIGHT = 150, 20
+
+def create_bar_sprite(fill, color):
+    sprite = pygame.Surface([BAR_LENGTH, BAR_HEIGHT], pygame.SRCALPHA)
+    pygame.draw.rect(sprite, color, (0, 0, fill, BAR_HEIGHT))
+    pygame.draw.rect(sprite, WHITE, sprite.get_rect(), 2)
+    return sprite
+
+def bar_fill(pct):
+    return int((min(100, max(0, pct)) / 100) * BAR_LENGTH)
+
+def hud_text(text, size, x, y, align="midtop"):
+    # HUD values change too often to be worth a slot in the shared text cache.
+    text_surface = get_font(size).render(text, True, WHITE)
+    return text_surface, aligned_rect(text_surface, x, y, align)
+
+class Hud:
+    """HUD regions that are re-rendered only when the value they show changes."""
+    def __init__(self):
+        self.renderers = {
+            "score": lambda score: hud_text(f"SCORE: {score}", 24, SCREEN_WIDTH / 2, 10),
+            "bombs": lambda bombs: hud_text(f"BOMBS: {bombs}", 22, SCREEN_WIDTH - 10, 10, align="topright"),
+            "lives": lambda lives: hud_text(f"LIVES: {lives}", 22, 10, 10, align="topleft"),
+            "boss_health": lambda fill: (create_bar_sprite(fill, GREEN), (5, 55)),
+            "laser_charge": lambda fill: (create_bar_sprite(fill, YELLOW), (5, SCREEN_HEIGHT - 25)),
+        }
+        self.regions = {}
+    def draw(self, surface, name, value):
+        region = self.regions.get(name)
+        if region is None or region[0] != value:
+            region = self.regions[name] = (value, *self.renderers[name](value))
+        return surface.blit(region[1], region[2])
+
+# --- Game Session ---
+class GameSession:
+    """A single game, advanced one frame at a time with step().
+
+    The session owns every sprite group, counter and timer of a run and never
+    touches the display or the event queue, so it runs as fast as the CPU
+    allows under SDL's dummy driver. Rendering is optional: call draw() with
+    any surface to get the frame the interactive game would show.
+
+    inputs is a dict with the keys "left", "right" (held this frame) and
+    "shoot", "laser", "bomb" (pressed this frame); missing keys are False.
+
+    All randomness comes from self.rng, seeded in reset(), so a run is fully
+    determined by its seed, inputs, frame times and boss AI answers; see
+    recording.py and replay.py.
+    """
+    frame_ms = FRAME_MS
+    interpolate = False     # remember sprite positions before each step, so draw() can blend between steps
+    # Not part of a snapshot: rendering caches, harness hooks, per-run logging and the checkpoint itself.
+    SNAPSHOT_SKIP = frozenset({"hud", "bullet_images", "boss_bullet_images", "ai_enabled", "ai_log", "ai_script",
+                               "ai_backend", "interpolate", "previous_positions", "log_id", "decisions_logged", "boss_checkpoint"})
+
+    def __init__(self, max_waves=3, ai_enabled=True, ai_backend=None):
+        self.max_waves = max_waves
+        self.ai_enabled = ai_enabled
+        self.ai_backend = ai_backend    # handed to each boss, see Boss.backend
+        self.ai_log = None      # handed to each boss, see Boss.ai_log
+        self.ai_script = None
+        self.player = None
+        self.hud = Hud()
+        if not SPRITE_ATLAS:
+            build_sprite_atlas()
+        self.bullet_images = [SPRITE_ATLAS[("bullet", power)] for power in range(1, 6)]
+        self.boss_bullet_images = [SPRITE_ATLAS["boss_bullet"]]
+
+    def reset(self, jet_type="Interceptor", seed=None):
+        self.release_world()
+        # Unseeded runs still get a seed, so any of them can be recorded and replayed.
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.log_id = os.urandom(6).hex()   # ties this run's logged AI decisions to its outcome
+        self.decisions_logged = 0
+        self.clock = SimClock()
+        self.frame = 0
+        self.previous_positions = {}
+        self.all_sprites = pygame.sprite.Group()
+        self.enemies = pygame.sprite.Group()
+        self.bullets = ProjectileStore(self.bullet_images, SCREEN_RECT)
+        self.boss_orbs = ProjectileStore(self.boss_bullet_images, SCREEN_RECT)
+        self.boss_bullets = pygame.sprite.Group()
+        self.player_lasers = pygame.sprite.Group()
+        self.powerups = pygame.sprite.Group()
+        self.repulsors = pygame.sprite.Group()
+        self.boss_group = pygame.sprite.GroupSingle()
+        self.enemy_grid = SpatialHash()
+        self.hazard_grid = SpatialHash()
+        self.player = Player(jet_type, self.clock)
+        self.all_sprites.add(self.player)
+        self.starfield = Starfield(rng=self.rng)
+        self.score = 0
+        self.player_laser_charge = 0
+        self.running, self.game_over_message, self.current_wave = True, "", 0
+        self.playable_left, self.playable_right = 0, SCREEN_WIDTH
+        self.is_wave_active = False
+        self.enemies_to_spawn_this_wave = 0
+        self.enemies_spawned_this_wave = 0
+        self.last_enemy_spawn_time = 0
+        self.enemy_spawn_interval = 500
+        self.boss_checkpoint = None     # snapshot from when the boss appeared, for "retry boss"
+        if self.ai_enabled and (self.ai_backend or AI_BACKEND) in ("auto", "model"):
+            get_ai_worker()  # probe and load the model while the waves play
+        # Time the last wave was cleared; None while no wave cooldown is pending.
+        self.wave_clear_time = self.clock.get_ticks()
+        return self.get_state()
+
+    def release_world(self):
+        if self.player is None:
+            return
+        if self.boss_group.sprite:
+            self.boss_group.sprite.cancel_ai_request()
+        # Hand the last run's pooled sprites back before their groups are dropped.
+        for group in (self.boss_bullets, self.player_lasers, self.repulsors):
+            for sprite in group.sprites():
+                sprite.kill()
+
+    def snapshot(self):
+        """The whole world as one binary blob, see snapshot.py."""
+        state = {key: value for key, value in self.__dict__.items() if key not in self.SNAPSHOT_SKIP}
+        return dump_world(state, self.snapshot_tokens())
+
+    def restore(self, blob):
+        """Put the world back as it was when blob was taken, in this or any other session."""
+        state = load_world(blob, self.resolve_snapshot_token)
+        self.release_world()
+        self.__dict__.update(state)
+        self.previous_positions = {}
+        # A restored run plays on as a new run: its decisions must not inherit the outcome logged
+        # for the attempt before it, nor give that attempt a second one.
+        self.log_id = os.urandom(6).hex()
+        self.decisions_logged = 0
+        return self.get_state()
+
+    def snapshot_tokens(self):
+        """id -> token of every object a snapshot refers to instead of copying."""
+        tokens = {id(self): ("session",)}
+        for name in ("ai_log", "ai_script"):
+            hook = getattr(self, name)
+            if hook is not None:
+                tokens[id(hook)] = ("hook", name)
+        for key, value in SPRITE_ATLAS.items():
+            if isinstance(value, pygame.Surface):
+                tokens[id(value)] = ("atlas", key)
+        tokens.update((id(frame), ("atlas", "missile_frames", i)) for i, frame in enumerate(SPRITE_ATLAS["missile_frames"]))
+        tokens.update((id(frame), ("effect", key)) for key, frame in EFFECT_CACHE.items())
+        tokens.update((id(pool), ("pool", name)) for name, pool in SPRITE_POOLS.items())
+        for pattern_id, pattern in BOSS_PATTERNS.items():
+            tokens.update((id(emitter), ("emitter", pattern_id, i)) for i, (_, emitter) in enumerate(pattern.shots))
+        return tokens
+
+    def resolve_snapshot_token(self, token):
+        kind = token[0]
+        if kind == "session":
+            return self
+        if kind == "hook":
+            return getattr(self, token[1])
+        if kind == "atlas":
+            value = SPRITE_ATLAS[token[1]]
+            return value[token[2]] if len(token) > 2 else value
+        if kind == "effect":
+            key = token[1]
+            return cached_effect(key, EFFECT_RENDERERS[key[0]], *key[1:])
+        if kind == "pool":
+            return SPRITE_POOLS[token[1]]
+        if kind == "emitter":
+            return BOSS_PATTERNS[token[1]].shots[token[2]][1]
+        raise ValueError(f"unknown snapshot token {token!r}")
+
+    def start_new_wave(self, wave_num):
+        self.is_wave_active = True
+        self.enemies_to_spawn_this_wave = 10 + (wave_num * 5)
+        self.enemies_spawned_this_wave = 0
+        self.enemy_spawn_interval = max(100, 500 - (wave_num * 80))
+        print(f"--- WAVE {wave_num} INCOMING! ({self.enemies_to_spawn_this_wave} enemies, spawning every {self.enemy_spawn_interval}ms) ---")
+
+    def end(self, message):
+        self.game_over_message = message
+        self.running = False
+        if self.boss_group.sprite:
+            self.boss_group.sprite.cancel_ai_request()
+        if self.decisions_logged:
+            get_ai_worker().submit(AI_DECISION_LOG.outcome, self.log_id, message, self.score)
+
+    def log_decision(self, key, sequence):
+        self.decisions_logged += 1
+        get_ai_worker().submit(AI_DECISION_LOG.decision, self.log_id, key, sequence)
+
+    def get_state(self):
+        boss = self.boss_group.sprite
+        return {
+            "frame": self.frame,
+            "time_ms": self.clock.get_ticks(),
+            "running": self.running,
+            "game_over_message": self.game_over_message,
+            "score": self.score,
+            "wave": self.current_wave,
+            "wave_active": self.is_wave_active,
+            "lives": self.player.lives,
+            "bombs": self.player.bombs,
+            "power": self.player.power,
+            "laser_charge": self.player_laser_charge,
+            "player_x": self.player.rect.centerx,
+            "enemies": len(self.enemies),
+            "boss_health": boss.health if boss else None,
+            "boss_shielded": boss.is_shielded if boss else False,
+        }
+
+    def step(self, inputs=None, dt_ms=None):
+        if not self.running:
+            return self.get_state()
+        inputs = inputs or {}
+        if self.interpolate:
+            self.previous_positions = {sprite: sprite.rect.topleft for sprite in self.all_sprites}
+        self.frame += 1
+        self.clock.advance(self.frame_ms if dt_ms is None else dt_ms)
+        current_time = self.clock.get_ticks()
+        player = self.player
+        if player.alive() and self.player_laser_charge < PLAYER_LASER_MAX_CHARGE:
+            self.player_laser_charge += 1
+        if player.alive():
+            if inputs.get("shoot"):
+                player.shoot(self.bullets)
+            if inputs.get("laser") and self.player_laser_charge >= PLAYER_LASER_MAX_CHARGE:
+                player.shoot_super_laser(self.all_sprites, self.player_lasers)
+                self.player_laser_charge = 0
+            if inputs.get("bomb"):
+                player.use_bomb(self.repulsors)
+        PROFILER.lap("input")
+
+        # --- UPDATE SECTION ---
+        self.starfield.update()
+        PROFILER.lap("update.starfield")
+        self.repulsors.update()
+        PROFILER.lap("update.repulsors")
+        self.enemies.update()
+        PROFILER.lap("update.enemies")
+        self.bullets.update()
+        PROFILER.lap("update.bullets")
+        self.boss_orbs.update()
+        PROFILER.lap("update.boss_orbs")
+        self.boss_bullets.update()
+        PROFILER.lap("update.boss_bullets")
+        self.player_lasers.update()
+        PROFILER.lap("update.player_lasers")
+        self.powerups.update()
+        PROFILER.lap("update.powerups")
+
+        if player.alive():
+            player.update(self.playable_left, self.playable_right, inputs.get("left", False), inputs.get("right", False))
+        PROFILER.lap("update.player")
+
+        boss = self.boss_group.sprite
+        if boss:
+            boss.update(self.all_sprites, self.bullets, self.boss_bullets, self.enemies)
+            if boss.desperation_mode:
+                shrink_speed = 0.5
+                self.playable_left = min(self.playable_left + shrink_speed, SCREEN_WIDTH / 2 - 50)
+                self.playable_right = max(self.playable_right - shrink_speed, SCREEN_WIDTH / 2 + 50)
+                if self.playable_left >= self.playable_right:
+                    self.end("CRUSHED!")
+        PROFILER.lap("update.boss")
+
+        # --- GAME LOGIC SECTION ---
+        if self.is_wave_active and self.enemies_spawned_this_wave < self.enemies_to_spawn_this_wave:
+            if current_time - self.last_enemy_spawn_time > self.enemy_spawn_interval:
+                self.last_enemy_spawn_time = current_time
+                for _ in range(self.rng.randint(1, 2)):
+                    if self.enemies_spawned_this_wave < self.enemies_to_spawn_this_wave:
+                        e = Enemy(self.rng)
+                        self.all_sprites.add(e)
+                        self.enemies.add(e)
+                        self.enemies_spawned_this_wave += 1
+
+        if not boss:
+            if self.is_wave_active and self.enemies_spawned_this_wave >= self.enemies_to_spawn_this_wave and not self.enemies and self.wave_clear_time is None:
+                self.is_wave_active = False
+                self.wave_clear_time = current_time
+
+            if not self.is_wave_active and self.wave_clear_time is not None and current_time - self.wave_clear_time > WAVE_COOLDOWN:
+                if self.current_wave < self.max_waves:
+                    self.current_wave += 1
+                    self.start_new_wave(self.current_wave)
+                elif self.current_wave == self.max_waves:
+                    self.current_wave += 1
+                    new_boss = Boss(player, self.boss_orbs, self.clock, self.rng, self.ai_enabled)
+                    new_boss.ai_log, new_boss.ai_script = self.ai_log, self.ai_script
+                    new_boss.backend = self.ai_backend
+                    new_boss.decision_log = self.log_decision
+                    new_boss.policy_rng = random.Random(f"policy/{self.seed}")
+                    self.all_sprites.add(new_boss)
+                    self.boss_group.add(new_boss)
+                    new_boss.set_dialogue("I am powered by a vast intelligence...", 5000)
+                self.wave_clear_time = None
+        PROFILER.lap("logic")
+
+        self.handle_collisions()
+        PROFILER.lap("collision")
+        if not boss and self.boss_group.sprite and self.running:
+            self.boss_checkpoint = self.snapshot()
+            PROFILER.lap("snapshot")
+        if AI_SIDECAR is not None:
+            if boss:
+                self.publish_ai_state(AI_SIDECAR.board, boss)
+            AI_SIDECAR.pump()
+            PROFILER.lap("ai_sidecar")
+        if PROFILER.enabled:
+            self.count_sprites()
+        return self.get_state()
+
+    def publish_ai_state(self, board, boss):
+        """Write what the AI sidecar sees into its shared-memory snapshot, in place."""
+        player = self.player
+        threats = self.bullets.nearest(boss.rect.center, len(board.state["threats"]))
+        with board.writing() as state:
+            state["frame"] = self.frame
+            state["player"] = player.rect.center
+            state["lives"], state["power"] = player.lives, player.power
+            state["boss"] = boss.rect.center
+            state["boss_health"] = boss.health / boss.max_health
+            state["enraged"], state["shielded"], state["desperation"] = boss.enraged, boss.is_shielded, boss.desperation_mode
+            state["player_bullets"], state["boss_orbs"] = len(self.bullets), len(self.boss_orbs)
+            state["boss_hazards"], state["minions"] = len(self.boss_bullets), len(self.enemies)
+            state["threat_count"] = len(threats)
+            state["threats"][:len(threats)] = threats
+
+    def count_sprites(self):
+        for name, group in (("enemies", self.enemies), ("bullets", self.bullets), ("boss_orbs", self.boss_orbs),
+                            ("boss_bullets", self.boss_bullets), ("player_lasers", self.player_lasers),
+                            ("powerups", self.powerups), ("repulsors", self.repulsors), ("all_sprites", self.all_sprites)):
+            PROFILER.count(name, len(group))
+
+    def handle_collisions(self):
+        player, boss = self.player, self.boss_group.sprite
+        enemies, bullets = self.enemies, self.bullets
+        enemy_grid, hazard_grid = self.enemy_grid, self.hazard_grid
+        enemy_grid.sync(enemies)
+        hazard_grid.sync(self.boss_bullets)
+
+        targets = enemies.sprites()
+        enemy_damage = bullets.collide_rects([tuple(enemy.rect) for enemy in targets])
+        for enemy, damage in zip(targets, enemy_damage.tolist()):
+            if not damage:
+                continue
+            enemy.health -= damage
+            if enemy.health <= 0:
+                self.score += 100
+                enemy.kill()
+                if self.rng.random() > 0.9:
+                    p = PowerUp(enemy.rect.center, self.rng)
+                    self.all_sprites.add(p)
+                    self.powerups.add(p)
+
+        if player.alive():
+            player_is_hit = False
+            if enemy_grid.spritecollide(player, True) or hazard_grid.spritecollide(player, True) or self.boss_orbs.collide_rect(player.rect).size:
+                player_is_hit = True
+            if boss and not player.invincible and pygame.sprite.spritecollide(player, self.boss_group, False):
+                player_is_hit = True
+            if player_is_hit:
+                player.get_hit()
+
+            for p_up in pygame.sprite.spritecollide(player, self.powerups, True):
+                player.powerup(p_up.type)
+
+            if player.lives <= 0:
+                self.end("GAME OVER")
+                player.kill()
+
+        for repulsor in self.repulsors:
+            hazard_grid.spritecollide(repulsor, True, pygame.sprite.collide_circle)
+            self.boss_orbs.collide_circle(repulsor.rect.center, repulsor.radius)
+            self.score += len(enemy_grid.spritecollide(repulsor, True, pygame.sprite.collide_circle)) * 100
+
+        if self.player_lasers:
+            for laser in self.player_lasers:
+                self.score += len(enemy_grid.spritecollide(laser, True)) * 100
+            if boss and not boss.is_shielded and pygame.sprite.spritecollide(boss, self.player_lasers, False):
+                boss.health -= 1.5
+                if boss.health <= 0 and boss.alive():
+                    boss.kill()
+                    self.score += 5000
+                    self.end("YOU WIN!")
+        if boss and not boss.is_shielded:
+            hit_damage = bullets.collide_rect(boss.rect)
+            if hit_damage.size:
+                boss.health -= float(hit_damage.sum())
+                if boss.health <= 0 and boss.alive():
+                    boss.kill()
+                    self.score += 5000
+                    self.end("YOU WIN!")
+
+    def sprite_blits(self, alpha):
+        """(image, position) of every sprite, alpha of the way from its position before the last step."""
+        previous = self.previous_positions
+        blits = []
+        for sprite in self.all_sprites:
+            x, y = sprite.rect.topleft
+            last = previous.get(sprite)
+            if last is not None and abs(x - last[0]) + abs(y - last[1]) <= MAX_INTERPOLATION_PX:
+                x, y = last[0] + (x - last[0]) * alpha, last[1] + (y - last[1]) * alpha
+            blits.append((sprite.image, (x, y)))
+        return blits
+
+    def draw(self, surface, alpha=1.0):
+        """Compose the full frame on surface and return the rects that were drawn.
+
+        alpha (0..1) places moving things that far between the previous and
+        the current step; 1 draws the current state as it is.
+        """
+        player, boss = self.player, self.boss_group.sprite
+        current_time = self.clock.get_ticks()
+        surface.fill(BLACK)
+        self.starfield.draw(surface, alpha)
+        dirty = self.starfield.star_rects(alpha)
+        if alpha < 1 and self.previous_positions:
+            dirty += surface.blits(self.sprite_blits(alpha))
+        else:
+            self.all_sprites.draw(surface)
+            dirty += self.all_sprites.spritedict.values()
+        dirty += self.bullets.draw(surface, alpha)
+        dirty += self.boss_orbs.draw(surface, alpha)
+        for r in self.repulsors:
+            dirty.append(pygame.draw.circle(surface, CYAN, r.center, int(r.radius - r.growth_rate * (1 - alpha)), 10))
+        if boss and boss.desperation_mode:
+            dirty.append(pygame.draw.rect(surface, BLACK, (0, 0, self.playable_left, SCREEN_HEIGHT)))
+            dirty.append(pygame.draw.rect(surface, BLACK, (self.playable_right, 0, SCREEN_WIDTH - self.playable_right, SCREEN_HEIGHT)))
+
+        dirty.append(self.hud.draw(surface, "score", self.score))
+        dirty.append(self.hud.draw(surface, "bombs", player.bombs))
+        dirty.append(self.hud.draw(surface, "lives", player.lives))
+        if boss:
+            dirty.append(draw_text(surface, "AI BOSS", 18, 5, 35, RED, align="topleft"))
+            dirty.append(self.hud.draw(surface, "boss_health", bar_fill((boss.health / boss.max_health) * 100)))
+            if boss.dialogue_timer > current_time:
+                dirty.append(draw_text(surface, boss.dialogue_text, 36, SCREEN_WIDTH / 2, 140, ORANGE))
+            if boss.is_shielded:
+                shield = shield_image(boss.rect.size)
+                dirty.append(surface.blit(shield, shield.get_rect(center=boss.rect.center)))
+            if boss.is_analyzing:
+                dirty.append(draw_text(surface, "AI: Analyzing...", 22, SCREEN_WIDTH / 2, 80, YELLOW, align="center"))
+
+        if self.wave_clear_time is not None and not self.is_wave_active and not boss and self.current_wave > 0:
+            dirty.append(draw_text(surface, f"WAVE {self.current_wave} CLEAR!", 48, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, RED))
+
+        dirty.append(self.hud.draw(surface, "laser_charge", bar_fill((self.player_laser_charge / PLAYER_LASER_MAX_CHARGE) * 100)))
+        dirty.append(draw_text(surface, "Laser [L-SHIFT]", 18, 175, SCREEN_HEIGHT - 28, align="topleft"))
+        dirty.append(draw_text(surface, "Bomb [C]", 18, 280, SCREEN_HEIGHT - 28, align="topleft"))
+        return dirty
+
+def show_game_over(surface, session, retry=False, wait_s=5):
+    """The final message and score; with retry, True if the player pressed R to retry the boss."""
+    game_over_message = session.game_over_message
+    final_score_text = f"FINAL SCORE: {session.score}"
+    color = RED if "OVER" in game_over_message or "CRUSHED" in game_over_message else GREEN
+    draw_text(surface, game_over_message, 64, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50, color)
+    draw_text(surface, final_score_text, 32, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 20, WHITE)
+    if not retry:
+        pygame.display.flip()
+        time.sleep(wait_s)
+        return False
+    draw_text(surface, "Press R to retry the boss", 28, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 70, YELLOW)
+    pygame.display.flip()
+    deadline = time.monotonic() + wait_s
+    while time.monotonic() < deadline:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q):
+                return False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                return True
+        pygame.time.wait(20)
+    return False
+
+class DirtyRectRenderer:
+    """Presents frames by pushing only changed regions with display.update(rects).
+
+    The frame is still composed in full on the screen surface, which is cheap;
+    what gets skipped is transferring the untouched rest of it to the display.
+    A region is changed if something was drawn there this frame or the last.
+    """
+    def __init__(self):
+        self.previous = [SCREEN_RECT]   # the first frame replaces whatever screen came before, in full
+    def present(self, dirty):
+        pygame.display.update(self.previous + dirty)
+        self.previous = dirty
+
+# --- MAIN GAME LOOP ---
+def main():
+    global AI_BACKEND
+    dirty_renderer = DirtyRectRenderer() if "--dirty-rects" in sys.argv[1:] else None
+    record_path = sys.argv[sys.argv.index("--record") + 1] if "--record" in sys.argv[1:-1] else None
+    profile_path = sys.argv[sys.argv.index("--profile") + 1] if "--profile" in sys.argv[1:-1] else None
+    render_fps = int(sys.argv[sys.argv.index("--fps") + 1]) if "--fps" in sys.argv[1:-1] else FPS
+    if "--ai" in sys.argv[1:-1]:
+        AI_BACKEND = sys.argv[sys.argv.index("--ai") + 1]
+        if AI_BACKEND not in AI_BACKENDS:
+            sys.exit(f"--ai must be one of: {', '.join(AI_BACKENDS)}")
+    if profile_path:
+        PROFILER.enable()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Pixel Vengeance AI")
+    start_asset_warm_up()
+    if "--ai-sidecar" in sys.argv[1:]:
+        use_ai_sidecar()
+    get_ai_worker()
+
+    def after_first_frame():
+        mark_startup("first frame")
+        build_sprite_atlas()
+
+    show_controls_screen(screen, after_first_frame)
+    chosen_jet = show_jet_selection_screen(screen)
+    session = GameSession()
+    session.interpolate = True
+    if record_path:
+        session = Recorder(session)
+    session.reset(chosen_jet)
+    clock = pygame.time.Clock()
+    quit_requested = False
+    accumulator = 0.0   # wall time not yet simulated, in ms
+    presses = {}        # key presses waiting for the next simulation step
+    overlay = ProfilerOverlay(PROFILER, get_font(16))
+    show_overlay = False
+    game_over_shown = False
+
+    while session.running and not quit_requested:
+        PROFILER.begin_frame()
+        dt = clock.tick(render_fps)
+        PROFILER.lap("wait")
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q):
+                quit_requested = True
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                show_overlay = not show_overlay
+                if show_overlay:
+                    PROFILER.enable()
+                elif not profile_path:
+                    PROFILER.disable()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    presses["shoot"] = True
+                if event.key == pygame.K_LSHIFT:
+                    presses["laser"] = True
+                if event.key == pygame.K_c:
+                    presses["bomb"] = True
+        keystate = pygame.key.get_pressed()
+        held = {"left": keystate[pygame.K_LEFT], "right": keystate[pygame.K_RIGHT]}
+        PROFILER.lap("events")
+
+        # Fixed timestep: simulate in FRAME_MS steps whatever wall time has passed, several
+        # steps per rendered frame on slow machines, so gameplay speed never depends on the frame rate.
+        accumulator = min(accumulator + dt, MAX_STEPS_PER_FRAME * FRAME_MS)
+        while accumulator >= FRAME_MS and session.running:
+            session.step({**presses, **held})
+            presses = {}
+            accumulator -= FRAME_MS
+        dirty = session.draw(screen, accumulator / FRAME_MS)
+        PROFILER.lap("draw")
+        if show_overlay:
+            dirty.append(overlay.draw(screen, (0, SCREEN_HEIGHT - 30)))
+            PROFILER.lap("overlay")
+        if dirty_renderer:
+            dirty_renderer.present(dirty)
+        else:
+            pygame.display.flip()
+        PROFILER.lap("present")
+        PROFILER.end_frame()
+        # Lost to the boss: offer to retry from the checkpoint taken when it appeared.
+        # A recording can't be rewound, so recorded runs end as usual.
+        if not record_path and not session.running and session.boss_checkpoint and session.game_over_message != "YOU WIN!":
+            if show_game_over(screen, session, retry=True):
+                session.restore(session.boss_checkpoint)
+                accumulator, presses = 0.0, {}
+                if dirty_renderer:
+                    dirty_renderer = DirtyRectRenderer()
+                clock.tick()
+            else:
+                game_over_shown = True
+
+    if session.game_over_message and not game_over_shown:
+        show_game_over(screen, session)
+
+    if profile_path:
+        PROFILER.export(profile_path)
+        print(f"Wrote {len(PROFILER.frames)} profiled frames to {profile_path}")
+    if record_path:
+        session.recording.save(record_path)
+        print(f"Recorded {len(session.recording)} frames to {record_path} (replay with: python replay.py {record_path})")
+    if AI_SIDECAR is not None:
+        AI_SIDECAR.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Declarative bullet patterns, compiled once into emitter tables.
+
+A pattern spec is a plain dict. The kind picks how its bullets are laid out:
+
+    shots     explicit "velocities" [(vx, vy), ...] and optional "offsets" [(dx, dy), ...]
+    ring      "count" bullets evenly around 360°, starting at "angle"
+    fan       "count" bullets across "spread" degrees, centered on "angle" (90 is straight down)
+    spiral    "shots" rings of "arms" bullets, "interval_ms" apart, each turned "turn" degrees further
+    sequence  "steps" [(delay_ms, pattern_id), ...] replaying other patterns on a timer
+
+Every kind takes "speed" where it needs one, "origin" ("bottom" or "center" of
+the shooter's rect) and "aimed" (rotate the whole pattern so straight down
+points at the target). An optional "shout" is announced when the pattern fires.
+
+compile_patterns() turns the specs into Patterns: lists of (delay_ms, Emitter),
+where an Emitter holds the offset and velocity arrays of one volley. Firing a
+volley is an array add plus one ProjectileStore.spawn_many() call; no angle is
+computed at fire time except the single rotation of an aimed volley.
+"""
+import math
+
+import numpy as np
+
+ORIGINS = ("bottom", "center")
+
+
+class Emitter:
+    """One volley: per-bullet offsets from the origin point and velocities."""
+    def __init__(self, dx, dy, vx, vy, origin="bottom", aimed=False):
+        self.dx, self.dy = np.asarray(dx, dtype=float), np.asarray(dy, dtype=float)
+        self.vx, self.vy = np.asarray(vx, dtype=float), np.asarray(vy, dtype=float)
+        self.origin = origin
+        self.aimed = aimed
+
+    def __len__(self):
+        return len(self.vx)
+
+    def volley(self, rect, target=None):
+        """Spawn positions (bullet centers x, tops y) and velocities for a shooter at rect."""
+        x = rect.centerx
+        y = rect.bottom if self.origin == "bottom" else rect.centery
+        vx, vy = self.vx, self.vy
+        if self.aimed and target is not None:
+            turn = math.atan2(target[1] - y, target[0] - x) - math.pi / 2
+            c, s = math.cos(turn), math.sin(turn)
+            vx, vy = vx * c - vy * s, vx * s + vy * c
+        return x + self.dx, y + self.dy, vx, vy
+
+
+class Pattern:
+    def __init__(self, shots, shout=None):
+        self.shots = shots   # [(delay_ms, Emitter)], in firing order
+        self.shout = shout
+
+    @property
+    def duration_ms(self):
+        return self.shots[-1][0] if self.shots else 0
+
+
+def angle_emitter(angles_deg, speed, spec):
+    angles = np.radians(angles_deg)
+    count = len(angles)
+    return Emitter(np.zeros(count), np.zeros(count), speed * np.cos(angles), speed * np.sin(angles),
+                   spec.get("origin", "bottom"), spec.get("aimed", False))
+
+
+def compile_pattern(pattern_id, specs, compiled):
+    if pattern_id in compiled:
+        return compiled[pattern_id]
+    spec = specs[pattern_id]
+    kind = spec.get("kind")
+    if spec.get("origin", "bottom") not in ORIGINS:
+        raise ValueError(f"pattern {pattern_id}: origin must be one of {ORIGINS}")
+    if kind == "shots":
+        velocities = spec["velocities"]
+        offsets = spec.get("offsets", [(0, 0)] * len(velocities))
+        if len(offsets) != len(velocities):
+            raise ValueError(f"pattern {pattern_id}: {len(offsets)} offsets for {len(velocities)} velocities")
+        (dx, dy), (vx, vy) = zip(*offsets), zip(*velocities)
+        shots = [(0, Emitter(dx, dy, vx, vy, spec.get("origin", "bottom"), spec.get("aimed", False)))]
+    elif kind == "ring":
+        count = spec["count"]
+        shots = [(0, angle_emitter(np.arange(count) * (360 / count) + spec.get("angle", 0), spec["speed"], spec))]
+    elif kind == "fan":
+        half = spec["spread"] / 2
+        shots = [(0, angle_emitter(spec.get("angle", 90) + np.linspace(-half, half, spec["count"]), spec["speed"], spec))]
+    elif kind == "spiral":
+        arms = spec["arms"]
+        ring = np.arange(arms) * (360 / arms) + spec.get("angle", 0)
+        shots = [(i * spec["interval_ms"], angle_emitter(ring + i * spec["turn"], spec["speed"], spec)) for i in range(spec["shots"])]
+    elif kind == "sequence":
+        compiled[pattern_id] = None  # marks the pattern as in progress, to catch cycles
+        shots = []
+        for delay_ms, step_id in spec["steps"]:
+            if step_id not in specs:
+                raise ValueError(f"pattern {pattern_id}: unknown step {step_id!r}")
+            step = compile_pattern(step_id, specs, compiled)
+            if step is None:
+                raise ValueError(f"pattern {pattern_id}: sequence refers back to itself through {step_id!r}")
+            shots += [(delay_ms + offset, emitter) for offset, emitter in step.shots]
+        shots.sort(key=lambda shot: shot[0])
+    else:
+        raise ValueError(f"pattern {pattern_id}: unknown kind {kind!r}")
+    compiled[pattern_id] = pattern = Pattern(shots, spec.get("shout"))
+    return pattern
+
+
+def compile_patterns(specs):
+    """{pattern_id: Pattern} for every spec; raises ValueError on a malformed one."""
+    compiled = {}
+    for pattern_id in specs:
+        compile_pattern(pattern_id, specs, compiled)
+    return compiled
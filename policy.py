@@ -0,0 +1,116 @@
+"""A distilled boss policy that answers on the game thread in microseconds.
+
+The policy is a bigram model of action sequences per boss state, trained
+offline (see build_policy.py) from what the model actually answered: the
+decision cache and the decision log, where every answer is joined with how
+that game ended. Sampling walks the table with the caller's RNG:
+
+    start action ~ P(action | state)
+    next action  ~ P(action | previous action, state)
+    length       ~ P(length | state)
+
+A state that was never seen, or whose table cannot produce a sequence with
+enough attacks, backs off to a coarser state (only enraged and desperation),
+then to all states pooled, so the policy answers for any key the game can
+produce.
+"""
+import json
+import os
+
+POLICY_VERSION = 1
+MOVES = frozenset(("DODGE", "MOVE_LEFT", "MOVE_RIGHT"))   # everything else is an attack
+ANY_STATE = "*"
+
+
+def coarse_key(key):
+    """decision_key() without health bucket and shield: "h3|e1|s0|d0" -> "e1|d0"."""
+    parts = {part[0]: part[1:] for part in key.split("|") if part}
+    return f"e{parts.get('e', '0')}|d{parts.get('d', '0')}"
+
+
+def add_weight(table, item, weight):
+    table[item] = table.get(item, 0.0) + weight
+
+
+def weighted_choice(weights, rng, allowed=None):
+    items = [item for item in weights if allowed is None or item in allowed]
+    if not items:
+        return None
+    return rng.choices(items, [weights[item] for item in items])[0]
+
+
+def walk(table, valid, rng):
+    length = int(weighted_choice(table["length"], rng))
+    sequence = []
+    choices = table["start"]
+    while len(sequence) < length:
+        action = weighted_choice(choices, rng, valid)
+        if action is None:
+            break
+        sequence.append(action)
+        choices = table["next"].get(action, {})
+    return sequence
+
+
+class DistilledPolicy:
+    def __init__(self, tables=None):
+        # state -> {"start": {action: w}, "next": {action: {action: w}}, "length": {n: w}}
+        self.tables = tables or {}
+
+    def __bool__(self):
+        return bool(self.tables)
+
+    @classmethod
+    def fit(cls, examples):
+        """Train on (decision key, action sequence, weight) triples."""
+        tables = {}
+        for key, sequence, weight in examples:
+            if not sequence or weight <= 0:
+                continue
+            for state in (key, coarse_key(key), ANY_STATE):
+                table = tables.setdefault(state, {"start": {}, "next": {}, "length": {}})
+                add_weight(table["start"], sequence[0], weight)
+                add_weight(table["length"], str(len(sequence)), weight)
+                for prev, action in zip(sequence, sequence[1:]):
+                    add_weight(table["next"].setdefault(prev, {}), action, weight)
+        return cls(tables)
+
+    def states(self, key):
+        for state in (key, coarse_key(key), ANY_STATE):
+            table = self.tables.get(state)
+            if table:
+                yield table
+
+    def sample(self, key, valid_actions, rng, min_attacks=2, attempts=3):
+        """An action sequence for key using only valid_actions, or None when the policy cannot make one.
+
+        Each state is tried a few times before backing off to the next, coarser one.
+        """
+        valid = set(valid_actions)
+        for table in self.states(key):
+            for _ in range(attempts):
+                sequence = walk(table, valid, rng)
+                if len(sequence) >= 2 and sum(action not in MOVES for action in sequence) >= min_attacks:
+                    return sequence
+        return None
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": POLICY_VERSION, "tables": self.tables}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """The policy saved at path; an empty policy when there is none or it is unusable."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            print(f"Boss policy unreadable, ignoring it: {e}")
+            return cls()
+        if data.get("version") != POLICY_VERSION:
+            return cls()
+        return cls(data["tables"])
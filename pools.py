@@ -0,0 +1,63 @@
+"""Free-list pools for short-lived sprites.
+
+Boss hazards, player lasers and bombs come and go many times a second. A
+pooled sprite goes back to its pool when it is killed, and the next acquire()
+re-initializes it through reset() instead of constructing a new one, so its
+Surface and Rect are reused and steady-state play allocates no new sprites.
+"""
+import pygame
+
+
+class PooledSprite(pygame.sprite.Sprite):
+    """A Sprite that returns to its pool on kill().
+
+    Subclasses put all per-spawn state in reset(), which __init__ calls too.
+    """
+    pool = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.pooled = False
+        self.reset(*args, **kwargs)
+
+    def reset(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def kill(self):
+        super().kill()
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class SpritePool:
+    def __init__(self, cls, max_free=256):
+        self.cls = cls
+        self.max_free = max_free
+        self.free = []
+        self.created = self.reused = 0
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.pooled = False
+            sprite.reset(*args, **kwargs)
+            self.reused += 1
+        else:
+            sprite = self.cls(*args, **kwargs)
+            sprite.pool = self
+            self.created += 1
+        return sprite
+
+    def release(self, sprite):
+        # kill() may run more than once on the same sprite; only the first returns it.
+        if not sprite.pooled and len(self.free) < self.max_free:
+            sprite.pooled = True
+            self.free.append(sprite)
+
+    def stats(self):
+        acquired = self.created + self.reused
+        return {"created": self.created, "reused": self.reused, "free": len(self.free),
+                "hit_rate": self.reused / acquired if acquired else 0.0}
@@ -0,0 +1,208 @@
+"""Per-frame phase profiler, performance overlay and exporter.
+
+Code marks the end of each phase with lap(name); the time since the previous
+lap is charged to that phase, so consecutive laps cost one perf_counter()
+call each and nothing is timed twice. Between begin_frame() and end_frame()
+the profiler also records sprite counts, the net number of memory blocks
+allocated and any garbage collections that ran. Boss AI latencies go into a
+histogram.
+
+Everything is a no-op while the profiler is disabled, and laps outside a
+frame are ignored, so headless code that never calls begin_frame() pays only
+an attribute check per lap.
+"""
+import csv
+import gc
+import json
+import sys
+import time
+from collections import deque
+
+import pygame
+
+AI_LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class FrameProfiler:
+    def __init__(self, budget_ms=1000 / 60, history=3600, slow_history=500):
+        self.enabled = False
+        self.budget_ms = budget_ms
+        self.frames = deque(maxlen=history)          # the most recent frames
+        self.slow_frames = deque(maxlen=slow_history)  # frames whose busy time exceeded budget_ms
+        self.frame_index = 0
+        self.current = None
+        self.frame_start = self.last = 0.0
+        self.blocks = 0
+        self.gc_start = None
+        self.ai_latency_counts = [0] * (len(AI_LATENCY_BUCKETS_MS) + 1)
+        self.ai_latencies_ms = deque(maxlen=1000)
+        self.ai_timeouts = 0
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            gc.callbacks.append(self._on_gc)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            self.current = None
+            gc.callbacks.remove(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if self.current is None:
+            return
+        if phase == "start":
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            self.current["gc"] += 1
+            self.current["gc_ms"] += (time.perf_counter() - self.gc_start) * 1000
+            self.gc_start = None
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.current = {"frame": self.frame_index, "phases": {}, "counts": {}, "gc": 0, "gc_ms": 0.0}
+        self.blocks = sys.getallocatedblocks()
+        self.frame_start = self.last = time.perf_counter()
+
+    def lap(self, name):
+        """Charge the time since the previous lap (or begin_frame) to phase name."""
+        if self.current is None:
+            return
+        now = time.perf_counter()
+        phases = self.current["phases"]
+        phases[name] = phases.get(name, 0.0) + (now - self.last) * 1000
+        self.last = now
+
+    def count(self, name, value):
+        if self.current is not None:
+            self.current["counts"][name] = value
+
+    def end_frame(self):
+        frame = self.current
+        if frame is None:
+            return
+        self.current = None
+        frame["total_ms"] = (time.perf_counter() - self.frame_start) * 1000
+        frame["busy_ms"] = frame["total_ms"] - frame["phases"].get("wait", 0.0)
+        frame["alloc_blocks"] = sys.getallocatedblocks() - self.blocks
+        self.frames.append(frame)
+        if frame["busy_ms"] > self.budget_ms:
+            self.slow_frames.append(frame)
+        self.frame_index += 1
+
+    def record_ai_latency(self, latency_ms, timed_out=False):
+        if not self.enabled:
+            return
+        if timed_out:
+            self.ai_timeouts += 1
+            return
+        bucket = next((i for i, edge in enumerate(AI_LATENCY_BUCKETS_MS) if latency_ms <= edge), len(AI_LATENCY_BUCKETS_MS))
+        self.ai_latency_counts[bucket] += 1
+        self.ai_latencies_ms.append(latency_ms)
+
+    # --- Reporting ---
+
+    def recent(self, n):
+        return list(self.frames)[-n:]
+
+    def phase_stats(self, frames=None):
+        """{phase: {"avg", "p50", "p99", "max"}} in ms over frames (default: the whole history)."""
+        frames = list(self.frames) if frames is None else frames
+        names = {"busy": None}
+        for frame in frames:
+            names.update(dict.fromkeys(frame["phases"]))
+        stats = {}
+        for name in names:
+            values = [f["busy_ms"] if name == "busy" else f["phases"].get(name, 0.0) for f in frames]
+            stats[name] = {
+                "avg": sum(values) / len(values) if values else 0.0,
+                "p50": percentile(values, 50),
+                "p99": percentile(values, 99),
+                "max": max(values, default=0.0),
+            }
+        return stats
+
+    def ai_histogram(self):
+        labels = [f"<={edge}" for edge in AI_LATENCY_BUCKETS_MS] + [f">{AI_LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            "buckets_ms": dict(zip(labels, self.ai_latency_counts)),
+            "p50": percentile(self.ai_latencies_ms, 50),
+            "p99": percentile(self.ai_latencies_ms, 99),
+            "timeouts": self.ai_timeouts,
+        }
+
+    def export(self, path):
+        """Write the recorded frames as .csv (one row per frame) or .json (with summaries)."""
+        frames = sorted({f["frame"]: f for f in list(self.slow_frames) + list(self.frames)}.values(), key=lambda f: f["frame"])
+        if path.endswith(".csv"):
+            phases = sorted({name for f in frames for name in f["phases"]})
+            counts = sorted({name for f in frames for name in f["counts"]})
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame", "total_ms", "busy_ms", "alloc_blocks", "gc", "gc_ms"] + [f"{p}_ms" for p in phases] + counts)
+                for frame in frames:
+                    writer.writerow([frame["frame"], round(frame["total_ms"], 3), round(frame["busy_ms"], 3), frame["alloc_blocks"], frame["gc"], round(frame["gc_ms"], 3)]
+                                    + [round(frame["phases"].get(p, 0.0), 3) for p in phases] + [frame["counts"].get(c, "") for c in counts])
+        else:
+            report = {
+                "budget_ms": self.budget_ms,
+                "phases": self.phase_stats(),
+                "ai_latency": self.ai_histogram(),
+                "slow_frames": [f["frame"] for f in self.slow_frames],
+                "frames": frames,
+            }
+            with open(path, "w") as f:
+                json.dump(report, f, indent=1)
+
+
+class ProfilerOverlay:
+    """A few lines of live numbers in a corner of the screen, refreshed a few times a second."""
+    def __init__(self, profiler, font, refresh_frames=15, window=60):
+        self.profiler = profiler
+        self.font = font
+        self.refresh_frames = refresh_frames
+        self.window = window
+        self.image = None
+        self.rendered_at = None
+
+    def lines(self):
+        profiler = self.profiler
+        frames = profiler.recent(self.window)
+        if not frames:
+            return ["profiler: waiting for frames"]
+        stats = profiler.phase_stats(frames)
+        fps = 1000 * len(frames) / max(1e-6, sum(f["total_ms"] for f in frames))
+        busy = stats.pop("busy")
+        stats.pop("wait", None)
+        top = sorted(stats.items(), key=lambda item: -item[1]["avg"])[:5]
+        last = frames[-1]
+        ai = profiler.ai_histogram()
+        return [
+            f"{fps:4.0f} fps  busy {busy['avg']:.1f} ms (p99 {busy['p99']:.1f}, budget {profiler.budget_ms:.1f})  slow {len(profiler.slow_frames)}",
+            "  ".join(f"{name} {s['avg']:.2f}" for name, s in top),
+            "  ".join(f"{name} {n}" for name, n in last["counts"].items()),
+            f"alloc {sum(f['alloc_blocks'] for f in frames) / len(frames):+.0f} blocks/frame  gc {sum(f['gc'] for f in frames)} ({sum(f['gc_ms'] for f in frames):.1f} ms)"
+            f"  AI p50 {ai['p50']:.0f} ms p99 {ai['p99']:.0f} ms, {ai['timeouts']} timeouts",
+        ]
+
+    def draw(self, surface, bottomleft):
+        index = self.profiler.frame_index
+        if self.image is None or index - self.rendered_at >= self.refresh_frames:
+            rows = [self.font.render(line, True, (255, 255, 255)) for line in self.lines()]
+            self.image = pygame.Surface((max(r.get_width() for r in rows) + 8, sum(r.get_height() for r in rows) + 8), pygame.SRCALPHA)
+            self.image.fill((0, 0, 0, 170))
+            y = 4
+            for row in rows:
+                self.image.blit(row, (4, y))
+                y += row.get_height()
+            self.rendered_at = index
+        return surface.blit(self.image, self.image.get_rect(bottomleft=bottomleft))
@@ -0,0 +1,166 @@
+"""Array-backed projectile engine.
+
+Player bullets and boss orbs are rows in a structure of NumPy arrays rather
+than one Sprite each. A store is moved and culled in one vectorized pass,
+hit-tested against whole batches of target rects, and drawn with a single
+Surface.blits() call.
+"""
+import numpy as np
+
+# Row indices into ProjectileStore.data
+X, Y, W, H, VX, VY, DAMAGE, KIND = range(8)
+NUM_FIELDS = 8
+
+
+def rect_round(values, out):
+    """Round the way a pygame.Rect does when a float is assigned to it: halves away from zero."""
+    np.floor(np.abs(values) + 0.5, out=out)
+    return np.copysign(out, values, out=out)
+
+
+class ProjectileStore:
+    """Positions, sizes, velocities, damage and kind of every live projectile.
+
+    Coordinates are rect top-left corners in screen pixels. kind indexes into
+    images, so one store can hold several sprite variants (e.g. one per power
+    level). Live projectiles always occupy columns [0, count).
+    """
+    def __init__(self, images, bounds, capacity=256):
+        self.images = images
+        self.bounds = bounds  # pygame.Rect; projectiles leaving it are culled
+        self.data = np.zeros((NUM_FIELDS, capacity))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getstate__(self):
+        # Snapshots keep the live columns only, not the spare capacity.
+        state = dict(self.__dict__)
+        state["data"] = self.live.copy()
+        state["capacity"] = self.data.shape[1]
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        live, capacity = state.pop("data"), state.pop("capacity")
+        self.__dict__.update(state)
+        self.data = np.zeros((NUM_FIELDS, capacity))
+        self.data[:, :self.count] = live
+
+    @property
+    def live(self):
+        return self.data[:, :self.count]
+
+    def spawn(self, x, y, w, h, vx=0, vy=0, damage=0, kind=0):
+        self.spawn_many([x], [y], w, h, [vx], [vy], damage, kind)
+
+    def spawn_many(self, xs, ys, w, h, vxs, vys, damage=0, kind=0):
+        n = len(xs)
+        self._reserve(self.count + n)
+        rows = self.data[:, self.count:self.count + n]
+        rows[X], rows[Y], rows[W], rows[H] = xs, ys, w, h
+        rows[VX], rows[VY], rows[DAMAGE], rows[KIND] = vxs, vys, damage, kind
+        self.count += n
+
+    def _reserve(self, needed):
+        capacity = self.data.shape[1]
+        if needed > capacity:
+            grown = np.zeros((NUM_FIELDS, max(needed, capacity * 2)))
+            grown[:, :self.count] = self.live
+            self.data = grown
+
+    def _keep(self, keep):
+        kept = int(np.count_nonzero(keep))
+        if kept != self.count:
+            self.data[:, :kept] = self.live[:, keep]
+            self.count = kept
+
+    def clear(self):
+        self.count = 0
+
+    def update(self):
+        if not self.count:
+            return
+        live = self.live
+        # Rects hold integer coordinates; rounding like a Rect keeps the trajectories the Sprite bullets had.
+        rect_round(live[X] + live[VX], out=live[X])
+        rect_round(live[Y] + live[VY], out=live[Y])
+        b = self.bounds
+        self._keep((live[X] < b.right) & (live[X] + live[W] > b.left) & (live[Y] < b.bottom) & (live[Y] + live[H] > b.top))
+
+    def overlaps(self, rects):
+        """(len(rects), count) matrix of Rect.colliderect results against each projectile."""
+        rects = np.asarray(rects, dtype=float).reshape(-1, 4)
+        rx, ry, rw, rh = (col[:, None] for col in rects.T)
+        live = self.live
+        return (rx < live[X] + live[W]) & (rx + rw > live[X]) & (ry < live[Y] + live[H]) & (ry + rh > live[Y])
+
+    def collide_rect(self, rect, dokill=True):
+        """Damage of every projectile overlapping rect, optionally removing them."""
+        if not self.count:
+            return self.data[DAMAGE, :0]
+        hit = self.overlaps([tuple(rect)])[0]
+        damage = self.live[DAMAGE, hit]
+        if dokill and damage.size:
+            self._keep(~hit)
+        return damage
+
+    def collide_rects(self, rects, dokill=True):
+        """Total damage dealt to each rect, like groupcollide(targets, projectiles).
+
+        A projectile only hits the first rect it overlaps, matching the order in
+        which groupcollide walks its first group.
+        """
+        totals = np.zeros(len(rects))
+        if not rects or not self.count:
+            return totals
+        matrix = self.overlaps(rects)
+        hit = matrix.any(axis=0)
+        if hit.any():
+            owners = matrix.argmax(axis=0)[hit]
+            totals += np.bincount(owners, weights=self.live[DAMAGE, hit], minlength=len(rects))
+            if dokill:
+                self._keep(~hit)
+        return totals
+
+    def collide_circle(self, center, radius, dokill=True):
+        """Number of projectiles hit by a circle, with sprite.collide_circle semantics.
+
+        Projectiles have no radius attribute, so like collide_circle they use half
+        their rect diagonal, measured from the integer rect center.
+        """
+        if not self.count:
+            return 0
+        live = self.live
+        dx = live[X] + live[W] // 2 - center[0]
+        dy = live[Y] + live[H] // 2 - center[1]
+        reach = 0.5 * np.sqrt(live[W] ** 2 + live[H] ** 2) + radius
+        hit = dx * dx + dy * dy <= reach * reach
+        hits = int(np.count_nonzero(hit))
+        if dokill and hits:
+            self._keep(~hit)
+        return hits
+
+    def nearest(self, point, k):
+        """(dx, dy) rows from point to the centers of the k nearest projectiles, nearest first."""
+        live = self.live
+        dx = live[X] + live[W] / 2 - point[0]
+        dy = live[Y] + live[H] / 2 - point[1]
+        order = np.argsort(dx * dx + dy * dy)[:k]
+        return np.column_stack((dx[order], dy[order]))
+
+    def draw(self, surface, alpha=1.0):
+        """Blit every projectile in one call and return the blitted rects.
+
+        With alpha < 1 each is drawn that far along its last step, which is
+        backed out from its velocity.
+        """
+        if not self.count:
+            return []
+        live, images = self.live, self.images
+        kinds = live[KIND].astype(int).tolist()
+        xs, ys = live[X], live[Y]
+        if alpha < 1:
+            xs, ys = xs - live[VX] * (1 - alpha), ys - live[VY] * (1 - alpha)
+        return surface.blits([(images[k], (x, y)) for k, x, y in zip(kinds, xs.tolist(), ys.tolist())])
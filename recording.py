@@ -0,0 +1,221 @@
+"""Compact binary recordings of GameSession runs.
+
+A session is deterministic given its seed, jet, per-frame inputs and frame
+times, except for the boss AI, whose answers arrive from another thread on
+the wall clock. A Recording keeps exactly those inputs plus every AI state
+change (thinking started, sequence delivered) and the frame it happened on,
+so replay.py can re-simulate the run without a model.
+
+Layout: b"PVR" + format version byte + zlib-compressed varint streams.
+Input masks and frame times (in microseconds, as deltas) are run-length
+encoded, so a 10-minute run at 60 FPS takes a few KB. A state digest every
+CHECKPOINT_FRAMES frames lets a replay report the first frame it diverged.
+"""
+import struct
+import zlib
+
+MAGIC = b"PVR"
+FORMAT_VERSION = 2   # 2: projectiles round like Rects, so version 1 runs no longer replay
+CHECKPOINT_FRAMES = 300
+
+INPUT_KEYS = ("left", "right", "shoot", "laser", "bomb")
+# Codes are indices: add new actions at the end so older recordings still decode.
+ACTIONS = ("SINGLE_SHOT", "SPREAD_SHOT", "VOLLEY_SHOT", "CIRCLE_SHOT", "LASER_SWEEP", "HOMING_MISSILE", "LAY_MINES", "DODGE", "MOVE_LEFT", "MOVE_RIGHT",
+           "SPIRAL_SHOT", "AIMED_BURST")
+AI_SITES = ("poll", "request", "stream")
+
+
+def pack_inputs(inputs):
+    return sum(1 << bit for bit, key in enumerate(INPUT_KEYS) if inputs.get(key))
+
+
+def unpack_inputs(mask):
+    return {key: bool(mask >> bit & 1) for bit, key in enumerate(INPUT_KEYS)}
+
+
+def session_digest(session):
+    """CRC32 of the state a physics change would disturb."""
+    boss = session.boss_group.sprite
+    state = (
+        session.frame, session.clock.get_ticks(), session.score, session.player_laser_charge,
+        session.player.lives, session.player.bombs, session.player.power, tuple(session.player.rect),
+        tuple(boss.rect) if boss else None, round(boss.health, 3) if boss else None,
+        tuple(tuple(e.rect) for e in session.enemies),
+        tuple(tuple(s.rect) for s in session.boss_bullets),
+    )
+    crc = zlib.crc32(repr(state).encode())
+    crc = zlib.crc32(session.bullets.live.tobytes(), crc)
+    return zlib.crc32(session.boss_orbs.live.tobytes(), crc)
+
+
+# --- varint streams ---
+
+def write_varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n):
+    return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+
+def run_lengths(values):
+    runs = []
+    for value in values:
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+
+class Reader:
+    def __init__(self, data):
+        self.data, self.pos = data, 0
+
+    def varint(self):
+        n = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            n |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def raw(self, size):
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+
+class Recording:
+    def __init__(self, seed, jet_type, max_waves):
+        self.seed, self.jet_type, self.max_waves = seed, jet_type, max_waves
+        self.inputs = []        # per frame: packed input mask
+        self.frame_us = []      # per frame: dt passed to step(), in whole microseconds
+        self.ai_events = []     # (frame, site, sequence); an empty sequence means "started thinking"
+        self.checkpoints = []   # (frame, session_digest)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def to_bytes(self):
+        out = bytearray()
+        name = self.jet_type.encode()
+        for n in (self.seed, self.max_waves, len(name)):
+            write_varint(out, n)
+        out += name
+
+        runs = run_lengths(self.inputs)
+        write_varint(out, len(runs))
+        for mask, count in runs:
+            write_varint(out, mask)
+            write_varint(out, count)
+
+        deltas = [b - a for a, b in zip([0] + self.frame_us, self.frame_us)]
+        runs = run_lengths(deltas)
+        write_varint(out, len(runs))
+        for delta, count in runs:
+            write_varint(out, zigzag(delta))
+            write_varint(out, count)
+
+        write_varint(out, len(self.ai_events))
+        last = 0
+        for frame, site, sequence in self.ai_events:
+            write_varint(out, frame - last)
+            write_varint(out, AI_SITES.index(site))
+            write_varint(out, len(sequence))
+            out += bytes(ACTIONS.index(action) for action in sequence)
+            last = frame
+
+        write_varint(out, len(self.checkpoints))
+        last = 0
+        for frame, digest in self.checkpoints:
+            write_varint(out, frame - last)
+            out += struct.pack("<I", digest)
+            last = frame
+        return MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(bytes(out), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:3] != MAGIC:
+            raise ValueError("not a Pixel Vengeance recording")
+        if data[3] != FORMAT_VERSION:
+            raise ValueError(f"unsupported recording version {data[3]}")
+        r = Reader(zlib.decompress(data[4:]))
+        seed, max_waves, name_length = r.varint(), r.varint(), r.varint()
+        recording = cls(seed, r.raw(name_length).decode(), max_waves)
+
+        for _ in range(r.varint()):
+            mask, count = r.varint(), r.varint()
+            recording.inputs += [mask] * count
+
+        dt = 0
+        for _ in range(r.varint()):
+            delta, count = unzigzag(r.varint()), r.varint()
+            for _ in range(count):
+                dt += delta
+                recording.frame_us.append(dt)
+
+        frame = 0
+        for _ in range(r.varint()):
+            frame += r.varint()
+            site = AI_SITES[r.varint()]
+            sequence = [ACTIONS[code] for code in r.raw(r.varint())]
+            recording.ai_events.append((frame, site, sequence))
+
+        frame = 0
+        for _ in range(r.varint()):
+            frame += r.varint()
+            recording.checkpoints.append((frame, struct.unpack("<I", r.raw(4))[0]))
+        return recording
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class Recorder:
+    """Wraps a GameSession and records everything needed to replay it.
+
+    Use it in place of the session: reset() and step() pass through, and
+    recording holds the run so far.
+    """
+    def __init__(self, session):
+        self.session = session
+        self.recording = None
+
+    def reset(self, jet_type="Interceptor", seed=None):
+        state = self.session.reset(jet_type, seed)
+        self.recording = Recording(self.session.seed, jet_type, self.session.max_waves)
+        self.session.ai_log = self.log_ai_event
+        return state
+
+    def log_ai_event(self, site, sequence):
+        self.recording.ai_events.append((self.session.frame, site, list(sequence)))
+
+    def step(self, inputs=None, dt_ms=None):
+        session, recording = self.session, self.recording
+        # The run itself uses the stored, quantized frame time so a replay advances the clock identically.
+        dt_us = round((session.frame_ms if dt_ms is None else dt_ms) * 1000)
+        recording.inputs.append(pack_inputs(inputs or {}))
+        recording.frame_us.append(dt_us)
+        state = session.step(inputs, dt_us / 1000)
+        if session.frame % CHECKPOINT_FRAMES == 0 or not state["running"]:
+            recording.checkpoints.append((session.frame, session_digest(session)))
+        return state
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
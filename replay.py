@@ -0,0 +1,89 @@
+"""Re-simulate recorded runs.
+
+    python main.py --record run.pvr          # record a game while playing it
+    python replay.py run.pvr [more.pvr ...]  # re-simulate headless at full speed
+    python replay.py run.pvr --watch         # watch the replay in a window
+
+Boss AI answers come from the recording, so no model is needed. Every replay
+is checked against the recorded state digests; the exit status is 1 when any
+run diverged, which makes a folder of recordings a regression suite for
+physics changes.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+if "--watch" not in sys.argv[1:]:
+    os.environ.setdefault("PIXEL_VENGEANCE_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import main
+from recording import Recording, session_digest, unpack_inputs
+
+
+def replay(recording, on_frame=None):
+    """Replay recording on a fresh session.
+
+    Returns the session and the first frame whose state digest differs from
+    the recorded one, or None when the run matched throughout.
+    """
+    session = main.GameSession(recording.max_waves, ai_enabled=False)
+    events = {(frame, site): sequence for frame, site, sequence in recording.ai_events}
+    session.ai_script = lambda site: events.get((session.frame, site))
+    session.reset(recording.jet_type, recording.seed)
+    checkpoints = dict(recording.checkpoints)
+    diverged_at = None
+    for mask, dt_us in zip(recording.inputs, recording.frame_us):
+        session.step(unpack_inputs(mask), dt_us / 1000)
+        expected = checkpoints.get(session.frame)
+        if diverged_at is None and expected is not None and expected != session_digest(session):
+            diverged_at = session.frame
+        if on_frame:
+            on_frame(session)
+    return session, diverged_at
+
+
+def watcher():
+    screen = pygame.display.set_mode((main.SCREEN_WIDTH, main.SCREEN_HEIGHT))
+    pygame.display.set_caption("Pixel Vengeance AI - replay")
+    clock = pygame.time.Clock()
+
+    def show(session):
+        pygame.event.pump()
+        session.draw(screen)
+        pygame.display.flip()
+        clock.tick(main.FPS)
+    return show
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate recorded Pixel Vengeance runs.")
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--watch", action="store_true", help="show the replay in a window at normal speed")
+    parser.add_argument("--verbose", action="store_true", help="keep the game's own console output")
+    args = parser.parse_args(argv)
+
+    on_frame = watcher() if args.watch else None
+    failures = 0
+    for path in args.recordings:
+        recording = Recording.load(path)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            session, diverged_at = replay(recording, on_frame)
+        elapsed = time.perf_counter() - started
+        if len(recording) != session.frame:
+            diverged_at = diverged_at or session.frame  # the game ended before the recorded inputs did
+        status = "ok" if diverged_at is None else f"DIVERGED at frame {diverged_at}"
+        failures += diverged_at is not None
+        print(f"{path}: {session.frame} frames ({session.clock.get_ticks() / 1000:.0f} s of play) in {elapsed:.2f} s, "
+              f"{session.game_over_message or 'still running'}, score {session.score} - {status}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,226 @@
+"""Headless simulation farm for balance testing.
+
+Runs many GameSessions across a process pool, each flown by a scripted pilot,
+streams one JSON line per game and prints win rates per jet and pilot:
+
+    python simfarm.py --games 10000 --pilots dodger aggressive bomber --out results.jsonl
+
+Each game's seed is --seed plus its index, so any single game can be re-run
+with the same seed, jet and pilot. Bosses use their scripted attack patterns,
+or with --boss policy the distilled policy (see build_policy.py); the model is
+never queried.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+os.environ.setdefault("PIXEL_VENGEANCE_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keeps --out - clean JSON lines
+
+import main
+from projectiles import H, W, X, Y
+
+MAX_GAME_MS = 10 * 60 * 1000   # games still running after this much simulated time end as a timeout
+
+
+# --- Pilots ---
+
+def threats(session, lookahead):
+    """Center x of every enemy, orb and boss projectile within lookahead px above the player."""
+    player = session.player.rect
+    top = player.top - lookahead
+    orbs = session.boss_orbs.live
+    near = (orbs[Y] + orbs[H] > top) & (orbs[Y] < player.bottom)
+    xs = (orbs[X, near] + orbs[W, near] / 2).tolist()
+    for group in (session.enemies, session.boss_bullets):
+        xs.extend(s.rect.centerx for s in group if s.rect.bottom > top and s.rect.top < player.bottom)
+    return xs
+
+
+class Pilot:
+    """Turns the session's current state into one frame of inputs."""
+    fire_every = 8          # frames between shots
+    lookahead = 200         # how far above the jet threats are noticed
+    dodge_margin = 30       # extra clearance on each side of the jet
+
+    def target_x(self, session):
+        # Line up under the nearest enemy, else the boss.
+        if session.enemies:
+            x = session.player.rect.centerx
+            return min((e.rect.centerx for e in session.enemies), key=lambda ex: abs(ex - x))
+        boss = session.boss_group.sprite
+        return boss.rect.centerx if boss else main.SCREEN_WIDTH // 2
+
+    def steer(self, session, goal_x):
+        x = session.player.rect.centerx
+        return {"left": goal_x < x - 4, "right": goal_x > x + 4}
+
+    def dodge(self, session, nearby):
+        player = session.player.rect
+        # Head away from the threats, or toward the middle of the arena when cornered.
+        away = -1 if sum(nearby) / len(nearby) > player.centerx else 1
+        if (away < 0 and player.left - session.playable_left < player.width) or (away > 0 and session.playable_right - player.right < player.width):
+            away = -away
+        return {"left": away < 0, "right": away > 0}
+
+    def nearby_threats(self, session):
+        player = session.player.rect
+        reach = player.width / 2 + self.dodge_margin
+        return [x for x in threats(session, self.lookahead) if abs(x - player.centerx) < reach]
+
+    def act(self, session, frame):
+        nearby = self.nearby_threats(session)
+        inputs = self.dodge(session, nearby) if nearby else self.steer(session, self.target_x(session))
+        inputs["shoot"] = frame % self.fire_every == 0
+        inputs["laser"] = session.player_laser_charge >= main.PLAYER_LASER_MAX_CHARGE
+        return inputs
+
+
+class DodgerPilot(Pilot):
+    """Stays clear of everything and chips away from a distance."""
+    fire_every = 10
+    lookahead = 260
+    dodge_margin = 40
+
+
+class AggressivePilot(Pilot):
+    """Fires constantly and only dodges point-blank threats."""
+    fire_every = 6
+    lookahead = 90
+    dodge_margin = 10
+
+
+class BomberPilot(Pilot):
+    """Dodges like the dodger but clears the screen with a bomb whenever it gets crowded."""
+    lookahead = 220
+    crowd = 3
+
+    def act(self, session, frame):
+        inputs = super().act(session, frame)
+        crowded = len(self.nearby_threats(session)) >= self.crowd or len(threats(session, 120)) >= 2 * self.crowd
+        inputs["bomb"] = crowded and not session.repulsors   # one repulsor at a time
+        return inputs
+
+
+PILOTS = {"dodger": DodgerPilot, "aggressive": AggressivePilot, "bomber": BomberPilot}
+
+
+# --- Games ---
+
+def play_game(job):
+    """Play one game to the end and return its result record."""
+    index, seed, jet_type, pilot_name, max_waves = job
+    session = SESSIONS.get(max_waves)
+    if session is None:
+        session = SESSIONS[max_waves] = main.GameSession(max_waves=max_waves, ai_enabled=main.AI_BACKEND == "policy")
+    pilot = PILOTS[pilot_name]()
+    state = session.reset(jet_type, seed=seed)
+    lives_lost = [0] * (max_waves + 1)   # per wave, the boss fight last
+    boss_spawn_ms = None
+    lives = state["lives"]
+    started = time.perf_counter()
+    while state["running"] and state["time_ms"] < MAX_GAME_MS:
+        state = session.step(pilot.act(session, state["frame"]))
+        if state["lives"] < lives:
+            lives_lost[max(0, min(state["wave"], max_waves + 1) - 1)] += lives - state["lives"]
+            lives = state["lives"]
+        if boss_spawn_ms is None and state["boss_health"] is not None:
+            boss_spawn_ms = state["time_ms"]
+    outcome = state["game_over_message"] or "TIMEOUT"
+    return {
+        "game": index, "seed": seed, "jet": jet_type, "pilot": pilot_name,
+        "outcome": outcome, "won": outcome == "YOU WIN!", "score": state["score"],
+        "wave": state["wave"], "sim_ms": state["time_ms"], "frames": state["frame"],
+        "boss_spawn_ms": boss_spawn_ms,
+        "time_to_kill_ms": state["time_ms"] - boss_spawn_ms if outcome == "YOU WIN!" else None,
+        "boss_health_left": state["boss_health"],
+        "lives_lost_per_wave": lives_lost,
+        "wall_s": round(time.perf_counter() - started, 3),
+    }
+
+
+SESSIONS = {}  # per worker process: max_waves -> reusable GameSession
+
+
+def quiet_worker(boss="scripted"):
+    # The game narrates waves and boss attacks on stdout; thousands of games would drown the results.
+    sys.stdout = open(os.devnull, "w")
+    main.AI_BACKEND = boss
+
+
+def jobs(games, seed, jets, pilots, max_waves):
+    combos = itertools.cycle(itertools.product(jets, pilots))
+    for index in range(games):
+        jet_type, pilot_name = next(combos)
+        yield index, seed + index, jet_type, pilot_name, max_waves
+
+
+# --- Aggregation ---
+
+class Summary:
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, result):
+        for key in ((result["jet"], "*"), (result["jet"], result["pilot"])):
+            g = self.groups.setdefault(key, {"games": 0, "wins": 0, "score": 0, "kill_ms": [], "lives_lost": None})
+            g["games"] += 1
+            g["wins"] += result["won"]
+            g["score"] += result["score"]
+            if result["time_to_kill_ms"] is not None:
+                g["kill_ms"].append(result["time_to_kill_ms"])
+            lost = result["lives_lost_per_wave"]
+            g["lives_lost"] = lost[:] if g["lives_lost"] is None else [a + b for a, b in zip(g["lives_lost"], lost)]
+
+    def table(self):
+        lines = [f"{'jet':<12} {'pilot':<11} {'games':>6} {'win %':>6} {'avg score':>10} {'median TTK s':>12}  lives lost per wave (avg)"]
+        for (jet, pilot), g in sorted(self.groups.items()):
+            kills = sorted(g["kill_ms"])
+            ttk = f"{kills[len(kills) // 2] / 1000:.1f}" if kills else "-"
+            lost = " ".join(f"{n / g['games']:.2f}" for n in g["lives_lost"])
+            lines.append(f"{jet:<12} {pilot:<11} {g['games']:>6} {100 * g['wins'] / g['games']:>6.1f} {g['score'] / g['games']:>10.0f} {ttk:>12}  {lost}")
+        return "\n".join(lines)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless games with scripted pilots and aggregate balance stats.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--jets", nargs="+", default=list(main.JET_TYPES), choices=list(main.JET_TYPES))
+    parser.add_argument("--pilots", nargs="+", default=list(PILOTS), choices=list(PILOTS))
+    parser.add_argument("--waves", type=int, default=3, help="enemy waves before the boss")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game; game i uses seed + i")
+    parser.add_argument("--boss", choices=("scripted", "policy"), default="scripted", help="where boss decisions come from")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", help="write one JSON line per game here ('-' for stdout)")
+    args = parser.parse_args(argv)
+    if args.boss == "policy" and not main.get_ai_policy():
+        parser.error(f"no boss policy at {main.AI_POLICY_PATH}; build one with build_policy.py")
+
+    summary = Summary()
+    out = sys.stdout if args.out == "-" else open(args.out, "w") if args.out else None
+    started = time.perf_counter()
+    with Pool(args.workers, initializer=quiet_worker, initargs=(args.boss,)) as pool, contextlib.ExitStack() as stack:
+        if out not in (None, sys.stdout):
+            stack.enter_context(out)
+        results = pool.imap_unordered(play_game, jobs(args.games, args.seed, args.jets, args.pilots, args.waves), chunksize=4)
+        for done, result in enumerate(results, 1):
+            summary.add(result)
+            if out:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            if done % 100 == 0 or done == args.games:
+                elapsed = time.perf_counter() - started
+                print(f"{done}/{args.games} games, {done / elapsed:.1f} games/s", file=sys.stderr)
+        # SDL traps SIGTERM in the workers, so Pool.terminate() on exit would hang; let them finish instead.
+        pool.close()
+        pool.join()
+    print(summary.table(), file=sys.stderr if out is sys.stdout else sys.stdout)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,87 @@
+"""Whole-world snapshots as one binary blob.
+
+GameSession.snapshot() pickles every piece of world state: sprite groups
+and their sprites, the projectile arrays, boss timers and queues, player
+stats, wave counters, RNG states and the simulation clock. Objects the world
+only borrows are written as short tokens instead: atlas and effect Surfaces,
+compiled bullet patterns, sprite pools, the session itself and the harness
+hooks (recorder, replay script). Restoring resolves each token in the
+process doing the restore. A snapshot therefore holds only what changes
+during play, and it restores into any session, in this process or another
+one.
+
+Layout: b"PVS" + format version byte + pickle (protocol 5). save() adds
+zlib on top for files. Like any pickle, a blob can run code when loaded, so
+only restore snapshots you made.
+"""
+import io
+import pickle
+import random
+import zlib
+from array import array
+
+MAGIC = b"PVS"
+FORMAT_VERSION = 1
+
+
+def load_random(version, internal, gauss):
+    rng = random.Random()
+    rng.setstate((version, tuple(array("I", internal)), gauss))
+    return rng
+
+
+def resolve_token(token):
+    raise pickle.UnpicklingError("snapshot tokens are only resolved by SnapshotUnpickler")
+
+
+class SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, tokens):
+        super().__init__(file, protocol=5)
+        self.tokens = tokens    # id(obj) -> token, for objects written by reference
+
+    def reducer_override(self, obj):
+        # Unlike persistent_id, this is not called for plain ints, floats, strings and
+        # containers, which are most of a world (an RNG state alone is 625 ints).
+        token = self.tokens.get(id(obj))
+        if token is not None:
+            return resolve_token, (token,)
+        if type(obj) is random.Random:
+            version, internal, gauss = obj.getstate()
+            return load_random, (version, array("I", internal).tobytes(), gauss)
+        return NotImplemented
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, resolve):
+        super().__init__(file)
+        self.resolve = resolve  # token -> object in this process
+
+    def find_class(self, module, name):
+        if module == __name__ and name == "resolve_token":
+            return self.resolve
+        return super().find_class(module, name)
+
+
+def dump_world(state, tokens):
+    out = io.BytesIO()
+    out.write(MAGIC + bytes([FORMAT_VERSION]))
+    SnapshotPickler(out, tokens).dump(state)
+    return out.getvalue()
+
+
+def load_world(blob, resolve):
+    if blob[:3] != MAGIC:
+        raise ValueError("not a Pixel Vengeance snapshot")
+    if blob[3] != FORMAT_VERSION:
+        raise ValueError(f"snapshot format {blob[3]} is not supported (expected {FORMAT_VERSION})")
+    return SnapshotUnpickler(io.BytesIO(memoryview(blob)[4:]), resolve).load()
+
+
+def save(blob, path):
+    with open(path, "wb") as f:
+        f.write(zlib.compress(blob, 6))
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return zlib.decompress(f.read())
@@ -0,0 +1,137 @@
+"""Vectorized procedural sound effects.
+
+A sound is described by a small spec dict and rendered as NumPy arrays in a
+handful of whole-buffer operations: an oscillator (square, saw, triangle or
+noise) with an optional frequency sweep, an optional noise layer and an ADSR
+or linear-decay envelope. Rendered PCM is cached on disk under a hash of the
+spec and mixer format, and handed to pygame.mixer.Sound through the buffer
+protocol without building an intermediate bytes object.
+
+Spec keys: wave, freq, end_freq (sweep target), duration_ms, noise (0-1 mix),
+adsr (attack_ms, decay_ms, sustain_level, release_ms; a linear decay when
+absent), volume, seed (for noise) and max_voices (concurrent plays allowed by
+SoundBank).
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pygame
+
+CACHE_VERSION = 1
+
+
+def oscillator(wave, freq, end_freq, n, sample_rate, rng):
+    if wave == "noise":
+        return rng.uniform(-1.0, 1.0, n)
+    # Integrating the instantaneous frequency gives click-free sweeps.
+    freqs = np.linspace(freq, freq if end_freq is None else end_freq, n)
+    phase = np.cumsum(freqs / sample_rate) % 1.0
+    if wave == "square":
+        return np.where(phase < 0.5, 1.0, -1.0)
+    if wave == "saw":
+        return 2.0 * phase - 1.0
+    if wave == "triangle":
+        return 4.0 * np.abs(phase - 0.5) - 1.0
+    raise ValueError(f"Unknown wave '{wave}'")
+
+
+def adsr(n, sample_rate, attack_ms, decay_ms, sustain_level, release_ms):
+    to_samples = lambda ms: int(sample_rate * ms / 1000)
+    attack, decay, release = to_samples(attack_ms), to_samples(decay_ms), to_samples(release_ms)
+    sustain = max(0, n - attack - decay - release)
+    envelope = np.concatenate([
+        np.linspace(0.0, 1.0, attack, endpoint=False),
+        np.linspace(1.0, sustain_level, decay, endpoint=False),
+        np.full(sustain, sustain_level),
+        np.linspace(sustain_level, 0.0, release),
+    ])
+    return envelope[:n]
+
+
+def render(spec, sample_rate):
+    """Mono float samples in [-1, 1] for spec."""
+    n = int(sample_rate * spec["duration_ms"] / 1000)
+    rng = np.random.default_rng(spec.get("seed", 0))
+    samples = oscillator(spec.get("wave", "square"), spec.get("freq", 440), spec.get("end_freq"), n, sample_rate, rng)
+    if spec.get("noise"):
+        samples = (1.0 - spec["noise"]) * samples + spec["noise"] * rng.uniform(-1.0, 1.0, n)
+    if "adsr" in spec:
+        samples *= adsr(n, sample_rate, *spec["adsr"])
+    else:
+        samples *= np.linspace(1.0, 0.0, n, endpoint=False)
+    return samples * spec.get("volume", 1.0)
+
+
+def to_pcm(samples, size, channels):
+    """Interleaved PCM in the mixer's format, as reported by mixer.get_init()."""
+    clipped = np.clip(samples, -1.0, 1.0)
+    if size == -16:
+        pcm = (clipped * 32767).astype(np.int16)
+    elif size == 16:
+        pcm = (clipped * 32767 + 32768).astype(np.uint16)
+    elif size == -8:
+        pcm = (clipped * 127).astype(np.int8)
+    elif size == 8:
+        pcm = (clipped * 127 + 128).astype(np.uint8)
+    elif size == 32:
+        pcm = clipped.astype(np.float32)
+    else:
+        raise ValueError(f"Unsupported mixer sample size {size}")
+    return np.repeat(pcm, channels) if channels > 1 else pcm
+
+
+class SoundBank:
+    """Named sounds built from specs, with a disk cache and a voice limit per sound."""
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.sounds = {}
+        self.max_voices = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _cache_path(self, spec, mixer_format):
+        key = json.dumps([CACHE_VERSION, spec, mixer_format], sort_keys=True)
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".npy")
+
+    def load_pcm(self, spec):
+        mixer_format = pygame.mixer.get_init()
+        sample_rate, size, channels = mixer_format
+        path = self._cache_path(spec, mixer_format) if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                pcm = np.load(path)
+                self.cache_hits += 1
+                return pcm
+            except (OSError, ValueError):
+                pass
+        self.cache_misses += 1
+        pcm = to_pcm(render(spec, sample_rate), size, channels)
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, pcm)
+            os.replace(path + ".tmp", path)
+        return pcm
+
+    def build(self, specs):
+        for name, spec in specs.items():
+            # play() runs on another thread and looks a sound up in self.sounds first,
+            # so its voice limit must already be there when the sound appears.
+            self.max_voices[name] = spec.get("max_voices", 1)
+            self.sounds[name] = pygame.mixer.Sound(buffer=self.load_pcm(spec))
+
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        if sound.get_num_channels() >= self.max_voices[name]:
+            # Restart instead of stacking yet another copy of the same effect.
+            sound.stop()
+        sound.play()
+
+    def stop(self, name):
+        sound = self.sounds.get(name)
+        if sound is not None:
+            sound.stop()